@@ -87,6 +87,10 @@ RAMN_Result_t RAMN_FLASH_SwitchActiveBank(void);
 // Erases The alternative firmware (second bank) of the ECU. Must be called before firmware update.
 RAMN_Result_t RAMN_FLASH_EraseAlternativeFirmware(void);
 
+// Erases the pages of the alternative firmware that hold addresses start to end (as seen from the active firmware, e.g. 0x08000000).
+// Used to only rewrite the parts of the firmware that changed.
+RAMN_Result_t RAMN_FLASH_EraseAlternativeFirmwarePages(uint32_t start, uint32_t end);
+
 // Copies value of the current EEPROM Emulation Layer to the alternative bank (except values not written yet)
 RAMN_Result_t RAMN_FLASH_CopyEEPROMToInactiveBank(void);
 
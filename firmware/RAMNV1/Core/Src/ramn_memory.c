@@ -302,6 +302,27 @@ RAMN_Result_t RAMN_FLASH_EraseAlternativeFirmware(void)
 	else return RAMN_ERROR;
 }
 
+RAMN_Result_t RAMN_FLASH_EraseAlternativeFirmwarePages(uint32_t start, uint32_t end)
+{
+	HAL_StatusTypeDef result;
+	uint32_t PageError = 0;
+	FLASH_EraseInitTypeDef EraseInitStruct;
+
+	if (RAMN_FLASH_CheckFlashAreaValidForFirmware(start, end) == False) return RAMN_ERROR;
+
+	EraseInitStruct.TypeErase   = FLASH_TYPEERASE_PAGES;
+	EraseInitStruct.Banks       = MEMORY_GetInactiveBank();
+	EraseInitStruct.Page        = (start - FLASH_START_ADDRESS)/FLASH_PAGE_SIZE;
+	EraseInitStruct.NbPages     = ((end - 1U - FLASH_START_ADDRESS)/FLASH_PAGE_SIZE) - EraseInitStruct.Page + 1U;
+
+	result =  HAL_FLASH_Unlock();
+	result |= HAL_FLASHEx_Erase(&EraseInitStruct, &PageError);
+	result |= HAL_FLASH_Lock();
+
+	if (result == HAL_OK) return RAMN_OK;
+	else return RAMN_ERROR;
+}
+
 RAMN_Result_t RAMN_FLASH_CopyEEPROMToInactiveBank(void)
 {
 #if defined(ENABLE_EEPROM_EMULATION)
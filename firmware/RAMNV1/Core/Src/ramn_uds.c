@@ -746,6 +746,42 @@ static void RAMN_UDS_RoutineControlEraseAlternativeFirmware(const uint8_t* data,
 	}
 }
 
+// Routine Control to ask the ECU to erase the pages of the alternative firmware holding an address range (4-byte address, 4-byte size)
+// Used for differential reprogramming: the tester compares pages with the CRC routine (0206), then only erases and rewrites the pages that changed.
+// Erasing the alternative firmware (FF00) would clear the whole bank, and require the full firmware to be sent again.
+static void RAMN_UDS_RoutineControlEraseAlternativeFirmwarePages(const uint8_t* data, uint16_t size)
+{
+	uint8_t errCode;
+	if( size != 12U )
+	{
+		RAMN_UDS_FormatNegativeResponse(data, UDS_NRC_IMLOIF);
+	}
+	else {
+		switch (data[1]){
+		case 0x01:// Start
+			errCode = checkProgrammingOK(True);
+			if (errCode == 0U)
+			{
+				uint32_t startaddr = (data[4] << 24) + (data[5] << 16) + (data[6] << 8) + (data[7]);
+				uint32_t memsize = (data[8] << 24) + (data[9] << 16) + (data[10] << 8) + (data[11]);
+				if (RAMN_FLASH_CheckFlashAreaValidForFirmware(startaddr,startaddr+memsize) == False) RAMN_UDS_FormatNegativeResponse(data, UDS_NRC_ROOR);
+				else if (RAMN_FLASH_EraseAlternativeFirmwarePages(startaddr,startaddr+memsize) != RAMN_OK) RAMN_UDS_FormatNegativeResponse(data, UDS_NRC_GPF);
+				else RAMN_UDS_FormatPositiveResponseEcho(data, 4U);
+			}
+			else
+			{
+				RAMN_UDS_FormatNegativeResponse(data, errCode);
+			}
+			break;
+		case 0x02:// Stop
+		case 0x03:// Read Results
+		default: // Invalid
+			RAMN_UDS_FormatNegativeResponse(data, UDS_NRC_SFNS);
+			break;
+		}
+	}
+}
+
 // Routine control to request the ECU to validate a firmware update
 static void RAMN_UDS_RoutineControlValidateMemory(const uint8_t* data, uint16_t size)
 {
@@ -1257,6 +1293,7 @@ static void RAMN_UDS_RoutineControlVulnerabilityExample2(uint8_t* data, uint16_t
 // 0200 To Disable Periodic Sending of messages
 // 0201 To Erase the EEPROM
 // 0202 To Copy current values in EEPROM to alternative EEPROM
+// 0212 To Erase the pages of the alternative firmware holding an address range
 static void RAMN_UDS_RoutineControl(uint8_t* data, uint16_t size)
 {
 	if( size < 4U )
@@ -1359,6 +1396,9 @@ static void RAMN_UDS_RoutineControl(uint8_t* data, uint16_t size)
 		case 0x0211: // Force Memory Swap:
 			RAMN_UDS_RoutineControlForceMemorySwap(data,size);
 			break;
+		case 0x0212: // Erase pages of alternative firmware
+			RAMN_UDS_RoutineControlEraseAlternativeFirmwarePages(data,size);
+			break;
 #endif
 		case 0x0220: // Update CAN timing (3-byte argument for prescaler, Tseg1, Tseg2)
 			RAMN_UDS_RoutineControlUpdateCANTiming(data,size);
@@ -0,0 +1,38 @@
+#!/usr/bin/env python
+# Copyright (c) 2026 TOYOTA MOTOR CORPORATION. ALL RIGHTS RESERVED.
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+#This is a script that uses UDS (over USB) to play an animation (animated GIF, or directory of images) on the screen of ECU A.
+import sys
+sys.path.append("..")
+from utils.RAMN_Diag_Main import *
+             
+#Path of the animation (GIF file, directory of images or single image, 236 x 195 pixels), can be given as first argument.
+#Defaults to the still image used by UDS_DisplayImage.py, so that the script works out of the box.
+ANIMATION_PATH = sys.argv[1] if len(sys.argv) > 1 else "FILES/image.png"
+
+#Target frame rate. Frames are dropped if the link cannot keep up.
+FPS = 10
+             
+if __name__ == '__main__':
+    #Select Verbose level
+    RAMN_Utils.setVerboseLevel(RAMN_Utils.DEFAULT_VERBOSE)
+    
+    #Create a RAMN USB Handler object
+    ramn, tp = getRAMNHandlers(RAMN_Utils.RAMN_DEFAULT_PORT)
+    
+    #Create ECU objects
+    ECUA,ECUB,ECUC,ECUD = getECUHandlersUDS(ramn,tp)
+    
+    log("This module requires that you install the PIL python module ($pip install Pillow)", LOG_WARNING)
+    log("Playing animation located at {}".format(ANIMATION_PATH),LOG_OUTPUT)   
+    shown, dropped = ECUA.displayFrames(loadImageFrames(ANIMATION_PATH),fps=FPS)
+    log("Displayed {} frames ({} dropped)".format(shown,dropped),LOG_OUTPUT)
+            
+    #Close the session
+    ECUA.close(reset=False)
+    ramn.close(reset=False) 
+    
+    click.pause()
@@ -9,12 +9,23 @@
 import sys
 sys.path.append("..")
 from utils.RAMN_Diag_Main import *
+from utils.RAMN_Memory_Dump import *
 from pathlib import Path
 
 #The block size used for ReadMemoryByAddress commands
 BLOCK_SIZE=0xFF0
 
+#Send each ReadMemoryByAddress request as soon as the previous answer is received
+PIPELINED_DUMP = True
+
+#Dump all ECUs at the same time (total time is about that of the slowest ECU)
+PARALLEL_DUMP = False
+
+#Number of times missing blocks of an area are requested again before giving up (rerun the script to resume an incomplete dump)
+DUMP_ATTEMPTS = 3
+
 #Dump specified areas.
+#Each area is streamed to its bin file, and an interrupted dump resumes where it stopped when the script is run again.
 def dumpECUMemory(ecu,hexfilename,binprefix):
         areas=ECUreadableRange.values() #Edit the "ECUreadableRange" variable to add/remove memory areas.
         ih = intelhex.IntelHex()
@@ -22,20 +33,15 @@ def dumpECUMemory(ecu,hexfilename,binprefix):
         for area in ECUreadableRange.keys():
             start = ECUreadableRange[area][0]
             end = ECUreadableRange[area][1]
-            size = end-start
             log("Reading area {} : 0x{:08x} to 0x{:08x} ".format(area,start,end),LOG_DATA)
-            d = ecu.dumpArea(start,end,blockSize=BLOCK_SIZE)
-            if d != None:
-                if len(d) == (size):
-                    for i in range(size):
-                        ih[start+i] = d[i]  
-                    with open(binprefix + "_" + area + ".bin","wb") as f:
-                            f.write(bytes(d))
-                else:
-                    print(d)
-                    log("Dump of {} Failed, Insuffient data received (ECU may have only 256 kB Flash)".format(area),LOG_ERROR)
+            binfilename = binprefix + "_" + area + ".bin"
+            dump = RAMN_Memory_Dump(binfilename,start,end,blockSize=BLOCK_SIZE)
+            complete = dump.run(ecu,attempts=DUMP_ATTEMPTS,pipelined=PIPELINED_DUMP)
+            dump.close()
+            if complete:
+                ih.loadbin(binfilename,offset=start)
             else:
-                log("Dump of {} Failed, no data received".format(area),LOG_ERROR)
+                log("Dump of {} Failed, Insuffient data received (ECU may have only 256 kB Flash). Run again to resume".format(area),LOG_ERROR)
         ih.tofile(hexfilename, format='hex')
              
 if __name__ == '__main__':
@@ -59,10 +65,13 @@ if __name__ == '__main__':
     Path("DUMP/BIN").mkdir(parents=True, exist_ok=True)
     
     #Dump all readable memory area.
-    dumpECUMemory(ECUA,"DUMP/DUMP_ECUA.hex", "DUMP/BIN/ECUA")
-    dumpECUMemory(ECUB,"DUMP/DUMP_ECUB.hex", "DUMP/BIN/ECUB")
-    dumpECUMemory(ECUC,"DUMP/DUMP_ECUC.hex", "DUMP/BIN/ECUC")
-    dumpECUMemory(ECUD,"DUMP/DUMP_ECUD.hex", "DUMP/BIN/ECUD")
+    if PARALLEL_DUMP:
+        runConcurrently(tp,[lambda ecu=ecu: dumpECUMemory(ecu,"DUMP/DUMP_ECU{}.hex".format(ecu.name), "DUMP/BIN/ECU{}".format(ecu.name)) for ecu in (ECUA,ECUB,ECUC,ECUD)])
+    else:
+        dumpECUMemory(ECUA,"DUMP/DUMP_ECUA.hex", "DUMP/BIN/ECUA")
+        dumpECUMemory(ECUB,"DUMP/DUMP_ECUB.hex", "DUMP/BIN/ECUB")
+        dumpECUMemory(ECUC,"DUMP/DUMP_ECUC.hex", "DUMP/BIN/ECUC")
+        dumpECUMemory(ECUD,"DUMP/DUMP_ECUD.hex", "DUMP/BIN/ECUD")
     
     #Close the programming session (re-enable periodic sending)
     ECUA.close(reset=False)
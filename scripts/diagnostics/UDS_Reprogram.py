@@ -12,6 +12,15 @@ import os
 
 VERIFY_AFTER_PROGRAMMING = False
 
+#Compare CRCs computed by the ECUs instead of uploading their firmware (much faster, differing areas are still located)
+CRC_VERIFY = True
+
+#Reprogram (and verify) ECUs B, C and D at the same time (total time is about that of the slowest ECU)
+PARALLEL_PROGRAMMING = False
+
+#Only erase and send the pages that differ from the firmware currently in the alternative bank (falls back to full reprogramming if not supported by the ECU)
+DIFFERENTIAL_PROGRAMMING = False
+
 #Function to reprogram an ECU with specified firmware.
 def reprogramECU(ecu,firmwarePath,requestSwap=True):
     if os.path.exists(RAMN_Utils.ECUB_FIRMWARE_PATH): 
@@ -20,7 +29,7 @@ def reprogramECU(ecu,firmwarePath,requestSwap=True):
         log("Did not find ECU {} Firmware Path: {}, skipping".format(ecu,firmwarePath),LOG_DATA)
         return
         
-    if ecu.reprogram(firmwarePath,swap=requestSwap):
+    if ecu.reprogram(firmwarePath,swap=requestSwap,differential=DIFFERENTIAL_PROGRAMMING):
         log("Reprogramming of ECU {} Succeeded".format(ecu.name),LOG_OUTPUT)
     else:
         log("Reprogramming of ECU {} Failed".format(ecu.name),LOG_ERROR)
@@ -35,7 +44,7 @@ def verifyECU(ecu,firmwarePath):
         log("Did not find ECU {} Firmware Path: {}, skipping".format(ecu,firmwarePath),LOG_DATA)
         return
         
-    if ecu.verify(firmwarePath): 
+    if ecu.verify(firmwarePath,useCRC=CRC_VERIFY): 
         log("ECU {} Firmware Verify Succeeded".format(ecu.name),LOG_OUTPUT)
     else:
         log("ECU {} Firmware Verify Failed".format(ecu.name),LOG_ERROR)
@@ -65,17 +74,23 @@ if __name__ == '__main__':
   
     #Reprogram every ECU except A
     log("Reprogramming ECUs B C D",LOG_OUTPUT)
-    reprogramECU(ECUB, ECUB_Firmware_Path)
-    reprogramECU(ECUC, ECUC_Firmware_Path)
-    reprogramECU(ECUD, ECUD_Firmware_Path)
+    if PARALLEL_PROGRAMMING:
+        runConcurrently(tp,[lambda: reprogramECU(ECUB, ECUB_Firmware_Path), lambda: reprogramECU(ECUC, ECUC_Firmware_Path), lambda: reprogramECU(ECUD, ECUD_Firmware_Path)])
+    else:
+        reprogramECU(ECUB, ECUB_Firmware_Path)
+        reprogramECU(ECUC, ECUC_Firmware_Path)
+        reprogramECU(ECUD, ECUD_Firmware_Path)
 
     #Verify firmware of each ECU
     if VERIFY_AFTER_PROGRAMMING:
         log("----------------------------",LOG_OUTPUT)
         log("Verifying Software ECUs (Except ECU A)",LOG_OUTPUT)
-        verifyECU(ECUB, ECUB_Firmware_Path)
-        verifyECU(ECUC, ECUC_Firmware_Path)
-        verifyECU(ECUD, ECUD_Firmware_Path)
+        if PARALLEL_PROGRAMMING:
+            runConcurrently(tp,[lambda: verifyECU(ECUB, ECUB_Firmware_Path), lambda: verifyECU(ECUC, ECUC_Firmware_Path), lambda: verifyECU(ECUD, ECUD_Firmware_Path)])
+        else:
+            verifyECU(ECUB, ECUB_Firmware_Path)
+            verifyECU(ECUC, ECUC_Firmware_Path)
+            verifyECU(ECUD, ECUD_Firmware_Path)
 
     log("Reprogramming ECU A",LOG_OUTPUT)
     ECUA.setUpForProgramming()
@@ -84,7 +99,7 @@ if __name__ == '__main__':
     #Ask for a bank swap (will reset ECU A)
     log("Requesting Bank swap for ECU A, will reset",LOG_OUTPUT)
     try:
-        ECUA.routineControl(0x01,0xFF01, recvAnswer=False)
+        ECUA.swapBanks()
         time.sleep(2)
         ramn.close(reset=True) 
     except:
@@ -9,6 +9,9 @@ import sys
 sys.path.append("..")
 from utils.RAMN_Diag_Main import *
 import os
+
+#Compare CRCs computed by the ECUs instead of uploading their firmware (much faster, differing areas are still located)
+CRC_VERIFY = True
         
 #Function to verify that provided firmware is correctly flashed in the ECU.
 def verifyECU(ecu,firmwarePath):
@@ -18,7 +21,7 @@ def verifyECU(ecu,firmwarePath):
         log("Did not find ECU {} Firmware Path: {}, skipping".format(ecu,firmwarePath),LOG_DATA)
         return False
         
-    if ecu.verify(firmwarePath): 
+    if ecu.verify(firmwarePath,useCRC=CRC_VERIFY): 
         log("ECU {} Firmware Verify Succeeded".format(ecu.name),LOG_OUTPUT)
         return True
     else:
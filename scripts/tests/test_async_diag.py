@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Tests for the asyncio diagnostics front-end (RAMN_Async_Diag.py).
+
+Validates that:
+- Requests to several ECUs can be awaited concurrently on one board.
+- Each handler receives the answer of its own ECU.
+- A request without answer times out with None.
+- Synchronous and asyncio UDS handlers send the same requests and parse
+  answers the same way.
+- Writes to a port that is not read do not block the event loop (checked
+  with a real pty opened by pyserial).
+"""
+
+import sys
+import os
+import asyncio
+import pty
+import time
+import unittest
+
+_scripts_dir = os.path.normpath(
+    os.path.join(os.path.dirname(__file__), "..")
+)
+if _scripts_dir not in sys.path:
+    sys.path.insert(0, _scripts_dir)
+
+import serial
+
+from utils.RAMN_Async_Diag import (
+    RAMN_Async_Transport, getAsyncECUHandlersUDS, RAMN_USB_Handler,
+    RAMN_ISOTP_Handler, RAMN_UDS_Handler, RAMN_Async_UDS_Handler, RAMN_Utils,
+)
+
+
+class FakeSerial:
+    """Serial port answering UDS ReadDataByIdentifier with the ECU's CAN ID."""
+
+    def __init__(self, silent=()):
+        self.timeout = None
+        self.out_waiting = 0
+        self.rx = bytearray()
+        self.silent = silent
+
+    @property
+    def in_waiting(self):
+        return len(self.rx)
+
+    def read(self, n):
+        data = bytes(self.rx[:n])
+        del self.rx[:n]
+        return data
+
+    def write(self, data):
+        for line in bytes(data).split(b"\r"):
+            if line.startswith(b"t") and len(line) >= 9:
+                txid = int(line[1:4], 16)
+                if line[5:9] == b"0322" and txid not in self.silent:
+                    did = line[9:13].decode()
+                    self.rx += "t{:03x}60562{}{:04x}\r".format(
+                        txid + 8, did, txid).encode()
+
+
+class TestAsyncUDS(unittest.TestCase):
+
+    def setUp(self):
+        RAMN_Utils.setVerboseLevel(0)
+
+    def _run(self, coro_fn, silent=()):
+        ramn = RAMN_USB_Handler("fake")
+        ramn.ser = FakeSerial(silent)
+        tp = RAMN_ISOTP_Handler(ramn, {0x7E9: 0x7E1, 0x7EA: 0x7E2, 0x7EB: 0x7E3})
+
+        async def main():
+            transport = RAMN_Async_Transport(ramn, tp)
+            await transport.start()
+            try:
+                return await coro_fn(getAsyncECUHandlersUDS(transport))
+            finally:
+                transport.stop()
+
+        return asyncio.run(main())
+
+    def test_concurrent_requests(self):
+        async def scenario(ecus):
+            _, b, c, d = ecus
+            return await asyncio.gather(
+                b.readDataByIdentifier(0xF190),
+                c.readDataByIdentifier(0xF190),
+                d.readDataByIdentifier(0xF190))
+
+        self.assertEqual(self._run(scenario),
+                         [[0x07, 0xE1], [0x07, 0xE2], [0x07, 0xE3]])
+
+    def test_timeout(self):
+        async def scenario(ecus):
+            _, b, c, _ = ecus
+            return await asyncio.gather(
+                b.sendRawData([0x22, 0xF1, 0x90], timeout=0.05),
+                c.sendRawData([0x22, 0xF1, 0x90], timeout=0.05))
+
+        missing, answer = self._run(scenario, silent=(0x7E1,))
+        self.assertIsNone(missing)
+        self.assertEqual(list(answer), [0x62, 0xF1, 0x90, 0x07, 0xE2])
+
+
+def answer(request):
+    """Positive answer of a fake ECU to a UDS request."""
+    request = bytes(request)
+    if request[0] == 0x27:
+        return bytes([0x67, request[1], 0x10, 0x20, 0x30, 0x40])
+    if request[0] == 0x22:
+        return bytes([0x62]) + request[1:3] + b"VIN42\x00"
+    if request[0] == 0x23:
+        return bytes([0x63]) + bytes(request[6] * 256 + request[7])
+    if request[0] == 0x31:
+        return bytes([0x71]) + request[1:4] + bytes([0xDE, 0xAD, 0xBE, 0xEF])
+    return bytes([request[0] + 0x40])
+
+
+class SyncECU(RAMN_UDS_Handler):
+
+    def __init__(self):
+        RAMN_UDS_Handler.__init__(self, None, None, 0x7E1, 0x7E9)
+        self.sent = []
+
+    def sendRawData(self, toSend, timeout=1, recvAnswer=True):
+        self.sent.append(bytes(toSend))
+        return answer(toSend)
+
+
+class AsyncECU(RAMN_Async_UDS_Handler):
+
+    def __init__(self):
+        RAMN_Async_UDS_Handler.__init__(self, None, 0x7E1, 0x7E9)
+        self.sent = []
+
+    async def sendRawData(self, toSend, timeout=1, recvAnswer=True):
+        self.sent.append(bytes(toSend))
+        return answer(toSend)
+
+
+class TestSharedEncoding(unittest.TestCase):
+
+    def setUp(self):
+        RAMN_Utils.setVerboseLevel(0)
+
+    def test_same_requests_and_results(self):
+        def operations(ecu):
+            return [
+                lambda: ecu.performSecurityAccess(0x01),
+                lambda: ecu.readVIN(),
+                lambda: ecu.getCRC32(0x08000000, 0x100),
+                lambda: ecu.requestDownload(0x08001000, 0x800),
+                lambda: ecu.dumpArea(0x08000000, 0x08000030, blockSize=0x20),
+            ]
+
+        sync = SyncECU()
+        expected = [op() for op in operations(sync)]
+        ecu = AsyncECU()
+
+        async def main():
+            return [await op() for op in operations(ecu)]
+
+        self.assertEqual(asyncio.run(main()), expected)
+        self.assertEqual(ecu.sent, sync.sent)
+        self.assertEqual(expected[1], "VIN42")
+        self.assertEqual(expected[2], 0xDEADBEEF)
+        self.assertEqual(len(expected[4]), 0x30)
+        self.assertEqual(sync.sent[1], b"\x27\x02\x02\x14\x66\x38")
+
+
+class TestNonBlockingWrites(unittest.TestCase):
+
+    def setUp(self):
+        RAMN_Utils.setVerboseLevel(0)
+
+    def test_stalled_port(self):
+        master, slave = pty.openpty()
+        self.addCleanup(os.close, master)
+        self.addCleanup(os.close, slave)
+        ramn = RAMN_USB_Handler("fake")
+        ramn.ser = serial.Serial(os.ttyname(slave))
+        self.addCleanup(ramn.ser.close)
+        tp = RAMN_ISOTP_Handler(ramn, {0x7E9: 0x7E1})
+        command = b"t1238" + b"00" * 8
+        count = 0x40000 // (len(command) + 1)
+
+        async def main():
+            transport = RAMN_Async_Transport(ramn, tp)
+            await transport.start()
+            try:
+                # Nothing reads the port: commands must be queued, not block
+                start = time.monotonic()
+                for _ in range(count):
+                    ramn.sendCommand(command)
+                    ramn.flushTX()
+                self.assertLess(time.monotonic() - start, 5.0)
+                self.assertTrue(transport.writing)
+                # Once the other end reads, the event loop writes the rest
+                received = bytearray()
+                os.set_blocking(master, False)
+                while len(received) < count * (len(command) + 1):
+                    await asyncio.sleep(0.001)
+                    try:
+                        received += os.read(master, 0x10000)
+                    except BlockingIOError:
+                        pass
+                    self.assertLess(time.monotonic() - start, 10.0)
+                self.assertEqual(bytes(received), (command + b"\r") * count)
+                self.assertFalse(transport.writing)
+            finally:
+                transport.stop()
+
+        asyncio.run(main())
+
+
+if __name__ == "__main__":
+    unittest.main()
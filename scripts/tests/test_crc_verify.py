@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Tests for the CRC based firmware verification (RAMN_UDS_Handler.verify with useCRC=True).
+
+Validates that:
+- A matching firmware is verified with a single CRC request.
+- Differing areas are located by bisection, and adjacent areas are merged.
+"""
+
+import sys
+import os
+import tempfile
+import unittest
+import zlib
+
+_scripts_dir = os.path.normpath(
+    os.path.join(os.path.dirname(__file__), "..")
+)
+if _scripts_dir not in sys.path:
+    sys.path.insert(0, _scripts_dir)
+
+import intelhex
+
+from utils.RAMN_UDS_Handler import RAMN_UDS_Handler, RAMN_Utils
+
+START = 0x08000000
+
+
+class FakeECU(RAMN_UDS_Handler):
+    """UDS handler computing CRCs over an in-memory firmware."""
+
+    def __init__(self, flash):
+        RAMN_UDS_Handler.__init__(self, None, None, 0x7E1, 0x7E9, name="B")
+        self.flash = flash
+        self.requests = 0
+
+    def getCRC32(self, address, size):
+        self.requests += 1
+        return zlib.crc32(self.flash[address - START:address - START + size])
+
+
+class TestCRCVerify(unittest.TestCase):
+
+    def setUp(self):
+        RAMN_Utils.setVerboseLevel(0)
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "fw.hex")
+        self.image = bytes((i * 13) & 0xFF for i in range(0x10000))
+        ih = intelhex.IntelHex()
+        ih.frombytes(self.image, offset=START)
+        ih.write_hex_file(self.path)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_match(self):
+        ecu = FakeECU(bytearray(self.image))
+        self.assertTrue(ecu.verify(self.path, useCRC=True))
+        self.assertEqual(ecu.requests, 1)
+
+    def test_mismatch(self):
+        flash = bytearray(self.image)
+        flash[0x1234] ^= 1
+        flash[0x80FF] ^= 1
+        flash[0x8100] ^= 1
+        ecu = FakeECU(flash)
+        self.assertFalse(ecu.verify(self.path, useCRC=True))
+        self.assertEqual(ecu.findMismatchedAreas(START, self.image),
+                         [(START + 0x1200, START + 0x1300), (START + 0x8000, START + 0x8200)])
+        self.assertLess(ecu.requests, 64)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Tests for differential reprogramming (RAMN_UDS_Handler.reprogram with differential=True).
+
+Validates that:
+- Only the pages that differ from the alternative firmware are erased and sent.
+- An unchanged firmware sends nothing and uses the forced bank swap.
+- ECUs without the page erase routine fall back to a full reprogram.
+- A page transfer that times out fails the reprogram, and banks are not swapped.
+"""
+
+import sys
+import os
+import tempfile
+import unittest
+import zlib
+
+_scripts_dir = os.path.normpath(
+    os.path.join(os.path.dirname(__file__), "..")
+)
+if _scripts_dir not in sys.path:
+    sys.path.insert(0, _scripts_dir)
+
+import intelhex
+
+from utils.RAMN_UDS_Handler import (
+    RAMN_UDS_Handler, RAMN_Utils, listToInt32, int32ToList,
+    FLASH_START, FLASH_BANK_OFFSET, FLASH_PAGE_SIZE,
+)
+
+BANK_SIZE = FLASH_BANK_OFFSET
+
+
+class FakeECU(RAMN_UDS_Handler):
+    """UDS handler answering routines and transfers from an in-memory dual bank flash."""
+
+    def __init__(self, pageErase=True):
+        RAMN_UDS_Handler.__init__(self, None, None, 0x7E1, 0x7E9, name="B")
+        self.flash = bytearray(b"\xff" * (2 * BANK_SIZE))
+        self.pageErase = pageErase
+        self.routines = []
+        self.sent = 0
+        self.download = None
+        self.validated = False
+
+    def routineControl(self, action, subroutine, parameters=[], recvAnswer=True):
+        self.routines.append(subroutine)
+        if subroutine == 0x0206:
+            o = listToInt32(parameters[:4]) - FLASH_START
+            return int32ToList(zlib.crc32(self.flash[o:o + listToInt32(parameters[4:8])]))
+        if subroutine == 0xFF00:
+            self.flash[BANK_SIZE:] = b"\xff" * BANK_SIZE
+        elif subroutine == 0x0212:
+            if not self.pageErase:
+                return None
+            o = listToInt32(parameters[:4]) - FLASH_START
+            self.flash[BANK_SIZE + o:BANK_SIZE + o + listToInt32(parameters[4:8])] = b"\xff" * listToInt32(parameters[4:8])
+        elif subroutine == 0xFF01 and not self.validated:
+            return None
+        return []
+
+    def requestDownload(self, address, size):
+        self.download = BANK_SIZE + address - FLASH_START
+        self.validated = False
+        return []
+
+    def transferDataDownload(self, data, chunkSize):
+        if self.flash[self.download:self.download + len(data)] != b"\xff" * len(data):
+            return None
+        self.flash[self.download:self.download + len(data)] = data
+        self.sent += len(data)
+        return []
+
+    def requestTransferExit(self):
+        self.validated = True
+        return []
+
+
+class TestDifferentialReprogram(unittest.TestCase):
+
+    def setUp(self):
+        RAMN_Utils.setVerboseLevel(0)
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "fw.hex")
+        self.image = bytes((i * 7) & 0xFF for i in range(0x5000))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _write(self, image):
+        ih = intelhex.IntelHex()
+        ih.frombytes(image, offset=FLASH_START)
+        ih.write_hex_file(self.path)
+        stat = os.stat(self.path)
+        os.utime(self.path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000))
+
+    def _reprogram(self, ecu, image):
+        self._write(image)
+        ecu.sent = 0
+        ecu.routines = []
+        self.assertTrue(ecu.reprogram(self.path, copyEEPROM=False, swap=False, differential=True))
+        self.assertEqual(bytes(ecu.flash[BANK_SIZE:BANK_SIZE + len(image)]), image)
+
+    def test_changed_pages_only(self):
+        ecu = FakeECU()
+        self._reprogram(ecu, self.image)
+        self.assertEqual(ecu.sent, len(self.image))
+        changed = bytearray(self.image)
+        changed[3 * FLASH_PAGE_SIZE + 5] ^= 0xFF
+        self._reprogram(ecu, bytes(changed))
+        self.assertEqual(ecu.sent, FLASH_PAGE_SIZE)
+        self.assertNotIn(0xFF00, ecu.routines)
+        self.assertEqual(ecu.swapRoutine, 0xFF01)
+
+    def test_unchanged(self):
+        ecu = FakeECU()
+        self._reprogram(ecu, self.image)
+        self._reprogram(ecu, self.image)
+        self.assertEqual(ecu.sent, 0)
+        self.assertEqual(ecu.swapRoutine, 0x0211)
+
+    def test_fallback(self):
+        ecu = FakeECU(pageErase=False)
+        self._reprogram(ecu, self.image)
+        self.assertIn(0xFF00, ecu.routines)
+        self.assertEqual(ecu.sent, len(self.image))
+
+    def test_transfer_timeout(self):
+        ecu = FakeECU()
+        self._reprogram(ecu, self.image)
+        # Transfer Data requests of the next download get no answer
+        ecu.transferDataDownload = lambda data, chunkSize: RAMN_UDS_Handler.transferDataDownload(ecu, data, chunkSize)
+        ecu.sendRawData = lambda toSend, timeout=1, recvAnswer=True: None
+        changed = bytearray(self.image)
+        changed[5] ^= 0xFF
+        self._write(bytes(changed))
+        ecu.routines = []
+        self.assertFalse(ecu.reprogram(self.path, copyEEPROM=False, differential=True))
+        self.assertIn(0x0212, ecu.routines)
+        self.assertNotIn(0xFF01, ecu.routines)
+        self.assertNotIn(0x0211, ecu.routines)
+
+
+if __name__ == "__main__":
+    unittest.main()
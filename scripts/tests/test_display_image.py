@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Tests for the image helpers used by RAMN_UDS_Handler.displayImage and
+RAMN_UDS_Handler.displayFrames.
+
+Validates that:
+- The one-pass conversion produces the same bytes as the per-pixel formula
+  expected by the screen of ECU A.
+- Only the changed parts of a frame are turned into 0x41 strips.
+"""
+
+import sys
+import os
+import random
+import unittest
+
+_scripts_dir = os.path.normpath(
+    os.path.join(os.path.dirname(__file__), "..")
+)
+if _scripts_dir not in sys.path:
+    sys.path.insert(0, _scripts_dir)
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+from utils.RAMN_UDS_Handler import (
+    imageToRGB565, displayStrips, dirtyRectangles, quantizeRGB565,
+    DISPLAY_STARTX, DISPLAY_STARTY,
+)
+
+
+def _reference(image):
+    out = bytearray()
+    for y in range(image.size[1]):
+        for x in range(image.size[0]):
+            r, g, b = image.getpixel((x, y))
+            rgb565 = ((r >> 3) << 11) | ((g >> 2) << 5) | (b >> 3)
+            out += bytes([rgb565 & 0xFF, (rgb565 >> 8) & 0xFF])
+    return bytes(out)
+
+
+@unittest.skipUnless(Image is not None, "Pillow not installed")
+class TestImageToRGB565(unittest.TestCase):
+
+    def test_matches_per_pixel_formula(self):
+        rng = random.Random(0)
+        image = Image.new("RGB", (23, 9))
+        image.putdata([(rng.randrange(256), rng.randrange(256), rng.randrange(256))
+                       for _ in range(23 * 9)])
+        self.assertEqual(imageToRGB565(image), _reference(image))
+
+    def test_primary_colors(self):
+        image = Image.new("RGB", (3, 1))
+        image.putdata([(255, 0, 0), (0, 255, 0), (0, 0, 255)])
+        self.assertEqual(imageToRGB565(image), b"\x00\xf8\xe0\x07\x1f\x00")
+
+
+class TestDisplayStrips(unittest.TestCase):
+
+    def test_full_image_strips(self):
+        pixels = bytes(range(10 * 2)) * 19
+        strips = list(displayStrips(pixels, 10, 0, 0, 10, 19))
+        self.assertEqual([s[4] for s in strips], [8, 8, 3])
+        self.assertEqual(strips[0][:4], bytes([0x41, DISPLAY_STARTX, DISPLAY_STARTY, 10]))
+        self.assertEqual(b"".join(s[5:] for s in strips), pixels)
+
+    def test_sub_rectangle(self):
+        width = 4
+        pixels = bytes(range(width * 2 * 3))
+        strips = list(displayStrips(pixels, width, 1, 1, 2, 2))
+        self.assertEqual(len(strips), 1)
+        self.assertEqual(strips[0][:5], bytes([0x41, DISPLAY_STARTX + 1, DISPLAY_STARTY + 1, 2, 2]))
+        self.assertEqual(strips[0][5:], pixels[10:14] + pixels[18:22])
+
+
+@unittest.skipUnless(Image is not None, "Pillow not installed")
+class TestDirtyRectangles(unittest.TestCase):
+
+    def test_unchanged_frame(self):
+        image = quantizeRGB565(Image.new("RGB", (30, 20), (10, 20, 30)))
+        self.assertEqual(dirtyRectangles(image, image.copy()), [])
+
+    def test_changes_below_rgb565_precision_are_ignored(self):
+        before = quantizeRGB565(Image.new("RGB", (30, 20), (8, 4, 8)))
+        after = quantizeRGB565(Image.new("RGB", (30, 20), (9, 5, 9)))
+        self.assertEqual(dirtyRectangles(after, before), [])
+
+    def test_one_rectangle_per_band(self):
+        before = Image.new("RGB", (30, 20))
+        after = before.copy()
+        after.putpixel((3, 2), (255, 255, 255))
+        after.putpixel((20, 12), (255, 255, 255))
+        self.assertEqual(dirtyRectangles(after, before),
+                         [(3, 2, 1, 1), (20, 12, 1, 1)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Tests for the hex file loader (RAMN_Utils.getDownloadData).
+
+Validates that:
+- Gaps between segments and the 8-byte alignment are padded with 0xFF.
+- Loaded files are cached until their modification time or size changes.
+"""
+
+import sys
+import os
+import tempfile
+import unittest
+
+_scripts_dir = os.path.normpath(
+    os.path.join(os.path.dirname(__file__), "..")
+)
+if _scripts_dir not in sys.path:
+    sys.path.insert(0, _scripts_dir)
+
+import intelhex
+
+from utils.RAMN_Utils import getDownloadData
+
+
+def _write_hex(path, segments):
+    ih = intelhex.IntelHex()
+    for addr, data in segments:
+        for i, b in enumerate(data):
+            ih[addr + i] = b
+    ih.write_hex_file(path)
+
+
+class TestGetDownloadData(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "fw.hex")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_padding(self):
+        _write_hex(self.path, [(0x08000000, b"\x01\x02"), (0x08000010, b"\x03")])
+        addr, size, data = getDownloadData(self.path)
+        self.assertEqual(addr, 0x08000000)
+        self.assertEqual(size, 0x18)
+        self.assertEqual(bytes(data), b"\x01\x02" + b"\xff" * 14 + b"\x03" + b"\xff" * 7)
+
+    def test_single_segment(self):
+        _write_hex(self.path, [(0x08000000, bytes(range(8)))])
+        self.assertEqual(bytes(getDownloadData(self.path)[2]), bytes(range(8)))
+
+    def test_invalid_range(self):
+        _write_hex(self.path, [(0x00001000, b"\x00")])
+        self.assertEqual(getDownloadData(self.path), (None, None, None))
+
+    def test_cache(self):
+        _write_hex(self.path, [(0x08000000, b"\x01" * 8)])
+        first = getDownloadData(self.path)
+        self.assertIs(getDownloadData(self.path), first)
+        _write_hex(self.path, [(0x08000000, b"\x02" * 16)])
+        stat = os.stat(self.path)
+        os.utime(self.path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000))
+        self.assertEqual(bytes(getDownloadData(self.path)[2]), b"\x02" * 16)
+
+
+if __name__ == "__main__":
+    unittest.main()
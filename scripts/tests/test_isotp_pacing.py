@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Tests for ISO-TP separation time handling (RAMN_ISOTP_Handler.py).
+
+Validates that:
+- STmin bytes are converted to seconds, including 100-900 us values.
+- Consecutive frames are held back until the separation time has elapsed,
+  without blocking the caller.
+"""
+
+import sys
+import os
+import time
+import unittest
+
+_scripts_dir = os.path.normpath(
+    os.path.join(os.path.dirname(__file__), "..")
+)
+if _scripts_dir not in sys.path:
+    sys.path.insert(0, _scripts_dir)
+
+from utils.RAMN_ISOTP_Handler import ISOTPTXFormatter, STminToSeconds
+
+
+class TestSTminToSeconds(unittest.TestCase):
+
+    def test_milliseconds(self):
+        self.assertEqual(STminToSeconds(0x00), 0)
+        self.assertAlmostEqual(STminToSeconds(0x7F), 0.127)
+
+    def test_microseconds(self):
+        self.assertAlmostEqual(STminToSeconds(0xF1), 0.0001)
+        self.assertAlmostEqual(STminToSeconds(0xF9), 0.0009)
+
+    def test_reserved_values(self):
+        self.assertAlmostEqual(STminToSeconds(0x80), 0.127)
+        self.assertAlmostEqual(STminToSeconds(0xFA), 0.127)
+
+
+class TestTXPacing(unittest.TestCase):
+
+    def _started(self, st):
+        formatter = ISOTPTXFormatter(list(range(20)), txid=0x7E1, rxid=0x7E9)
+        self.assertTrue(formatter.getNextTXMsg().startswith("t7e181"))
+        formatter.receivedFC = True
+        formatter.targetST = st
+        return formatter
+
+    def test_no_separation_time(self):
+        formatter = self._started(0)
+        self.assertIsNotNone(formatter.getNextTXMsg())
+        self.assertIsNotNone(formatter.getNextTXMsg())
+        self.assertTrue(formatter.isFinished())
+
+    def test_frame_held_until_deadline(self):
+        formatter = self._started(0x32)  # 50 ms
+        start = time.perf_counter()
+        self.assertIsNotNone(formatter.getNextTXMsg())
+        self.assertIsNone(formatter.getNextTXMsg())
+        self.assertLess(time.perf_counter() - start, 0.04)
+        self.assertGreater(formatter.getTXDelay(time.perf_counter()), 0)
+        time.sleep(0.05)
+        self.assertEqual(formatter.getTXDelay(time.perf_counter()), 0)
+        self.assertIsNotNone(formatter.getNextTXMsg())
+        self.assertTrue(formatter.isFinished())
+        self.assertIsNone(formatter.getTXDelay(time.perf_counter()))
+
+
+if __name__ == "__main__":
+    unittest.main()
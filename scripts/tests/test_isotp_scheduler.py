@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Tests for the ISO-TP scheduler (RAMN_ISOTP_Handler.startScheduler) and
+RAMN_Diag_Main.runConcurrently.
+
+Validates that:
+- Two sessions with different block sizes and separation times are
+  interleaved on the link, each following its own peer's flow control.
+- Flow Control frames are routed to the session of their CAN ID.
+- runConcurrently stops the scheduler and the reader it started, even when
+  it fails, and leaves them running if they already were.
+"""
+
+import sys
+import os
+import threading
+import time
+import unittest
+
+_scripts_dir = os.path.normpath(
+    os.path.join(os.path.dirname(__file__), "..")
+)
+if _scripts_dir not in sys.path:
+    sys.path.insert(0, _scripts_dir)
+
+from utils.RAMN_Diag_Main import (
+    RAMN_USB_Handler, RAMN_ISOTP_Handler, RAMN_Utils, runConcurrently,
+)
+from utils.RAMN_SLCAN import SLCANFrame
+
+# TX ID -> (RX ID, block size, STmin byte)
+ECUS = {0x7E1: (0x7E9, 2, 0x00), 0x7E2: (0x7EA, 0, 0x05)}
+
+
+class FakeBoard:
+    """Serial port of a board with two ECUs receiving multi-frame requests."""
+
+    def __init__(self):
+        self.timeout = None
+        self.out_waiting = 0
+        self.rx = bytearray()
+        self.cond = threading.Condition()
+        self.frames = []  # (time, TX ID, PCI byte) of each frame received
+        self.errors = []
+        self.blocks = {tx: 0 for tx in ECUS}
+
+    @property
+    def in_waiting(self):
+        with self.cond:
+            return len(self.rx)
+
+    def read(self, n):
+        with self.cond:
+            self.cond.wait_for(lambda: len(self.rx) > 0, self.timeout)
+            data = bytes(self.rx[:n])
+            del self.rx[:n]
+            return data
+
+    def _answer(self, line):
+        with self.cond:
+            self.rx += line.encode() + b"\r"
+            self.cond.notify_all()
+
+    def write(self, data):
+        now = time.perf_counter()
+        for line in bytes(data).split(b"\r"):
+            if not line.startswith(b"t") or int(line[1:4], 16) not in ECUS:
+                continue
+            tx = int(line[1:4], 16)
+            rx, bs, st = ECUS[tx]
+            pci = int(line[5:7], 16)
+            self.frames.append((now, tx, pci))
+            if pci & 0xF0 == 0x10:
+                self._answer("t{:03x}330{:02x}{:02x}".format(rx, bs, st))
+            elif pci & 0xF0 == 0x20:
+                self.blocks[tx] += 1
+                if bs != 0 and self.blocks[tx] > bs:
+                    self.errors.append("block size exceeded for {:03x}".format(tx))
+                sent = [f for f in self.frames if f[1] == tx]
+                if len(sent) == 6:  # First Frame and 5 Consecutive Frames
+                    self._answer("t{:03x}201aa".format(rx))
+                elif bs != 0 and self.blocks[tx] == bs:
+                    self.blocks[tx] = 0
+                    self._answer("t{:03x}330{:02x}{:02x}".format(rx, bs, st))
+
+
+class TestScheduler(unittest.TestCase):
+
+    def setUp(self):
+        RAMN_Utils.setVerboseLevel(0)
+        self.ramn = RAMN_USB_Handler("fake")
+        self.ramn.ser = FakeBoard()
+        self.tp = RAMN_ISOTP_Handler(self.ramn, {rx: tx for tx, (rx, _, _) in ECUS.items()})
+        self.addCleanup(self.ramn.stopReader)
+        self.addCleanup(self.tp.stopScheduler)
+
+    def test_interleaved_sessions(self):
+        self.tp.startScheduler()
+        for tx, (rx, _, _) in ECUS.items():
+            self.tp.sendFrame(bytes(range(40)), tx, rx)
+        for tx, (rx, _, _) in ECUS.items():
+            self.assertEqual(self.tp.waitResponse(rx, timeout=2.0), [0xAA])
+        board = self.ramn.ser
+        self.assertEqual(board.errors, [])
+        order = [tx for _, tx, _ in board.frames]
+        # Frames of both sessions alternate on the link
+        first_done = min(max(i for i, tx in enumerate(order) if tx == t) for t in ECUS)
+        self.assertEqual(len(set(order[:first_done + 1])), 2)
+        # Consecutive frames of the paced session respect its STmin (5 ms)
+        times = [t for t, tx, pci in board.frames if tx == 0x7E2 and pci & 0xF0 == 0x20]
+        self.assertEqual(len(times), 5)
+        for a, b in zip(times, times[1:]):
+            self.assertGreaterEqual(b - a, 0.004)
+
+    def test_flow_control_routing(self):
+        for tx, (rx, _, _) in ECUS.items():
+            self.tp.sendFrame(bytes(range(40)), tx, rx)
+        self.tp.processTX()  # First Frames
+        self.tp.processRX(SLCANFrame(0x7EA, b"\x30\x03\x05", False, False,
+                                     False, False, False, None))
+        paced = self.tp.txList[0x7E2]
+        waiting = self.tp.txList[0x7E1]
+        self.assertTrue(paced.receivedFC)
+        self.assertEqual((paced.targetBS, paced.targetST), (3, 5))
+        self.assertFalse(waiting.receivedFC)
+        self.assertEqual((waiting.targetBS, waiting.targetST), (0, 0))
+
+
+class BrokenTasks(list):
+    """Task list that fails once the scheduler is running."""
+
+    def __len__(self):
+        raise RuntimeError("broken")
+
+
+class TestRunConcurrently(unittest.TestCase):
+
+    def setUp(self):
+        RAMN_Utils.setVerboseLevel(0)
+        self.ramn = RAMN_USB_Handler("fake")
+        self.ramn.ser = FakeBoard()
+        self.tp = RAMN_ISOTP_Handler(self.ramn, {0x7E9: 0x7E1})
+        self.addCleanup(self.ramn.stopReader)
+        self.addCleanup(self.tp.stopScheduler)
+
+    def test_results_and_stop(self):
+        running = lambda: self.tp.schedulerThread is not None
+        self.assertEqual(runConcurrently(self.tp, [running, lambda: 2]), [True, 2])
+        self.assertIsNone(self.tp.schedulerThread)
+        self.assertIsNone(self.ramn.readerThread)
+
+    def test_stopped_on_failure(self):
+        with self.assertRaises(RuntimeError):
+            runConcurrently(self.tp, BrokenTasks())
+        self.assertIsNone(self.tp.schedulerThread)
+        self.assertIsNone(self.ramn.readerThread)
+
+    def test_previous_state_kept(self):
+        self.tp.startScheduler()
+        runConcurrently(self.tp, [lambda: None])
+        self.assertIsNotNone(self.tp.schedulerThread)
+        self.assertIsNotNone(self.ramn.readerThread)
+
+
+if __name__ == "__main__":
+    unittest.main()
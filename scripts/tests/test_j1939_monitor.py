@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Tests for the J1939 topology monitor (RAMN_J1939_Monitor.py).
+
+Validates that:
+- Starting the monitor seeds the SA table with NAMEs and ECU-IDs.
+- Address claim conflicts, Cannot Claim Address and new SAs are reported.
+- ECU-ID transfers interrupted by another BAM or an abort are discarded.
+- Silent entries are re-probed within the bus-load budget, and reported
+  as disappeared when they do not answer.
+"""
+
+import sys
+import os
+import time
+import unittest
+
+_scripts_dir = os.path.normpath(
+    os.path.join(os.path.dirname(__file__), "..")
+)
+if _scripts_dir not in sys.path:
+    sys.path.insert(0, _scripts_dir)
+
+from utils.RAMN_J1939_Monitor import J1939Monitor, NULL_SA
+from utils.RAMN_J1939_Scanner import (
+    j1939_make_id,
+    j1939_get_pf,
+    j1939_get_ps,
+    _inter_probe_delay,
+    PF_REQUEST,
+    PF_TP_CM,
+    PF_TP_DT,
+    PF_ADDRESS_CLAIMED,
+    PGN_ADDRESS_CLAIMED,
+    PGN_ECU_ID,
+    TP_CM_BAM,
+    DA_BROADCAST,
+    DEFAULT_BITRATE,
+    DEFAULT_BUSLOAD,
+)
+
+
+class FakeCANMsg:
+    """Minimal CAN message object for testing."""
+
+    def __init__(self, arbitration_id, data, is_extended_id=True):
+        self.arbitration_id = arbitration_id
+        self.data = bytes(data)
+        self.is_extended_id = is_extended_id
+
+
+def _name(sa):
+    return bytes([sa, 0, 0, 0, 0, 0, 0, 0x80])
+
+
+def _ecu_id(sa):
+    return "RAMN*ECU{:02X}*".format(sa).encode()
+
+
+def _addr_claimed(sa, name):
+    return FakeCANMsg(j1939_make_id(6, PF_ADDRESS_CLAIMED, DA_BROADCAST, sa),
+                      name)
+
+
+class FakeJ1939Bus:
+    """ECUs answering Address Claimed and ECU-ID (BAM) requests."""
+
+    def __init__(self, sas):
+        self.ecus = {sa: _name(sa) for sa in sas}
+        self.rx = []
+        self.sent = []  # (time, can_id, data)
+        self.filters = None
+
+    def set_filters(self, filters):
+        self.filters = filters
+
+    def send_fn(self, sock, can_id, data):
+        self.sent.append((time.monotonic(), can_id, data))
+        if j1939_get_pf(can_id) != PF_REQUEST:
+            return
+        da = j1939_get_ps(can_id)
+        pgn = data[0] | (data[1] << 8) | (data[2] << 16)
+        for sa, name in self.ecus.items():
+            if da not in (DA_BROADCAST, sa):
+                continue
+            if pgn == PGN_ADDRESS_CLAIMED:
+                self.rx.append(_addr_claimed(sa, name))
+            elif pgn == PGN_ECU_ID:
+                self.rx.extend(self._bam(sa, _ecu_id(sa)))
+
+    def _bam(self, sa, payload):
+        packets = (len(payload) + 6) // 7
+        cm = bytes([TP_CM_BAM, len(payload), 0, packets, 0xFF,
+                    PGN_ECU_ID & 0xFF, (PGN_ECU_ID >> 8) & 0xFF, 0])
+        frames = [FakeCANMsg(j1939_make_id(7, PF_TP_CM, DA_BROADCAST, sa), cm)]
+        for i in range(packets):
+            chunk = payload[7 * i:7 * i + 7].ljust(7, b"\xff")
+            frames.append(FakeCANMsg(
+                j1939_make_id(7, PF_TP_DT, DA_BROADCAST, sa),
+                bytes([i + 1]) + chunk))
+        return frames
+
+    def recv_fn(self, sock, timeout):
+        if self.rx:
+            return self.rx.pop(0)
+        time.sleep(timeout)
+        return None
+
+    def requests(self, pgn):
+        """(time, DA) of the Requests sent for *pgn*, in order."""
+        return [(t, j1939_get_ps(cid)) for t, cid, data in self.sent
+                if j1939_get_pf(cid) == PF_REQUEST
+                and data == bytes([pgn & 0xFF, (pgn >> 8) & 0xFF,
+                                   (pgn >> 16) & 0xFF])]
+
+
+class TestJ1939Monitor(unittest.TestCase):
+
+    def setUp(self):
+        self.bus = FakeJ1939Bus([0x13, 0x21, 0x2A])
+
+    def _monitor(self, **kwargs):
+        return J1939Monitor(self.bus, send_fn=self.bus.send_fn,
+                            recv_fn=self.bus.recv_fn, **kwargs)
+
+    def test_start_seeds_table(self):
+        monitor = self._monitor()
+        events = monitor.poll(0.05)
+        self.assertEqual(sorted(monitor.table), [0x13, 0x21, 0x2A])
+        for sa, entry in monitor.table.items():
+            self.assertEqual(entry.name, _name(sa))
+            self.assertEqual(entry.ecu_id, _ecu_id(sa))
+        kinds = [(e.kind, e.sa) for e in events]
+        for sa in (0x13, 0x21, 0x2A):
+            self.assertLess(kinds.index(("appeared", sa)),
+                            kinds.index(("claimed", sa)))
+            self.assertIn(("ecu_id", sa), kinds)
+        self.assertIsNotNone(self.bus.filters)
+
+    def test_conflict_and_cannot_claim(self):
+        monitor = self._monitor()
+        monitor.poll(0.02)
+        other = _name(0x77)
+        self.bus.rx.append(_addr_claimed(0x21, other))
+        self.bus.rx.append(_addr_claimed(NULL_SA, _name(0x99)))
+        events = monitor.poll(0.02)
+        self.assertEqual([(e.kind, e.sa, e.detail) for e in events],
+                         [("conflict", 0x21, (_name(0x21), other)),
+                          ("cannot_claim", NULL_SA, _name(0x99))])
+        self.assertEqual(monitor.table[0x21].name, other)
+        self.assertNotIn(NULL_SA, monitor.table)
+
+    def test_new_sa_requests_ecu_id(self):
+        monitor = self._monitor(lost_after=0.01)
+        monitor.poll(0.02)
+        self.bus.ecus[0x5A] = _name(0x5A)
+        self.bus.rx.append(FakeCANMsg(j1939_make_id(3, 0xF0, 0x04, 0x5A),
+                                      b"\x00" * 8))
+        events = monitor.poll(0.1)
+        self.assertEqual([(e.kind, e.sa) for e in events],
+                         [("appeared", 0x5A), ("ecu_id", 0x5A)])
+        self.assertEqual(len(self.bus.requests(PGN_ECU_ID)), 2)
+
+    def test_incomplete_ecu_id_discarded(self):
+        monitor = self._monitor()
+        monitor.poll(0.02)
+        frames = self.bus._bam(0x13, b"RAMN*OTHER*ID*")
+        self.bus.rx.extend(frames[:2])  # Last TP.DT lost
+        # BAM of another PGN: its TP.DT must not complete the ECU-ID
+        other = self.bus._bam(0x13, b"\xAA" * 14)
+        other[0] = FakeCANMsg(other[0].arbitration_id,
+                              other[0].data[:5] + b"\x00\xEF\x00")
+        self.bus.rx.extend(other)
+        events = monitor.poll(0.02)
+        self.assertNotIn("ecu_id", [e.kind for e in events])
+        self.assertEqual(monitor.table[0x13].ecu_id, _ecu_id(0x13))
+
+    def test_stale_entries_reprobed(self):
+        monitor = self._monitor(stale_after=0.05, lost_after=0.05)
+        monitor.poll(0.02)
+        del self.bus.ecus[0x21]
+        events = monitor.poll(0.4)
+        self.assertEqual([(e.kind, e.sa) for e in events],
+                         [("disappeared", 0x21)])
+        self.assertEqual(sorted(monitor.table), [0x13, 0x2A])
+
+        probes = [(t, da) for t, da in self.bus.requests(PGN_ADDRESS_CLAIMED)
+                  if da != DA_BROADCAST]
+        self.assertEqual({da for _, da in probes}, {0x13, 0x21, 0x2A})
+        budget = _inter_probe_delay(DEFAULT_BITRATE, DEFAULT_BUSLOAD, 3, 8,
+                                    0.0)
+        for (t0, _), (t1, _) in zip(probes, probes[1:]):
+            self.assertGreaterEqual(t1 - t0, budget - 1e-3)
+
+    def test_run_stops(self):
+        monitor = self._monitor()
+        events = list(monitor.run(duration=0.05, poll_interval=0.01))
+        self.assertEqual(len([e for e in events if e.kind == "appeared"]), 3)
+        self.assertFalse(monitor.started)
+        self.assertIsNone(self.bus.filters)
+
+    def test_stop_restores_caller_filters(self):
+        caller = [{"can_id": 0x123, "can_mask": 0x7FF}]
+        self.bus.filters = caller
+        monitor = self._monitor()
+        monitor.poll(0.01)
+        self.assertIsNot(self.bus.filters, caller)
+        monitor.stop()
+        self.assertIs(self.bus.filters, caller)
+
+
+if __name__ == "__main__":
+    unittest.main()
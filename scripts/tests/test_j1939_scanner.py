@@ -7,11 +7,27 @@ Validates that:
 - The return value is a sorted list of (sa, detections) tuples.
 - Each SA's detections list contains one entry per technique that found it.
 - SAs found by only one technique still appear correctly.
+- The pipelined engine finds the same SAs as the sequential scan, keeps
+  several probes outstanding and honours the bus-load budget.
+- The passive sniff phase indexes SAs, PGNs and NAMEs, and known SAs are
+  skipped or deprioritised by the active techniques.
+- The adaptive per-DA timeout shrinks to the observed latencies, and slow
+  ECUs missed by the first pass are found by the retry pass.
+- Receive filters are installed per technique so that frames a technique
+  cannot use never reach Python, and are removed after the scan.
+- Compact results keep one fixed-size record per (SA, technique) and
+  still expose the list-of-dicts format.
+- Registered probe techniques can be scheduled in any order, cheapest
+  first, and skipped for SAs confirmed by enough methods.
+- The broadcast techniques come from the same registry and can be
+  selected, reordered or extended.
 """
 
 import sys
 import os
+import time
 import unittest
+import weakref
 
 # Ensure the scripts directory is on the Python path so that the
 # ``utils`` package can be imported without installing it.
@@ -26,15 +42,30 @@ from utils.RAMN_J1939_Scanner import (
     j1939_make_id,
     j1939_get_pf,
     j1939_get_sa,
+    j1939_get_ps,
     _record,
     _get_bitrate,
     _inter_probe_delay,
+    _classify_response,
+    AdaptiveTimeout,
+    Detection,
+    DetectionTable,
+    DetectionView,
+    j1939_sniff,
+    j1939_pgn_rates,
+    j1939_get_pgn,
+    ProbeTechnique,
+    TECHNIQUES,
+    DEFAULT_TECHNIQUES,
+    DEFAULT_BROADCAST,
+    register_technique,
     PF_REQUEST,
     PF_TP_CM,
     PF_DIAG,
     PF_ADDRESS_CLAIMED,
     PGN_ADDRESS_CLAIMED,
     PGN_ECU_ID,
+    PGN_REQUEST,
     TP_CM_BAM,
     TP_CM_ABORT,
     DA_BROADCAST,
@@ -169,6 +200,58 @@ class MockBus:
         return next(self._current, None)
 
 
+class TimedBus:
+    """A mock CAN bus where ECUs answer per-DA probes after *latency* seconds.
+
+    Unlike ``MockBus``, responses to several probes may be in flight at
+    the same time, which is what the pipelined engine relies on.
+    *latency* is either a number or a ``{sa: latency}`` dict.  SAs in
+    *claiming* answer the broadcast Address Claimed request.
+    """
+
+    def __init__(self, sas, latency, claiming=()):
+        self.sas = set(sas)
+        self.latency = latency
+        self.claiming = claiming
+        self.pending = []  # (due, pkt)
+        self.sent = []  # (time, can_id, data)
+
+    def _latency(self, sa):
+        if isinstance(self.latency, dict):
+            return self.latency[sa]
+        return self.latency
+
+    def send_fn(self, sock, can_id, data):
+        now = time.monotonic()
+        self.sent.append((now, can_id, data))
+        da = (can_id >> 8) & 0xFF
+        pf = j1939_get_pf(can_id)
+        if da == DA_BROADCAST and data == _encode_pgn_le(PGN_ADDRESS_CLAIMED):
+            for sa in self.claiming:
+                self.pending.append((now + self._latency(sa),
+                                     _make_addr_claimed(sa)))
+            self.pending.sort(key=lambda item: item[0])
+            return
+        if da not in self.sas:
+            return
+        if pf == PF_REQUEST:
+            pkt = _make_unicast_resp(da)
+        elif pf == PF_TP_CM:
+            pkt = _make_tp_abort(da)
+        else:
+            pkt = _make_uds_resp(da)
+        self.pending.append((now + self._latency(da), pkt))
+        self.pending.sort(key=lambda item: item[0])
+
+    def recv_fn(self, sock, timeout):
+        deadline = time.monotonic() + timeout
+        if self.pending and self.pending[0][0] <= deadline:
+            time.sleep(max(0.0, self.pending[0][0] - time.monotonic()))
+            return self.pending.pop(0)[1]
+        time.sleep(max(0.0, deadline - time.monotonic()))
+        return None
+
+
 # ---------------------------------------------------------------------------
 # Tests
 # ---------------------------------------------------------------------------
@@ -664,5 +747,553 @@ class TestBitrateFromSocket(unittest.TestCase):
         self.assertIsInstance(result, list)
 
 
+class TestPipelinedScan(unittest.TestCase):
+    """The pipelined engine keeps a window of probes across DAs/techniques."""
+
+    def test_classify_response(self):
+        self.assertEqual(_classify_response(_make_tp_abort(0x13)),
+                         (0x13, "rts_probe"))
+        self.assertEqual(_classify_response(_make_uds_resp(0x13)),
+                         (0x13, "uds"))
+        self.assertEqual(_classify_response(_make_unicast_resp(0x13)),
+                         (0x13, "unicast"))
+        self.assertIsNone(
+            _classify_response(FakeCANMsg(0x7E9, b"\x00", False)))
+        # Only outstanding probes can be answered
+        self.assertEqual(
+            _classify_response(_make_tp_abort(0x13),
+                               outstanding={("unicast", 0x13): 0}),
+            (0x13, "unicast"))
+        self.assertIsNone(
+            _classify_response(_make_uds_resp(0x13),
+                               outstanding={("uds", 0x14): 0}))
+
+    def test_mock_bus_full_scan(self):
+        """Same detections as the sequential full scan."""
+        bus = TestAllFiveTechniquesSplitted()._build_bus()
+        result = dict(j1939_scan(
+            FakeSocket(),
+            timeout=0.01,
+            timeout_per_da=0.01,
+            send_fn=bus.send_fn,
+            recv_fn=bus.recv_fn,
+            bitrate=1000000,
+            busload=1.0,
+            pipelined=True,
+        ))
+        self.assertEqual(sorted(result), sorted(ECU_SA.values()))
+        for sa in ECU_SA.values():
+            methods = sorted(d["method"] for d in result[sa])
+            self.assertEqual(methods, ["addr_claim", "ecu_id", "rts_probe",
+                                       "uds", "unicast"])
+        self.assertEqual(len(bus.sent), 2 + 3 * 0xFE)
+
+    def test_window_overlaps_probes(self):
+        """Probes are not serialised by the per-probe timeout."""
+        bus = TimedBus(ECU_SA.values(), latency=0.005)
+        timeout_per_da = 0.05
+        start = time.monotonic()
+        result = dict(j1939_scan(
+            FakeSocket(),
+            timeout=0.0,
+            timeout_per_da=timeout_per_da,
+            send_fn=bus.send_fn,
+            recv_fn=bus.recv_fn,
+            bitrate=1000000,
+            busload=0.5,
+            range_step=(0x10, 0x5F),
+            pipelined=True,
+            window=16,
+        ))
+        elapsed = time.monotonic() - start
+        probes = 3 * 0x50
+        self.assertEqual(len(bus.sent), 2 + probes)
+        self.assertLess(elapsed, probes * timeout_per_da / 4)
+        for sa in ECU_SA.values():
+            methods = sorted(d["method"] for d in result[sa])
+            self.assertEqual(methods, ["rts_probe", "uds", "unicast"])
+
+    def test_busload_budget(self):
+        """Consecutive probes are spaced by their bus-load budget."""
+        bus = TimedBus(ECU_SA.values(), latency=0.001)
+        j1939_scan(
+            FakeSocket(),
+            timeout=0.0,
+            timeout_per_da=0.2,
+            send_fn=bus.send_fn,
+            recv_fn=bus.recv_fn,
+            bitrate=DEFAULT_BITRATE,
+            busload=DEFAULT_BUSLOAD,
+            range_step=(0x12, 0x14),
+            pipelined=True,
+        )
+        probes = bus.sent[2:]
+        self.assertEqual(len(probes), 9)
+        budgets = {}
+        for method in DEFAULT_TECHNIQUES:
+            t = TECHNIQUES[method]
+            budgets[j1939_get_pf(t.build(0)[0])] = _inter_probe_delay(
+                DEFAULT_BITRATE, DEFAULT_BUSLOAD, t.tx_dlc, t.rx_dlc, 0.0)
+        for (t0, cid, _), (t1, _, _) in zip(probes, probes[1:]):
+            self.assertGreaterEqual(t1 - t0,
+                                    budgets[j1939_get_pf(cid)] - 1e-3)
+
+
+class TestPassiveSniff(unittest.TestCase):
+    """A passive phase indexes bus traffic before any probe is sent."""
+
+    def _background(self):
+        # ECU C broadcasts a PDU2 PGN (0xFEF1) three times, ECU D claims
+        return [
+            FakeCANMsg(j1939_make_id(6, 0xFE, 0xF1, ECU_SA["C"]), b"\x00" * 8),
+            FakeCANMsg(0x123, b"\x00", is_extended_id=False),
+            _make_addr_claimed(ECU_SA["D"]),
+            FakeCANMsg(j1939_make_id(6, 0xFE, 0xF1, ECU_SA["C"]), b"\x00" * 8),
+            FakeCANMsg(j1939_make_id(6, 0xFE, 0xF1, ECU_SA["C"]), b"\x00" * 8),
+        ]
+
+    def test_get_pgn(self):
+        self.assertEqual(j1939_get_pgn(j1939_make_id(6, 0xFE, 0xF1, 0x5A)),
+                         0xFEF1)
+        self.assertEqual(j1939_get_pgn(j1939_make_id(6, PF_REQUEST, 0x13, 0xFE)),
+                         PGN_REQUEST)
+
+    def test_index(self):
+        frames = iter(self._background())
+        index = j1939_sniff(FakeSocket(), 0.05,
+                            recv_fn=lambda sock, timeout: next(frames, None))
+        self.assertEqual(sorted(index), sorted([ECU_SA["C"], ECU_SA["D"]]))
+        c = index[ECU_SA["C"]]
+        self.assertEqual(c["pgns"], {0xFEF1: 3})
+        self.assertEqual(c["frames"], 3)
+        self.assertIsNone(c["name"])
+        self.assertEqual(set(j1939_pgn_rates(c)), {0xFEF1})
+        d = index[ECU_SA["D"]]
+        self.assertEqual(d["pgns"], {PGN_ADDRESS_CLAIMED: 1})
+        self.assertEqual(d["name"], _make_addr_claimed(ECU_SA["D"]).data)
+        self.assertEqual(j1939_pgn_rates(d), {PGN_ADDRESS_CLAIMED: 0.0})
+
+    def _scan(self, skip_known):
+        bus = MockBus()
+        bus._current = iter(self._background())
+        index = {}
+        result = dict(j1939_scan(
+            FakeSocket(),
+            timeout=0.0,
+            timeout_per_da=0.0,
+            send_fn=bus.send_fn,
+            recv_fn=bus.recv_fn,
+            bitrate=1000000,
+            busload=1.0,
+            range_step=(0x20, 0x5F),
+            sniff_time=0.05,
+            index=index,
+            skip_known=skip_known,
+        ))
+        return bus, index, result
+
+    def test_known_sas_skipped(self):
+        bus, index, result = self._scan(skip_known=True)
+        self.assertEqual(sorted(index), sorted([ECU_SA["C"], ECU_SA["D"]]))
+        for sa in index:
+            self.assertEqual([d["method"] for d in result[sa]], ["passive"])
+        probed = {j1939_get_ps(cid) for cid, _ in bus.sent}
+        self.assertNotIn(ECU_SA["C"], probed)
+        self.assertNotIn(ECU_SA["D"], probed)
+        self.assertEqual(len(bus.sent), 2 + 3 * (0x40 - 2))
+
+    def test_known_sas_deprioritised(self):
+        bus, index, result = self._scan(skip_known=False)
+        unicast = [j1939_get_ps(cid) for cid, _ in bus.sent
+                   if j1939_get_pf(cid) == PF_REQUEST][2:]
+        self.assertEqual(len(unicast), 0x40)
+        self.assertEqual(sorted(unicast[-2:]),
+                         sorted([ECU_SA["C"], ECU_SA["D"]]))
+
+
+class TestAdaptiveTimeout(unittest.TestCase):
+    """The per-DA wait follows the observed response latencies."""
+
+    def test_uncalibrated_uses_ceiling(self):
+        timing = AdaptiveTimeout(0.05)
+        timing.observe(0.001)
+        self.assertFalse(timing.calibrated)
+        self.assertEqual(timing.timeout, 0.05)
+
+    def test_percentile_and_cap(self):
+        timing = AdaptiveTimeout(0.05, factor=2.0, margin=0.002)
+        for latency in (0.001, 0.002, 0.001):
+            timing.observe(latency)
+        self.assertAlmostEqual(timing.timeout, 0.006)
+        self.assertAlmostEqual(timing.retry_timeout, 0.012)
+        timing.observe(1.0)
+        self.assertEqual(timing.timeout, 0.05)
+
+    def _scan(self, pipelined):
+        # ECU D is slower than the others and does not claim its address,
+        # so it is only probed after the timeout has been calibrated.
+        latency = {sa: 0.001 for sa in ECU_SA.values()}
+        latency[ECU_SA["D"]] = 0.006
+        bus = TimedBus(ECU_SA.values(), latency,
+                       claiming=[ECU_SA["A"], ECU_SA["B"], ECU_SA["C"]])
+        start = time.monotonic()
+        result = dict(j1939_scan(
+            FakeSocket(),
+            timeout=0.01,
+            timeout_per_da=0.1,
+            send_fn=bus.send_fn,
+            recv_fn=bus.recv_fn,
+            bitrate=1000000,
+            busload=1.0,
+            range_step=(0x10, 0x5F),
+            pipelined=pipelined,
+            adaptive_timeout=True,
+        ))
+        elapsed = time.monotonic() - start
+        for sa in ECU_SA.values():
+            methods = {d["method"] for d in result[sa]}
+            self.assertTrue({"unicast", "rts_probe", "uds"} <= methods,
+                            f"SA=0x{sa:02X}: {methods}")
+        # Fixed timeouts would take 3 * 0x50 * 0.1 = 24 s
+        self.assertLess(elapsed, 3 * 0x50 * 0.1 / 4)
+        return bus
+
+    def test_sequential_retry_finds_slow_ecu(self):
+        bus = self._scan(pipelined=False)
+        # Calibration: the claiming ECUs are probed first
+        unicast = [j1939_get_ps(cid) for _, cid, _ in bus.sent
+                   if j1939_get_pf(cid) == PF_REQUEST][2:]
+        self.assertEqual(unicast[:3],
+                         sorted([ECU_SA["A"], ECU_SA["B"], ECU_SA["C"]]))
+        # Slow ECU D was probed again by the retry pass
+        self.assertEqual(unicast.count(ECU_SA["D"]), 2)
+
+    def test_pipelined(self):
+        self._scan(pipelined=True)
+
+
+class FilteringSocket(FakeSocket):
+    """Fake socket with python-can style ``set_filters`` (no set = all)."""
+
+    def __init__(self):
+        super().__init__()
+        self.filters = None
+        self.filter_calls = 0
+
+    def set_filters(self, filters):
+        self.filters = filters
+        self.filter_calls += 1
+
+    def matches(self, pkt):
+        if self.filters is None:
+            return True
+        for f in self.filters:
+            if f.get("extended") and not pkt.is_extended_id:
+                continue
+            if (pkt.arbitration_id ^ f["can_id"]) & f["can_mask"] == 0:
+                return True
+        return False
+
+
+class TestReceiveFilters(unittest.TestCase):
+    """Frames rejected by the filters are dropped before recv_fn returns."""
+
+    NOISE = [
+        FakeCANMsg(0x123, b"\x00" * 8, is_extended_id=False),
+        FakeCANMsg(j1939_make_id(3, 0xF0, 0x04, 0x99), b"\x00" * 8),
+        FakeCANMsg(j1939_make_id(6, PF_DIAG, SCANNER_SA, 0x99), b"\x00" * 8),
+    ]
+
+    def _scan(self, pipelined):
+        bus = TestAllFiveTechniquesSplitted()._build_bus()
+        for probe_id in {cid for cid in bus._responses}:
+            for pkt in self.NOISE:
+                bus.add_response(probe_id, pkt)
+        sock = FilteringSocket()
+        delivered = []
+
+        def recv_fn(s, timeout):
+            # Emulate the kernel: drop frames rejected by the filters
+            for pkt in bus._current:
+                if s.matches(pkt):
+                    delivered.append(pkt)
+                    return pkt
+            return None
+
+        result = dict(j1939_scan(
+            sock,
+            timeout=0.01,
+            timeout_per_da=0.01,
+            send_fn=bus.send_fn,
+            recv_fn=recv_fn,
+            bitrate=1000000,
+            busload=1.0,
+            range_step=(0x10, 0x5F),
+            pipelined=pipelined,
+        ))
+        for sa in ECU_SA.values():
+            self.assertEqual(len(result[sa]), 5)
+        for pkt in self.NOISE:
+            self.assertNotIn(pkt, delivered)
+        self.assertIsNone(sock.filters)
+        return sock
+
+    def test_sequential(self):
+        sock = self._scan(pipelined=False)
+        # addr_claim, ecu_id, one per unicast DA, rts, one per UDS DA, reset
+        self.assertEqual(sock.filter_calls, 2 + 0x50 + 1 + 0x50 + 1)
+
+    def test_pipelined(self):
+        self._scan(pipelined=True)
+
+    def test_caller_filters_restored(self):
+        bus = TestAllFiveTechniquesSplitted()._build_bus()
+        sock = FilteringSocket()
+        caller = [{"can_id": 0x123, "can_mask": 0x7FF}]
+        sock.set_filters(caller)
+
+        def recv_fn(s, timeout):
+            for pkt in bus._current:
+                if s.matches(pkt):
+                    return pkt
+            return None
+
+        j1939_scan(sock, timeout=0.01, timeout_per_da=0.01,
+                   send_fn=bus.send_fn, recv_fn=recv_fn, bitrate=1000000,
+                   busload=1.0, range_step=(0x10, 0x1F), sniff_time=0.01)
+        self.assertIs(sock.filters, caller)
+
+    def test_sniff_drops_standard_frames(self):
+        sock = FilteringSocket()
+        frames = iter(self.NOISE)
+
+        def recv_fn(s, timeout):
+            for pkt in frames:
+                if s.matches(pkt):
+                    return pkt
+            return None
+
+        index = j1939_sniff(sock, 0.01, recv_fn=recv_fn,
+                            filter_fn=lambda s, f: s.set_filters(f))
+        self.assertEqual(list(index), [0x99])
+        self.assertEqual(index[0x99]["frames"], 2)
+
+
+class TestCompactDetections(unittest.TestCase):
+    """DetectionTable deduplicates detections and does not keep packets."""
+
+    def test_record_deduplicates(self):
+        table = DetectionTable()
+        pkt = _make_uds_resp(0x13)
+        ref = weakref.ref(pkt)
+        _record(table, 0x13, "uds", pkt)
+        del pkt
+        for _ in range(1000):
+            _record(table, 0x13, "uds", _make_uds_resp(0x13))
+        _record(table, 0x13, "unicast", _make_unicast_resp(0x13))
+        self.assertIsNone(ref())
+        records = list(table.records())
+        self.assertEqual([(r.method, r.hits) for r in records],
+                         [("uds", 1001), ("unicast", 1)])
+        self.assertIsInstance(records[0], Detection)
+        self.assertEqual(records[0].data, UDS_TESTER_PRESENT_RESPONSE)
+        self.assertLessEqual(records[0].timestamp, records[0].last_seen)
+        self.assertFalse(hasattr(records[0], "__dict__"))
+
+    def test_view_matches_list_format(self):
+        table = DetectionTable()
+        _record(table, 0x5A, "addr_claim", _make_addr_claimed(0x5A))
+        _record(table, 0x13, "uds", _make_uds_resp(0x13))
+        view = DetectionView(table)
+        self.assertEqual(len(view), 2)
+        self.assertEqual([sa for sa, _ in view], [0x13, 0x5A])
+        sa, detections = view[1]
+        self.assertEqual(detections[0]["method"], "addr_claim")
+        self.assertEqual(j1939_get_sa(detections[0]["packet"].arbitration_id),
+                         0x5A)
+
+    def test_compact_scan(self):
+        bus = TestAllFiveTechniquesSplitted()._build_bus()
+        table = DetectionTable()
+        for _ in range(2):
+            result = j1939_scan(
+                FakeSocket(),
+                timeout=0.01,
+                timeout_per_da=0.01,
+                send_fn=bus.send_fn,
+                recv_fn=bus.recv_fn,
+                bitrate=1000000,
+                busload=1.0,
+                range_step=(0x10, 0x5F),
+                compact=table,
+            )
+        self.assertIsInstance(result, DetectionView)
+        result_dict = dict(result)
+        self.assertEqual(sorted(result_dict), sorted(ECU_SA.values()))
+        for sa in ECU_SA.values():
+            self.assertEqual(len(result_dict[sa]), 5)
+            self.assertEqual({d["hits"] for d in result_dict[sa]}, {2})
+
+
+class TestTechniqueRegistry(unittest.TestCase):
+    """Per-DA techniques come from a registry and can be scheduled."""
+
+    PGN_DM1 = 0xFECA
+
+    def tearDown(self):
+        TECHNIQUES.pop("dm1", None)
+        TECHNIQUES.pop("dm1_all", None)
+
+    def _scan(self, **kwargs):
+        bus = TestAllFiveTechniquesSplitted()._build_bus()
+        result = dict(j1939_scan(
+            FakeSocket(),
+            timeout=0.01,
+            timeout_per_da=0.01,
+            send_fn=bus.send_fn,
+            recv_fn=bus.recv_fn,
+            bitrate=1000000,
+            busload=1.0,
+            range_step=(0x10, 0x2F),
+            **kwargs
+        ))
+        probes = [(j1939_get_pf(cid), j1939_get_ps(cid))
+                  for cid, _ in bus.sent[2:]]
+        return bus, result, probes
+
+    def test_default_costs(self):
+        costs = {m: TECHNIQUES[m].cost for m in DEFAULT_TECHNIQUES}
+        self.assertEqual(sorted(costs, key=costs.get),
+                         ["uds", "unicast", "rts_probe"])
+
+    def test_cheapest_first(self):
+        _, _, probes = self._scan(cheapest_first=True)
+        pfs = [pf for pf, _ in probes]
+        n = 0x20
+        self.assertEqual(pfs, [PF_DIAG] * n + [PF_REQUEST] * n
+                         + [PF_TP_CM] * n)
+
+    def test_interleaved_order(self):
+        _, _, probes = self._scan(techniques=["uds", "unicast"],
+                                  schedule="interleaved")
+        self.assertEqual(probes[:4], [(PF_DIAG, 0x10), (PF_REQUEST, 0x10),
+                                      (PF_DIAG, 0x11), (PF_REQUEST, 0x11)])
+        self.assertEqual(len(probes), 2 * 0x20)
+
+    def test_unknown_schedule(self):
+        with self.assertRaises(ValueError):
+            self._scan(schedule="random")
+
+    def test_confirmations_stop_early(self):
+        ecus = [sa for sa in ECU_SA.values() if 0x10 <= sa <= 0x2F]
+        for pipelined in (False, True):
+            _, result, probes = self._scan(
+                schedule="interleaved", cheapest_first=True,
+                confirmations=3, pipelined=pipelined)
+            for sa in ecus:
+                self.assertEqual([d["method"] for d in result[sa]],
+                                 ["addr_claim", "ecu_id", "uds"])
+                self.assertEqual([pf for pf, da in probes if da == sa],
+                                 [PF_DIAG])
+            self.assertEqual(len(probes), 3 * 0x20 - 2 * len(ecus))
+
+    def test_registered_technique(self):
+        """A new technique is matched, scheduled and stored compactly."""
+        dm1 = self.PGN_DM1
+
+        def build(da):
+            return (j1939_make_id(6, PF_REQUEST, da, SCANNER_SA),
+                    _encode_pgn_le(dm1))
+
+        def match(pkt, da):
+            cid = pkt.arbitration_id
+            if (cid >> 8) & 0xFFFF == dm1 and j1939_get_sa(cid) == da:
+                return da
+            return None
+
+        register_technique(ProbeTechnique(
+            "dm1", build, match, lambda da: [], tx_dlc=3, rx_dlc=8))
+        bus = MockBus()
+        sa = ECU_SA["D"]
+        bus.add_response(build(sa)[0],
+                         FakeCANMsg(j1939_make_id(6, 0xFE, 0xCA, sa),
+                                    b"\x00" * 8))
+        for pipelined in (False, True):
+            result = dict(j1939_scan(
+                FakeSocket(),
+                timeout=0.0,
+                timeout_per_da=0.01,
+                send_fn=bus.send_fn,
+                recv_fn=bus.recv_fn,
+                bitrate=1000000,
+                busload=1.0,
+                range_step=(0x20, 0x22),
+                techniques=["dm1", "uds"],
+                pipelined=pipelined,
+                compact=True,
+            ))
+            self.assertEqual(list(result), [sa])
+            self.assertEqual([d["method"] for d in result[sa]], ["dm1"])
+
+    def test_broadcast_registered(self):
+        for method in DEFAULT_BROADCAST:
+            self.assertTrue(TECHNIQUES[method].broadcast)
+        for method in DEFAULT_TECHNIQUES:
+            self.assertFalse(TECHNIQUES[method].broadcast)
+
+    def test_broadcast_selection(self):
+        """Only the selected broadcast techniques run, in the given order."""
+        bus, result, _ = self._scan(techniques=[], broadcast=["ecu_id"])
+        self.assertEqual(len(bus.sent), 1)
+        self.assertEqual(bus.sent[0][1], _encode_pgn_le(PGN_ECU_ID))
+        for sa in ECU_SA.values():
+            self.assertEqual([d["method"] for d in result[sa]], ["ecu_id"])
+
+        bus, result, _ = self._scan(techniques=[], broadcast=[])
+        self.assertEqual(bus.sent, [])
+        self.assertEqual(result, {})
+
+    def test_registered_broadcast_technique(self):
+        """A new broadcast technique is sent once to DA_BROADCAST."""
+        dm1 = self.PGN_DM1
+
+        def build(da):
+            return (j1939_make_id(6, PF_REQUEST, da, SCANNER_SA),
+                    _encode_pgn_le(dm1))
+
+        def match(pkt, da):
+            cid = pkt.arbitration_id
+            if (cid >> 8) & 0xFFFF == dm1:
+                return j1939_get_sa(cid)
+            return None
+
+        register_technique(ProbeTechnique(
+            "dm1_all", build, match, lambda da: [], tx_dlc=3, rx_dlc=8,
+            broadcast=True))
+        bus = MockBus()
+        for sa in (ECU_SA["A"], ECU_SA["D"]):
+            bus.add_response(build(DA_BROADCAST)[0],
+                             FakeCANMsg(j1939_make_id(6, 0xFE, 0xCA, sa),
+                                        b"\x00" * 8))
+        result = dict(j1939_scan(
+            FakeSocket(),
+            timeout=0.01,
+            send_fn=bus.send_fn,
+            recv_fn=bus.recv_fn,
+            techniques=[],
+            broadcast=["dm1_all"],
+        ))
+        self.assertEqual(bus.sent, [build(DA_BROADCAST)])
+        self.assertEqual(sorted(result), sorted([ECU_SA["A"], ECU_SA["D"]]))
+        for detections in result.values():
+            self.assertEqual([d["method"] for d in detections], ["dm1_all"])
+
+    def test_technique_kind_checked(self):
+        with self.assertRaises(ValueError):
+            self._scan(techniques=["addr_claim"])
+        with self.assertRaises(ValueError):
+            self._scan(broadcast=["unicast"])
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Tests for the logging backend of RAMN_Utils.log.
+
+Validates that:
+- Messages filtered out by the verbose level are never formatted.
+- Queued JSON-lines and binary outputs hold every message, in order, with monotonic timestamps.
+"""
+
+import sys
+import os
+import json
+import tempfile
+import unittest
+
+_scripts_dir = os.path.normpath(
+    os.path.join(os.path.dirname(__file__), "..")
+)
+if _scripts_dir not in sys.path:
+    sys.path.insert(0, _scripts_dir)
+
+from utils.RAMN_Utils import (
+    RAMN_Utils, log, enableLoggingBackend, disableLoggingBackend, readBinaryLog,
+    LOG_ERROR, LOG_DATA, LOG_DEBUG,
+)
+
+
+class TestLoggingBackend(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        RAMN_Utils.setVerboseLevel(LOG_DATA)
+
+    def tearDown(self):
+        disableLoggingBackend()
+        self.tmp.cleanup()
+
+    def test_filtered_not_formatted(self):
+        calls = []
+        log(lambda: calls.append(1) or "debug", LOG_DEBUG)
+        self.assertEqual(calls, [])
+
+    def test_json_lines(self):
+        path = os.path.join(self.tmp.name, "log.jsonl")
+        enableLoggingBackend(path, "json")
+        for i in range(100):
+            log(lambda: "frame {}".format(i), LOG_DATA)
+        log("failure", LOG_ERROR)
+        log("hidden", LOG_DEBUG)
+        disableLoggingBackend()
+        with open(path) as f:
+            records = [json.loads(line) for line in f]
+        self.assertEqual([r["message"] for r in records], ["frame {}".format(i) for i in range(100)] + ["failure"])
+        self.assertEqual(records[0]["level"], "DATA")
+        self.assertEqual(records[-1]["level"], "ERROR")
+        times = [r["time"] for r in records]
+        self.assertEqual(times, sorted(times))
+
+    def test_binary(self):
+        path = os.path.join(self.tmp.name, "log.bin")
+        enableLoggingBackend(path, "binary")
+        log("first", LOG_DATA)
+        log("second", LOG_ERROR)
+        disableLoggingBackend()
+        records = list(readBinaryLog(path))
+        self.assertEqual([(level, message) for _, level, message in records], [(LOG_DATA, "first"), (LOG_ERROR, "second")])
+        self.assertLessEqual(records[0][0], records[1][0])
+
+
+if __name__ == "__main__":
+    unittest.main()
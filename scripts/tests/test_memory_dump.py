@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Tests for the resumable memory dump engine (RAMN_Memory_Dump.py).
+
+Validates that:
+- Blocks are streamed to the output file and recorded in the journal.
+- An interrupted dump only requests the missing blocks when run again.
+- Blocks which content no longer matches the journal CRC are read again.
+- The journal is removed once the dump is complete.
+"""
+
+import sys
+import os
+import tempfile
+import unittest
+
+_scripts_dir = os.path.normpath(
+    os.path.join(os.path.dirname(__file__), "..")
+)
+if _scripts_dir not in sys.path:
+    sys.path.insert(0, _scripts_dir)
+
+from utils.RAMN_Memory_Dump import RAMN_Memory_Dump, JOURNAL_EXTENSION, RAMN_Utils
+
+START = 0x20000000
+MEMORY = bytes((i * 11) & 0xFF for i in range(0x1000))
+BLOCK = 0x100
+
+
+class FakeECU:
+    """Yields memory blocks like RAMN_UDS_Handler.readMemoryBlocks, and stops after a number of blocks."""
+
+    def __init__(self, failAfter=None):
+        self.failAfter = failAfter
+        self.requested = []
+
+    def readMemoryBlocks(self, start, end, blockSize=0xFF0, pipelined=False):
+        for address in range(start, end, blockSize):
+            if self.failAfter is not None and len(self.requested) >= self.failAfter:
+                return
+            self.requested.append(address)
+            yield address, list(MEMORY[address - START:address - START + min(blockSize, end - address)])
+
+
+class TestMemoryDump(unittest.TestCase):
+
+    def setUp(self):
+        RAMN_Utils.setVerboseLevel(0)
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "ECUB_SRAM1.bin")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _run(self, ecu):
+        dump = RAMN_Memory_Dump(self.path, START, START + len(MEMORY), blockSize=BLOCK)
+        complete = dump.run(ecu)
+        dump.close()
+        return complete
+
+    def _read(self):
+        with open(self.path, "rb") as f:
+            return f.read()
+
+    def test_complete(self):
+        self.assertTrue(self._run(FakeECU()))
+        self.assertEqual(self._read(), MEMORY)
+        self.assertFalse(os.path.exists(self.path + JOURNAL_EXTENSION))
+
+    def test_resume(self):
+        self.assertFalse(self._run(FakeECU(failAfter=5)))
+        self.assertTrue(os.path.exists(self.path + JOURNAL_EXTENSION))
+        ecu = FakeECU()
+        self.assertTrue(self._run(ecu))
+        self.assertEqual(ecu.requested, [START + i * BLOCK for i in range(5, len(MEMORY) // BLOCK)])
+        self.assertEqual(self._read(), MEMORY)
+
+    def test_corrupted_block(self):
+        self.assertFalse(self._run(FakeECU(failAfter=5)))
+        with open(self.path, "r+b") as f:
+            f.seek(2 * BLOCK + 3)
+            f.write(b"\x00")
+        ecu = FakeECU()
+        self.assertTrue(self._run(ecu))
+        self.assertEqual(ecu.requested[0], START + 2 * BLOCK)
+        self.assertEqual(len(ecu.requested), len(MEMORY) // BLOCK - 4)
+        self.assertEqual(self._read(), MEMORY)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Tests for pipelined uploads (RAMN_UDS_Handler.dumpArea / transferDataUpload).
+
+Validates that:
+- A request chained to a response is only sent once that response is received.
+- Pipelined ReadMemoryByAddress and Transfer Data uploads return the same data as sequential ones.
+"""
+
+import sys
+import os
+import struct
+import unittest
+
+_scripts_dir = os.path.normpath(
+    os.path.join(os.path.dirname(__file__), "..")
+)
+if _scripts_dir not in sys.path:
+    sys.path.insert(0, _scripts_dir)
+
+from utils.RAMN_UDS_Handler import (
+    RAMN_UDS_Handler, RAMN_USB_Handler, RAMN_ISOTP_Handler, RAMN_Utils,
+)
+
+MEMORY = bytes((i * 7) & 0xFF for i in range(0x100))
+BLOCK = 4  # Answers fit in single frames
+
+
+class FakeSerial:
+    """Serial port answering single frame ReadMemoryByAddress and Transfer Data requests of ECU 0x7E1."""
+
+    def __init__(self):
+        self.timeout = None
+        self.out_waiting = 0
+        self.rx = bytearray()
+        self.requests = []
+        self.uploaded = 0
+
+    @property
+    def in_waiting(self):
+        return len(self.rx)
+
+    def read(self, n):
+        data = bytes(self.rx[:n])
+        del self.rx[:n]
+        return data
+
+    def write(self, data):
+        for line in bytes(data).split(b"\r"):
+            if line.startswith(b"t7e1") and len(line) >= 7:
+                frame = bytes.fromhex(line[5:].decode())
+                if frame[0] >> 4 == 0:
+                    self.process(frame[1:1 + frame[0]])
+                elif frame[0] >> 4 == 1:
+                    self.size = ((frame[0] & 0xF) << 8) | frame[1]
+                    self.pending = frame[2:]
+                    self.rx += b"t7e93300000\r"  # Flow control
+                elif frame[0] >> 4 == 2:
+                    self.pending += frame[1:]
+                    if len(self.pending) >= self.size:
+                        self.process(self.pending[:self.size])
+
+    def process(self, req):
+        self.requests.append(req)
+        if req[0] == 0x23:
+            addr, size = struct.unpack(">IH", req[2:8])
+            self.answer(b"\x63" + MEMORY[addr - 0x08000000:addr - 0x08000000 + size])
+        elif req[0] == 0x36:
+            self.answer(bytes([0x76, req[1]]) + MEMORY[self.uploaded:self.uploaded + BLOCK])
+            self.uploaded += BLOCK
+
+    def answer(self, payload):
+        self.rx += "t7e9{:1x}{:02x}{}\r".format(len(payload) + 1, len(payload), payload.hex()).encode()
+
+
+class TestPipelinedUpload(unittest.TestCase):
+
+    def setUp(self):
+        RAMN_Utils.setVerboseLevel(0)
+        self.ramn = RAMN_USB_Handler("fake")
+        self.ramn.ser = FakeSerial()
+        self.tp = RAMN_ISOTP_Handler(self.ramn, {0x7E9: 0x7E1})
+        self.ecu = RAMN_UDS_Handler(self.ramn, self.tp, txid=0x7E1, rxid=0x7E9, name="B")
+
+    def test_chained_request(self):
+        self.tp.sendFrame(bytes([0x36, 0x01]), 0x7E1, 0x7E9)
+        self.tp.sendFrameAfterResponse(bytes([0x36, 0x02]), 0x7E1, 0x7E9)
+        self.tp.processTX()
+        self.assertEqual(self.ramn.ser.requests, [b"\x36\x01"])
+        self.assertIsNotNone(self.tp.update(True, timeout=1, rx=0x7E9))
+        self.assertEqual(self.ramn.ser.requests, [b"\x36\x01", b"\x36\x02"])
+
+    def test_dump_area(self):
+        dump = self.ecu.dumpArea(0x08000000, 0x08000100, blockSize=BLOCK, pipelined=True)
+        self.assertEqual(bytes(dump), MEMORY)
+        self.assertEqual(len(self.ramn.ser.requests), len(MEMORY) // BLOCK)
+
+    def test_transfer_data_upload(self):
+        dump = self.ecu.transferDataUpload(len(MEMORY), blockSize=BLOCK + 2)
+        self.assertEqual(bytes(dump), MEMORY)
+        self.assertEqual([r[1] for r in self.ramn.ser.requests], [(i + 1) & 0xFF for i in range(len(MEMORY) // BLOCK)])
+
+
+if __name__ == "__main__":
+    unittest.main()
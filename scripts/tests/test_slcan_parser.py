@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Tests for the slcan stream parser (RAMN_SLCAN.py).
+
+Validates that:
+- Standard, extended, CAN-FD and remote frames are decoded.
+- Lines split across several reads are reassembled.
+- Non-frame lines (acks, UDS-over-USB answers) are returned untouched.
+- Raw lines are kept alongside their frames for forwarding.
+"""
+
+import sys
+import os
+import unittest
+
+_scripts_dir = os.path.normpath(
+    os.path.join(os.path.dirname(__file__), "..")
+)
+if _scripts_dir not in sys.path:
+    sys.path.insert(0, _scripts_dir)
+
+from utils.RAMN_SLCAN import SLCANParser, SLCANFrame, decodeFrame
+
+
+class TestDecodeFrame(unittest.TestCase):
+
+    def _decode(self, line, timestamps=False):
+        buf = bytearray(line)
+        return decodeFrame(buf, 0, len(buf), timestamps)
+
+    def test_standard_frame(self):
+        frame = self._decode(b"t7e8302aabb")
+        self.assertEqual(frame.canid, 0x7E8)
+        self.assertEqual(frame.payload, b"\x02\xaa\xbb")
+        self.assertFalse(frame.is_extended)
+        self.assertFalse(frame.is_fd)
+
+    def test_extended_frame(self):
+        frame = self._decode(b"T18DAF9E13027e00")
+        self.assertEqual(frame.canid, 0x18DAF9E1)
+        self.assertEqual(frame.payload, b"\x02\x7e\x00")
+        self.assertTrue(frame.is_extended)
+
+    def test_fd_frame_with_esi(self):
+        frame = self._decode(b"1t123" + b"9" + b"00" * 12 + b"i")
+        self.assertTrue(frame.is_fd)
+        self.assertTrue(frame.bitrate_switch)
+        self.assertTrue(frame.error_state_indicator)
+        self.assertEqual(len(frame.payload), 12)
+
+    def test_remote_frame(self):
+        frame = self._decode(b"r1238")
+        self.assertTrue(frame.is_remote)
+        self.assertEqual(frame.payload, b"")
+
+    def test_timestamp(self):
+        frame = self._decode(b"t1231ff1234", timestamps=True)
+        self.assertEqual(frame.payload, b"\xff")
+        self.assertEqual(frame.timestamp, 0x1234)
+
+    def test_invalid_lines(self):
+        self.assertIsNone(self._decode(b"%00162"))
+        self.assertIsNone(self._decode(b"t12"))
+        self.assertIsNone(self._decode(b"t1232zz"))
+        self.assertIsNone(self._decode(b"t12340011"))
+
+
+class TestSLCANParser(unittest.TestCase):
+
+    def test_split_reads(self):
+        parser = SLCANParser()
+        parser.feed(b"t12310")
+        self.assertIsNone(parser.nextItem())
+        parser.feed(b"1\rt4560\r")
+        frame = parser.nextItem()
+        self.assertIsInstance(frame, SLCANFrame)
+        self.assertEqual(frame.payload, b"\x01")
+        self.assertEqual(parser.nextItem().canid, 0x456)
+        self.assertIsNone(parser.nextItem())
+        self.assertEqual(parser.pending(), 0)
+
+    def test_non_frame_lines(self):
+        parser = SLCANParser()
+        parser.feed(b"\r%00250ff\r")
+        self.assertEqual(parser.nextItem(), b"")
+        self.assertEqual(parser.nextItem(), b"%00250ff")
+
+    def test_raw_items_keep_line(self):
+        parser = SLCANParser()
+        parser.feed(b"t1231aa\r\rt4")
+        line, frame = parser.nextRawItem()
+        self.assertEqual(line, b"t1231aa\r")
+        self.assertEqual(frame.payload, b"\xaa")
+        self.assertEqual(parser.nextRawItem(), (b"\r", None))
+        self.assertIsNone(parser.nextRawItem())
+
+    def test_frames_discards_other_lines(self):
+        parser = SLCANParser()
+        parser.feed(b"t1230\rdDEBUG\rT000000010\rt45")
+        frames = parser.frames()
+        self.assertEqual([f.canid for f in frames], [0x123, 0x1])
+        self.assertEqual(parser.pending(), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
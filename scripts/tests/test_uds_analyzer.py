@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Tests for the UDS payload decoder (RAMN_Utils.UDSAnalyzer).
+
+Validates that:
+- Requests, responses and negative responses are described from the lookup tables.
+- Payloads are only decoded when debug messages are displayed.
+"""
+
+import sys
+import os
+import unittest
+
+_scripts_dir = os.path.normpath(
+    os.path.join(os.path.dirname(__file__), "..")
+)
+if _scripts_dir not in sys.path:
+    sys.path.insert(0, _scripts_dir)
+
+from utils.RAMN_UDS_Handler import RAMN_UDS_Handler, RAMN_Utils, UDSAnalyzer, LOG_DEBUG
+
+
+class TestUDSAnalyzer(unittest.TestCase):
+
+    def setUp(self):
+        self.uds = UDSAnalyzer()
+
+    def test_request(self):
+        self.assertEqual(self.uds.display(bytes([0x10, 0x02])),
+                         "SID $10 - Diagnostic Session Control - Subfunction $02 - Programming Session")
+
+    def test_response(self):
+        self.assertEqual(self.uds.display([0x71, 0x01, 0x02, 0x06]),
+                         "SID $71 - Routine Control    Response - Subfunction $01 - Start Routine")
+        self.assertEqual(self.uds.display([0x76, 0x01, 0xAA]), "SID $76 - Transfer Data Response")
+
+    def test_negative_response(self):
+        self.assertEqual(self.uds.getSubByteDisplayString([0x7F, 0x31, 0x31]), "Negative Response: ROOR-Request out of range")
+        self.assertEqual(self.uds.getSubByteDisplayString([0x7F, 0x31, 0x01]), "Negative Response: Invalid code")
+        self.assertEqual(self.uds.getErrorCodeDescription(0x01), "Invalid Error Code")
+
+    def test_unknown(self):
+        self.assertEqual(self.uds.getSIDDescription(0xFF), "Unknown/Invalid SID")
+        self.assertEqual(self.uds.getSubByteDisplayString([0x3B, 0x01]), "Unknown or invalid Subbyte")
+
+
+class FailingAnalyzer:
+    def display(self, data):
+        raise AssertionError("payload decoded while debug messages are disabled")
+
+
+class TestLazyDisplay(unittest.TestCase):
+
+    def test_not_decoded(self):
+        RAMN_Utils.setVerboseLevel(LOG_DEBUG - 1)
+        ecu = RAMN_UDS_Handler(None, None, 0x7E1, 0x7E9, isUSB=True)
+        ecu.uds = FailingAnalyzer()
+        ecu.ramn = type("FakeRAMN", (), {"sendUDSCommandUSB": lambda self, c, timeout=0, recvAnswer=True: bytes([0x50, 0x02])})()
+        self.assertEqual(ecu.diagnosticSessionControl(0x02), [0x02])
+
+
+if __name__ == "__main__":
+    unittest.main()
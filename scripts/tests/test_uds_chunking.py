@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Tests for the UDS download chunking (RAMN_Utils.breakInUDSChunk, RAMN_UDS_Handler.transferDataDownload).
+
+Validates that:
+- Chunks are memoryview slices of the source buffer.
+- No empty trailing chunk is produced when the size is a multiple of the chunk size.
+- Transfer Data requests are built from buffers without going through lists.
+"""
+
+import sys
+import os
+import unittest
+
+_scripts_dir = os.path.normpath(
+    os.path.join(os.path.dirname(__file__), "..")
+)
+if _scripts_dir not in sys.path:
+    sys.path.insert(0, _scripts_dir)
+
+from utils.RAMN_UDS_Handler import RAMN_UDS_Handler, RAMN_Utils, breakInUDSChunk
+
+
+class FakeECU(RAMN_UDS_Handler):
+    """UDS handler recording the payloads it sends and acknowledging Transfer Data."""
+
+    def __init__(self):
+        RAMN_UDS_Handler.__init__(self, None, None, 0x7E1, 0x7E9, name="B")
+        self.sent = []
+
+    def sendRawData(self, toSend, timeout=RAMN_Utils.DEFAULT_TIMEOUT, recvAnswer=True):
+        self.sent.append(toSend)
+        return bytes([toSend[0] + 0x40]) + bytes(toSend[1:2])
+
+
+class TestBreakInUDSChunk(unittest.TestCase):
+
+    def test_exact_multiple(self):
+        data = bytes(range(16))
+        chunks = list(breakInUDSChunk(data, 8))
+        self.assertEqual([bytes(c) for c in chunks], [data[:8], data[8:]])
+        self.assertTrue(all(isinstance(c, memoryview) for c in chunks))
+
+    def test_remainder(self):
+        self.assertEqual([len(c) for c in breakInUDSChunk(bytes(20), 8)], [8, 8, 4])
+
+    def test_list_and_empty(self):
+        self.assertEqual([bytes(c) for c in breakInUDSChunk([1, 2, 3], 2)], [b"\x01\x02", b"\x03"])
+        self.assertEqual(list(breakInUDSChunk(b"", 8)), [])
+
+
+class TestTransferDataDownload(unittest.TestCase):
+
+    def setUp(self):
+        RAMN_Utils.setVerboseLevel(0)
+
+    def test_payloads(self):
+        ecu = FakeECU()
+        data = memoryview(bytes(range(256)) * 4)
+        self.assertEqual(ecu.transferDataDownload(data, chunkSize=0x100), [])
+        self.assertEqual(len(ecu.sent), 4)
+        for seq, payload in enumerate(ecu.sent, 1):
+            self.assertIsInstance(payload, bytearray)
+            self.assertEqual(bytes(payload), bytes([0x36, seq]) + bytes(range(256)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Tests for the background reader of RAMN_USB_Handler.
+
+Validates that:
+- Frames are kept in a bounded ring buffer, and dropped frames are counted.
+- Frames are timestamped when they are read from the port.
+- Waiting for a frame returns None once the timeout expires, with and
+  without background reader, and the total wait does not exceed it.
+- stopReader terminates the thread and keeps received data available.
+"""
+
+import sys
+import os
+import threading
+import time
+import unittest
+
+_scripts_dir = os.path.normpath(
+    os.path.join(os.path.dirname(__file__), "..")
+)
+if _scripts_dir not in sys.path:
+    sys.path.insert(0, _scripts_dir)
+
+from utils.RAMN_USB_Handler import (
+    RAMN_USB_Handler, RAMN_Utils, READER_POLL_TIMEOUT,
+)
+
+
+class FakeSerial:
+    """Serial port whose reads wait for injected data up to the timeout."""
+
+    def __init__(self):
+        self.timeout = None
+        self.out_waiting = 0
+        self.rx = bytearray()
+        self.cond = threading.Condition()
+        self.timeouts = []
+
+    @property
+    def in_waiting(self):
+        with self.cond:
+            return len(self.rx)
+
+    def inject(self, data):
+        with self.cond:
+            self.rx += data
+            self.cond.notify_all()
+
+    def read(self, n):
+        with self.cond:
+            self.timeouts.append(self.timeout)
+            self.cond.wait_for(lambda: len(self.rx) > 0, self.timeout)
+            data = bytes(self.rx[:n])
+            del self.rx[:n]
+            return data
+
+    def write(self, data):
+        pass
+
+
+class TestUSBReader(unittest.TestCase):
+
+    def setUp(self):
+        RAMN_Utils.setVerboseLevel(0)
+        self.ramn = RAMN_USB_Handler("fake")
+        self.ramn.ser = FakeSerial()
+        self.addCleanup(self.ramn.stopReader)
+
+    def _wait_received(self, count):
+        deadline = time.monotonic() + 2.0
+        while time.monotonic() < deadline:
+            with self.ramn.rxCondition:
+                if len(self.ramn.rxFrames) + self.ramn.rxDropped >= count:
+                    return
+            time.sleep(0.01)
+        self.fail("frames not received")
+
+    def test_ring_buffer_bounded(self):
+        self.ramn.startReader(ringSize=4)
+        for i in range(10):
+            self.ramn.ser.inject("t1231{:02x}\r".format(i).encode())
+        self._wait_received(10)
+        self.assertEqual(self.ramn.rxDropped, 6)
+        frames = self.ramn.getCANFrames(timeout=0.1)
+        self.assertEqual([f.payload[0] for f in frames], [6, 7, 8, 9])
+
+    def test_rx_timestamp(self):
+        self.ramn.startReader()
+        before = time.perf_counter()
+        self.ramn.ser.inject(b"t12300\r")
+        frame = self.ramn.getNextCANFrame(timeout=1.0)
+        after = time.perf_counter()
+        self.assertIsNotNone(frame)
+        self.assertTrue(before <= frame.rxtime <= after)
+
+    def test_timeout_with_reader(self):
+        self.ramn.startReader()
+        start = time.perf_counter()
+        self.assertIsNone(self.ramn.getNextCANFrame(timeout=0.1))
+        elapsed = time.perf_counter() - start
+        self.assertGreaterEqual(elapsed, 0.09)
+        self.assertLess(elapsed, 0.5)
+        self.assertIsNone(self.ramn.readline(timeout=0.05))
+
+    def test_timeout_without_reader(self):
+        # A line that is not a CAN frame arrives, but no frame ever does
+        self.ramn.ser.inject(b"%00162\r")
+        start = time.perf_counter()
+        self.assertIsNone(self.ramn.getNextCANFrame(timeout=0.2))
+        self.assertLess(time.perf_counter() - start, 0.35)
+        # Each read only waits for the time left
+        timeouts = self.ramn.ser.timeouts
+        self.assertGreaterEqual(len(timeouts), 2)
+        self.assertLessEqual(timeouts[0], 0.2)
+        self.assertLess(timeouts[-1], 0.2)
+        self.assertEqual(self.ramn.readline(timeout=0.1), b"%00162")
+
+    def test_stop_reader(self):
+        self.ramn.startReader()
+        thread = self.ramn.readerThread
+        self.ramn.ser.inject(b"t12300\r")
+        self._wait_received(1)
+        start = time.perf_counter()
+        self.ramn.stopReader()
+        self.assertLess(time.perf_counter() - start, READER_POLL_TIMEOUT + 0.5)
+        self.assertFalse(thread.is_alive())
+        self.assertIsNone(self.ramn.readerThread)
+        self.assertFalse(self.ramn.readerRunning)
+        # Data received by the reader stays available to the polling functions
+        self.assertEqual(self.ramn.getNextCANFrame(timeout=0.1).canid, 0x123)
+        self.ramn.stopReader()  # No-op when not running
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Tests for the per-CAN-ID subscriptions of RAMN_USB_Handler.
+
+Validates that:
+- Frames are demultiplexed to the subscription of their CAN ID, and frames
+  matching no subscription stay available to getNextCANFrame.
+- ID/mask subscriptions receive every matching frame.
+- A frame matching several subscriptions is delivered to each of them.
+- Frames dropped because a subscription queue is full are counted.
+- Unsubscribed queues do not receive frames anymore.
+"""
+
+import sys
+import os
+import unittest
+
+_scripts_dir = os.path.normpath(
+    os.path.join(os.path.dirname(__file__), "..")
+)
+if _scripts_dir not in sys.path:
+    sys.path.insert(0, _scripts_dir)
+
+from utils.RAMN_USB_Handler import RAMN_USB_Handler, RAMN_Utils
+
+
+class FakeSerial:
+    """Serial port returning injected data."""
+
+    def __init__(self):
+        self.timeout = None
+        self.out_waiting = 0
+        self.rx = bytearray()
+
+    @property
+    def in_waiting(self):
+        return len(self.rx)
+
+    def read(self, n):
+        data = bytes(self.rx[:n])
+        del self.rx[:n]
+        return data
+
+    def write(self, data):
+        pass
+
+
+class TestSubscriptions(unittest.TestCase):
+
+    def setUp(self):
+        RAMN_Utils.setVerboseLevel(0)
+        self.ramn = RAMN_USB_Handler("fake")
+        self.ramn.ser = FakeSerial()
+
+    def _inject(self, *canids):
+        for canid in canids:
+            if canid > 0x7FF:
+                self.ramn.ser.rx += "T{:08x}0\r".format(canid).encode()
+            else:
+                self.ramn.ser.rx += "t{:03x}0\r".format(canid).encode()
+
+    def _ids(self, frames):
+        return [f.canid for f in frames]
+
+    def test_demultiplexing(self):
+        a = self.ramn.subscribe(ids=[0x100])
+        b = self.ramn.subscribe(ids=[0x200, 0x201])
+        self._inject(0x100, 0x200, 0x300, 0x201, 0x100)
+        self.assertEqual(self._ids(a.getAll(timeout=0.1)), [0x100, 0x100])
+        self.assertEqual(self._ids(b.getAll(timeout=0.1)), [0x200, 0x201])
+        self.assertEqual(self._ids(self.ramn.getCANFrames(timeout=0.1)), [0x300])
+        self.assertIsNone(a.get(timeout=0.01))
+
+    def test_mask(self):
+        sub = self.ramn.subscribe(canid=0x18DA00F1, mask=0x1FFF00FF)
+        self._inject(0x18DAE1F1, 0x18DAF1E1, 0x18DA00F1, 0x7E8)
+        self.assertEqual(self._ids(sub.getAll(timeout=0.1)),
+                         [0x18DAE1F1, 0x18DA00F1])
+        self.assertEqual(self._ids(self.ramn.getCANFrames(timeout=0.1)),
+                         [0x18DAF1E1, 0x7E8])
+
+    def test_multiple_subscribers(self):
+        first = self.ramn.subscribe(ids=[0x123])
+        sniffer = self.ramn.subscribe(mask=0)
+        self._inject(0x123, 0x456)
+        self.assertEqual(self._ids(first.getAll(timeout=0.1)), [0x123])
+        self.assertEqual(self._ids(sniffer.getAvailable()), [0x123, 0x456])
+        self.assertEqual(self.ramn.getCANFrames(timeout=0.01), [])
+
+    def test_drop_counting(self):
+        sub = self.ramn.subscribe(ids=[0x123], maxSize=2)
+        for i in range(5):
+            self.ramn.ser.rx += "t1231{:02x}\r".format(i).encode()
+        frames = sub.getAll(timeout=0.1)
+        self.assertEqual([f.payload[0] for f in frames], [3, 4])
+        self.assertEqual(sub.dropped, 3)
+        self.assertEqual(self.ramn.rxDropped, 0)
+
+    def test_unsubscribe(self):
+        sub = self.ramn.subscribe(ids=[0x123])
+        self._inject(0x123)
+        self.assertEqual(self._ids(sub.getAll(timeout=0.1)), [0x123])
+        sub.close()
+        self.assertNotIn(sub, self.ramn.subscriptions)
+        self._inject(0x123)
+        self.assertEqual(self._ids(self.ramn.getCANFrames(timeout=0.1)), [0x123])
+        self.assertEqual(sub.getAvailable(), [])
+        self.ramn.unsubscribe(sub)  # Unsubscribing twice is harmless
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Tests for the coalesced TX path of RAMN_USB_Handler.
+
+Validates that:
+- bytes, str and list commands are accepted with and without coalescing.
+- Coalesced commands are written together, in order, when flushed.
+- Disabling coalescing also makes ISO-TP frames be written one by one.
+- By default, the consecutive frames of a multi-frame ISO-TP transfer are
+  written together.
+"""
+
+import sys
+import os
+import unittest
+
+_scripts_dir = os.path.normpath(
+    os.path.join(os.path.dirname(__file__), "..")
+)
+if _scripts_dir not in sys.path:
+    sys.path.insert(0, _scripts_dir)
+
+from utils.RAMN_UDS_Handler import RAMN_USB_Handler, RAMN_ISOTP_Handler, RAMN_Utils
+from utils.RAMN_SLCAN import SLCANFrame
+
+
+class FakeSerial:
+    """Serial port recording every write."""
+
+    def __init__(self):
+        self.out_waiting = 0
+        self.writes = []
+
+    def write(self, data):
+        self.writes.append(bytes(data))
+
+
+class TestTXCoalescing(unittest.TestCase):
+
+    def setUp(self):
+        RAMN_Utils.setVerboseLevel(0)
+        self.ramn = RAMN_USB_Handler("fake")
+        self.ramn.ser = FakeSerial()
+
+    def test_command_types(self):
+        for coalesce in (False, True):
+            self.ramn.ser.writes = []
+            self.ramn.setTXCoalescing(coalesce)
+            self.ramn.sendCommand(b"t1230")
+            self.ramn.sendCommand("t4560")
+            self.ramn.sendCommand([0x74, 0x37, 0x38, 0x39, 0x30])
+            self.ramn.flushTX()
+            self.assertEqual(b"".join(self.ramn.ser.writes),
+                             b"t1230\rt4560\rt7890\r")
+            self.assertEqual(len(self.ramn.ser.writes), 1 if coalesce else 3)
+
+    def test_isotp_follows_coalescing(self):
+        tp = RAMN_ISOTP_Handler(self.ramn, {0x7E9: 0x7E1})
+        for coalesce, expected in ((True, 1), (False, 2)):
+            self.ramn.ser.writes = []
+            self.ramn.setTXCoalescing(coalesce)
+            tp.sendFrame(bytes(range(20)), 0x7E1, 0x7E9)
+            tp.processTX()  # First frame
+            tp.txList[0x7E1].receivedFC = True
+            self.ramn.ser.writes = []
+            tp.processTX()  # Consecutive frames
+            self.assertEqual(len(self.ramn.ser.writes), expected)
+            tp.txList.clear()
+
+    def test_isotp_transfer_coalesced_by_default(self):
+        tp = RAMN_ISOTP_Handler(self.ramn, {0x7E9: 0x7E1})
+        tp.sendFrame(bytes(range(100)), 0x7E1, 0x7E9)
+        tp.processTX()  # First frame
+        self.assertEqual(self.ramn.ser.writes, [b"t7e181064000102030405\r"])
+        # Flow Control: continue, no block size, no separation time
+        tp.processRX(SLCANFrame(0x7E9, b"\x30\x00\x00", False, False,
+                                False, False, False, None))
+        self.ramn.ser.writes = []
+        tp.processTX()
+        self.assertEqual(len(self.ramn.ser.writes), 1)
+        frames = self.ramn.ser.writes[0].split(b"\r")[:-1]
+        self.assertEqual(len(frames), 14)
+        self.assertEqual(frames[0], b"t7e1821060708090a0b0c")
+        self.assertFalse(tp.txList)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Tests for the vcand frame router (RAMN_VCAND.py).
+
+Validates that:
+- Lines are forwarded according to the routing table, with raw serial lines
+  passed through untouched and non-frame lines kept off the CAN interface.
+- Frames from the virtual CAN interface are encoded once for all serial ports.
+- A destination that does not read does not stall the others, and its
+  backlog is bounded (checked with a real pty opened by pyserial).
+"""
+
+import sys
+import os
+import pty
+import socket
+import time
+import unittest
+
+_scripts_dir = os.path.normpath(
+    os.path.join(os.path.dirname(__file__), "..")
+)
+if _scripts_dir not in sys.path:
+    sys.path.insert(0, _scripts_dir)
+
+import can
+import serial
+
+from vcand.RAMN_VCAND import (
+    Router,
+    SerialEndpoint,
+    CANEndpoint,
+    RoutedLine,
+    getSerialFromFrame,
+    getFrameFromMsg,
+    CHANNEL_HARDWARE_RAMN,
+    CHANNEL_VIRTUAL_SERIAL_CH1,
+    CHANNEL_VIRTUAL_SERIAL_CH2,
+    CHANNEL_VIRTUAL_CAN,
+)
+
+
+class FakePort:
+    """Serial port backed by a socket pair."""
+
+    def __init__(self):
+        self.inner, self.outer = socket.socketpair()
+        self.outer.settimeout(1.0)
+
+    def fileno(self):
+        return self.inner.fileno()
+
+    def received(self, size):
+        """Bytes written by the router, as seen by the other end."""
+        data = b""
+        while len(data) < size:
+            data += self.outer.recv(size - len(data))
+        return data
+
+
+class FakeCANBus:
+    """CAN bus whose received messages are signalled through a socket pair."""
+
+    def __init__(self):
+        self.inner, self.outer = socket.socketpair()
+        self.inner.setblocking(False)
+        self.rx = []
+        self.sent = []
+
+    def fileno(self):
+        return self.inner.fileno()
+
+    def inject(self, msg):
+        self.rx.append(msg)
+        self.outer.send(b"x")
+
+    def recv(self, timeout):
+        if not self.rx:
+            return None
+        self.inner.recv(1)
+        return self.rx.pop(0)
+
+    def send(self, msg):
+        self.sent.append(msg)
+
+
+class TestRouter(unittest.TestCase):
+
+    def setUp(self):
+        self.router = Router()
+        self.ports = {}
+        for channel in (CHANNEL_HARDWARE_RAMN, CHANNEL_VIRTUAL_SERIAL_CH1,
+                        CHANNEL_VIRTUAL_SERIAL_CH2):
+            self.ports[channel] = FakePort()
+            self.router.add(SerialEndpoint(channel, self.ports[channel]))
+        self.bus = FakeCANBus()
+        self.router.add(CANEndpoint(CHANNEL_VIRTUAL_CAN, self.bus))
+
+    def _poll(self, count=3):
+        for _ in range(count):
+            self.router.poll(0.05)
+
+    def test_ramn_lines_forwarded(self):
+        lines = b"1t1239" + b"ab" * 12 + b"\r\r"
+        self.ports[CHANNEL_HARDWARE_RAMN].outer.send(lines)
+        self._poll()
+        for channel in (CHANNEL_VIRTUAL_SERIAL_CH1, CHANNEL_VIRTUAL_SERIAL_CH2):
+            self.assertEqual(self.ports[channel].received(len(lines)), lines)
+        self.assertEqual(len(self.bus.sent), 1)
+        msg = self.bus.sent[0]
+        self.assertEqual(msg.arbitration_id, 0x123)
+        self.assertTrue(msg.is_fd and msg.bitrate_switch)
+        self.assertEqual(bytes(msg.data), b"\xab" * 12)
+
+    def test_pts_commands_not_sent_to_can(self):
+        self.ports[CHANNEL_VIRTUAL_SERIAL_CH1].outer.send(b"V\rt")
+        self._poll()
+        self.assertEqual(self.ports[CHANNEL_HARDWARE_RAMN].received(2), b"V\r")
+        self.assertEqual(self.ports[CHANNEL_VIRTUAL_SERIAL_CH2].received(2),
+                         b"V\r")
+        self.assertEqual(self.bus.sent, [])
+
+    def test_can_frames_encoded_once(self):
+        calls = []
+        endpoint = self.router.endpoints[CHANNEL_HARDWARE_RAMN]
+        encode = SerialEndpoint.encode
+
+        def counting_encode(record):
+            calls.append(record)
+            return encode(endpoint, record)
+        endpoint.encode = counting_encode
+
+        self.bus.inject(can.Message(arbitration_id=0x18DAF1E1,
+                                    data=b"\x02\x3e\x00",
+                                    is_extended_id=True))
+        self._poll()
+        expected = b"T18daf1e13023e00\r"
+        for port in self.ports.values():
+            self.assertEqual(port.received(len(expected)), expected)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(self.bus.sent, [])
+
+    def test_stalled_destination_bounded(self):
+        # Replace CH1 by a real pty whose master end is never read
+        master, slave = pty.openpty()
+        port = serial.Serial(os.ttyname(slave))
+        self.addCleanup(os.close, master)
+        self.addCleanup(os.close, slave)
+        self.addCleanup(port.close)
+        self.router.remove(self.router.endpoints[CHANNEL_VIRTUAL_SERIAL_CH1])
+        endpoint = SerialEndpoint(CHANNEL_VIRTUAL_SERIAL_CH1, port,
+                                  maxBuffer=0x1000)
+        self.router.add(endpoint)
+
+        line = b"1t1239" + b"ab" * 12 + b"\r"
+        count = 0x40000 // len(line)
+        start = time.monotonic()
+        for _ in range(count):
+            self.router.route(RoutedLine(CHANNEL_HARDWARE_RAMN, None, line))
+            self.router.poll(0)
+        self.assertLess(time.monotonic() - start, 5.0)
+        self.assertLessEqual(len(endpoint.txBuffer), 0x1000)
+        self.assertGreater(endpoint.dropped, 0)
+        # CH2 still receives everything
+        received = b""
+        outer = self.ports[CHANNEL_VIRTUAL_SERIAL_CH2].outer
+        outer.setblocking(False)
+        while len(received) < count * len(line):
+            self.router.poll(0.01)
+            try:
+                received += outer.recv(0x10000)
+            except BlockingIOError:
+                pass
+            self.assertLess(time.monotonic() - start, 5.0)
+        self.assertEqual(received, line * count)
+
+        # Once the counterpart reads again, the backlog is written
+        os.set_blocking(master, False)
+        for _ in range(100):
+            self.router.poll(0.01)
+            try:
+                while os.read(master, 0x10000):
+                    pass
+            except BlockingIOError:
+                pass
+            if not endpoint.pending():
+                break
+        self.assertFalse(endpoint.pending())
+
+    def test_fd_frame_round_trip(self):
+        msg = can.Message(arbitration_id=0x24, data=bytes(range(64)),
+                          is_fd=True, is_extended_id=False)
+        line = getSerialFromFrame(getFrameFromMsg(msg))
+        self.assertEqual(line, b"0t024f" + bytes(range(64)).hex().encode()
+                         + b"\r")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,489 @@
+#!/usr/bin/env python
+# Copyright (c) 2026 TOYOTA MOTOR CORPORATION. ALL RIGHTS RESERVED.
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+#asyncio front-end for the UDS, KWP and XCP handlers.
+#The serial port of each board is watched by the event loop (or polled from it on platforms where this is not possible),
+#and requests complete through futures resolved by the ISO-TP engine. Many boards can be driven from one thread.
+#Typical use:
+#   ramn, tp = getRAMNHandlers(port)
+#   transport = RAMN_Async_Transport(ramn,tp)
+#   await transport.start()
+#   ECUA, ECUB, ECUC, ECUD = getAsyncECUHandlersUDS(transport)
+#   vin = await ECUB.readVIN()
+#Once started, the synchronous handlers of the same board must not be used anymore (until stop is called).
+
+import asyncio
+import os
+from utils.RAMN_Diag_Main import *
+
+#Period at which the serial port is polled when the event loop cannot watch it (e.g. Windows, or ports without file descriptor)
+ASYNC_POLL_PERIOD = 0.002
+
+#Resolves waiting futures with the oldest items of ring. Futures cancelled by a timeout are skipped.
+def resolveWaiters(waiters,ring):
+    while len(waiters) > 0 and len(ring) > 0:
+        future = waiters.popleft()
+        if not future.done():
+            future.set_result(ring.popleft())
+
+#Class that runs the serial link and the ISO-TP engine of one board from an asyncio event loop
+class RAMN_Async_Transport():
+    def __init__(self,ramn,tp):
+        self.ramn = ramn
+        self.tp = tp
+        self.loop = None
+        self.fd = None
+        self.writing = False #True while the event loop watches the port for the rest of the TX buffer
+        self.pollHandle = None
+        self.paceHandle = None
+        self.previousTimeout = None
+        self.responseWaiters = {} #RX ID -> futures waiting for an ISO-TP payload
+        self.txWaiters = {}       #TX ID -> futures waiting for the end of a transmission
+        self.frameWaiters = {}    #subscription -> futures waiting for a single CAN frame
+        self.lineWaiters = collections.deque() #futures waiting for a non-frame line (UDS over USB)
+        self.locks = {}
+
+    #Starts servicing the board from the running event loop
+    async def start(self):
+        if self.loop != None:
+            return
+        self.loop = asyncio.get_running_loop()
+        #The event loop replaces the scheduler and background reader threads
+        self.tp.stopScheduler()
+        self.ramn.stopReader()
+        self.previousTimeout = self.ramn.ser.timeout
+        self.ramn.ser.timeout = 0 #Reads must never block the event loop
+        try:
+            fd = self.ramn.ser.fileno()
+            self.loop.add_reader(fd,self.service)
+            self.fd = fd
+            #Commands (including Flow Control frames) are queued, and written by the event loop when the port accepts them
+            self.ramn.deferredFlush = self.writeTX
+        except (AttributeError, NotImplementedError):
+            self.poll()
+        self.ramn.flushTX()
+        self.service() #Process data received before start
+
+    #Stops servicing the board. Pending requests are cancelled.
+    def stop(self):
+        if self.loop == None:
+            return
+        if self.fd != None:
+            self.loop.remove_reader(self.fd)
+            if self.writing:
+                self.loop.remove_writer(self.fd)
+                self.writing = False
+            self.ramn.deferredFlush = None
+            self.ramn.flushTX()
+            self.fd = None
+        for handle in (self.pollHandle, self.paceHandle):
+            if handle != None:
+                handle.cancel()
+        self.pollHandle = None
+        self.paceHandle = None
+        for waiters in list(self.responseWaiters.values()) + list(self.txWaiters.values()) + list(self.frameWaiters.values()) + [self.lineWaiters]:
+            for future in waiters:
+                future.cancel()
+            waiters.clear()
+        self.ramn.ser.timeout = self.previousTimeout
+        self.loop = None
+
+    #Returns a lock that callers use to keep a single outstanding request per ECU
+    def lock(self,key):
+        if key not in self.locks.keys():
+            self.locks[key] = asyncio.Lock()
+        return self.locks[key]
+
+    #Writes as much of the TX buffer as the port accepts without blocking, and watches the port until the rest is written
+    def writeTX(self):
+        with self.ramn.txLock:
+            try:
+                while len(self.ramn.txBuffer) > 0:
+                    with memoryview(self.ramn.txBuffer) as mv:
+                        written = os.write(self.fd,mv[:TX_CHUNK_SIZE])
+                    del self.ramn.txBuffer[:written]
+            except BlockingIOError:
+                pass
+            pending = len(self.ramn.txBuffer) > 0
+        if pending and not self.writing:
+            self.loop.add_writer(self.fd,self.writeTX)
+        elif not pending and self.writing:
+            self.loop.remove_writer(self.fd)
+        self.writing = pending
+
+    def poll(self):
+        self.service()
+        self.pollHandle = self.loop.call_later(ASYNC_POLL_PERIOD,self.poll)
+
+    def pace(self):
+        self.paceHandle = None
+        self.service()
+
+    #Reads available data, runs the ISO-TP engine and resolves the futures of completed requests. Never blocks.
+    def service(self):
+        rxtime = self.ramn.receive()
+        with self.ramn.rxCondition:
+            if rxtime != None:
+                self.ramn.dispatch(rxtime)
+            resolveWaiters(self.lineWaiters,self.ramn.rxLines)
+            for sub, waiters in self.frameWaiters.items():
+                resolveWaiters(waiters,sub.frames)
+
+        for frame in self.tp.sub.getAvailable():
+            self.tp.processRX(frame)
+        self.tp.processTX()
+
+        with self.tp.lock:
+            for rx, waiters in self.responseWaiters.items():
+                if rx in self.tp.completed.keys():
+                    resolveWaiters(waiters,self.tp.completed[rx])
+            for tx, waiters in self.txWaiters.items():
+                if tx not in self.tp.txList.keys():
+                    while len(waiters) > 0:
+                        future = waiters.popleft()
+                        if not future.done():
+                            future.set_result(True)
+
+        #Come back when a session paced by its separation time may send its next frame
+        if self.paceHandle == None:
+            delay = self.tp.getTXDelay()
+            if delay != None:
+                self.paceHandle = self.loop.call_later(delay,self.pace)
+
+    #Waits for future. Returns its result, or None after timeout seconds (0 to wait forever).
+    async def wait(self,future,timeout=0):
+        try:
+            return await asyncio.wait_for(future, timeout if timeout != 0 else None)
+        except asyncio.TimeoutError:
+            return None
+
+    #Sends a payload over ISO-TP and returns the answer received on rx (or [] once sent if recvAnswer is False). None on timeout.
+    async def requestISOTP(self,payload,tx,rx,timeout=0,recvAnswer=True):
+        future = self.loop.create_future()
+        if recvAnswer:
+            self.responseWaiters.setdefault(rx,collections.deque()).append(future)
+        else:
+            self.txWaiters.setdefault(tx,collections.deque()).append(future)
+        self.tp.clearResponses(rx) #Answers to previous requests are not for this one
+        self.tp.sendFrame(payload,tx,rx)
+        self.service()
+        result = await self.wait(future,timeout)
+        if not recvAnswer and result != None:
+            return []
+        return result
+
+    #Sends a single CAN frame and returns the next frame received by sub, or None on timeout
+    async def requestFrame(self,command,sub,timeout=0):
+        future = self.loop.create_future()
+        sub.clear() #Discard answers to previous requests
+        self.frameWaiters.setdefault(sub,collections.deque()).append(future)
+        self.ramn.sendCommand(command)
+        self.service()
+        return await self.wait(future,timeout)
+
+    #Sends a UDS command to ECU A over USB and returns its answer payload, or None on timeout
+    async def requestUDSUSB(self,command,timeout=0,recvAnswer=True):
+        if not recvAnswer:
+            self.ramn.sendCommand(formatUDSCommandUSB(command))
+            return []
+        future = self.loop.create_future()
+        self.lineWaiters.append(future)
+        self.ramn.sendCommand(formatUDSCommandUSB(command))
+        self.service()
+        answer = await self.wait(future,timeout)
+        payload = parseUDSAnswerUSB(answer)
+        if answer != None and payload == None:
+            log("Got Unexpected Answer. CAN messages should be OFF during USB diagnostics ({})".format(answer),LOG_ERROR)
+        return payload
+
+#Class that handles UDS communication for one ECU from asyncio. Methods are coroutines mirroring RAMN_UDS_Handler.
+class RAMN_Async_UDS_Handler:
+    def __init__(self,transport,txid,rxid,name="Unknown",isUSB=False):
+        self.uds = UDSAnalyzer()
+        self.transport = transport
+        self.txid = txid
+        self.rxid = rxid
+        self.name = name
+        self.isUSB = isUSB
+
+    #Send a Raw payload over UDS
+    async def sendRawData(self,toSend,timeout=RAMN_Utils.DEFAULT_TIMEOUT,recvAnswer=True):
+        toSend = checkRawPayload(toSend,0xFFF)
+        if toSend == None:
+            return None
+
+        if isLogEnabled(LOG_DEBUG):
+            log("SEND:" + self.uds.display(toSend),LOG_DEBUG)
+        async with self.transport.lock(self.txid):
+            if self.isUSB:
+                payload = await self.transport.requestUDSUSB(toSend,timeout,recvAnswer)
+            else:
+                payload = await self.transport.requestISOTP(toSend,self.txid,self.rxid,timeout,recvAnswer)
+        if recvAnswer and payload != None:
+            if isLogEnabled(LOG_DEBUG):
+                log("RECV:" + self.uds.display(payload),LOG_DEBUG)
+        return payload
+
+    #Send a UDS command with specified parameters
+    async def sendCommand(self, commandID, params=[],timeout=RAMN_Utils.DEFAULT_TIMEOUT, recvAnswer=True):
+        toSend = bytearray([commandID])
+        toSend.extend(params)
+        r = await self.sendRawData(toSend,timeout, recvAnswer)
+        return parseUDSAnswer(commandID,r,recvAnswer)
+
+    #Sends a tester present command and wait for answer
+    async def testerPresent(self):
+        return checkTesterPresent(await self.sendCommand(0x3E,[0x00]),self.txid,self.rxid)
+
+    #Goes to specified diagnostic session
+    async def diagnosticSessionControl(self, session):
+        return await self.sendCommand(0x10,[session])
+
+    #perform "security access" (currently implemented as a dummy, non-secure Seed XOR with static "key")
+    async def performSecurityAccess(self,level):
+        l = await self.sendCommand(0x27,[level])
+        if l == None:
+            return None
+        return await self.sendCommand(0x27,computeSecurityKey(l))
+
+    async def readMemoryByAddress(self,address,size):
+        if checkAddressValidity(address,address+size):
+            return await self.sendCommand(0x23, readMemoryParams(address,size))
+        log("Tried to read a memory outside of readable range", LOG_ERROR)
+        return None
+
+    async def routineControl(self,action,subroutine, parameters=[], recvAnswer=True):
+        r = await self.sendCommand(0x31, [action] + int16ToList(subroutine) + parameters,recvAnswer=recvAnswer)
+        if r != None:
+            return r[3:]
+        return None
+
+    #Request that ECU stops sending periodic messages
+    async def disablePeriodicSending(self):
+        return await self.routineControl(0x01,0x0200)
+
+    #Request that ECU resumes sending periodic messages
+    async def enablePeriodicSending(self):
+        return await self.routineControl(0x02,0x0200)
+
+    async def requestDownload(self,address,size):
+        return await self.sendCommand(0x34, transferRequestParams(address,size))
+
+    async def requestUpload(self,address,size):
+        blockSize = await self.sendCommand(0x35, transferRequestParams(address,size))
+        if blockSize != None:
+            return listToInt16(blockSize[1:])
+        return None
+
+    async def transferDataSingle(self, seq, data=b''):
+        toSend = bytearray([0x36,seq])
+        toSend.extend(data)
+        return parseUDSAnswer(0x36,await self.sendRawData(toSend))
+
+    async def requestTransferExit(self):
+        return await self.sendCommand(0x37)
+
+    async def resetECU(self):
+        return await self.sendCommand(0x11, [0x01],recvAnswer=False)
+
+    #perform as many "Transfer Data" commands as necessary, for UPLOAD (ECU->Python Script)
+    async def transferDataUpload(self,expectedSize):
+        seq = 1
+        result = []
+        while len(result) != expectedSize:
+            r = await self.transferDataSingle(seq)
+            if r == None or not checkTransferSequence(seq,r):
+                return None
+            result += r[1:]
+            seq = (seq + 1)& 0xFF
+        return result
+
+    #perform as many "Transfer Data" commands as necessary, for DOWNLOAD (Python Script->ECU)
+    async def transferDataDownload(self,data,chunkSize):
+        seq = 1
+        for item in breakInUDSChunk(data,chunkSize):
+            res = await self.transferDataSingle(seq, item)
+            seq = (seq + 1)& 0xFF
+            if not isPositiveAnswer(res):
+                return None
+        return []
+
+    async def readDataByIdentifier(self,identifier):
+        r = await self.sendCommand(0x22, int16ToList(identifier&0xFFFF))
+        if r != None:
+            return r[2:]
+        return None
+
+    async def writeDataByIdentifier(self,identifier,val):
+        return await self.sendCommand(0x2E, int16ToList(identifier&0xFFFF) + val)
+
+    async def readVIN(self):
+        return decodeVIN(await self.readDataByIdentifier(0xF190))
+
+    async def writeVIN(self,vin):
+        return await self.writeDataByIdentifier(0xF190, [ord(i) for i in vin])
+
+    #Perform basic operations required before most UDS feaetures
+    async def setUpForProgramming(self):
+        await self.testerPresent()                #Optional
+        await self.diagnosticSessionControl(0x02) #Request programming Session
+        await self.performSecurityAccess(0x01)    #Perform Security Access
+        await self.disablePeriodicSending()       #Optional
+
+    async def getCRC32(self,address,size):
+        return parseCRC32(await self.routineControl(0x01,0x0206,parameters=int32ToList(address)+int32ToList(size)))
+
+    #Dumps the firmware of ECU using requestUpload
+    async def dumpFirmware(self,addr, size):
+        dump = None
+        blocksize = await self.requestUpload(addr,size)
+        if blocksize != None:
+            log("Requested Upload, got a maximum blocksize of {:04x}".format(blocksize),LOG_DATA)
+            dump = await self.transferDataUpload(size)
+            if dump != None:
+                if await self.requestTransferExit() != None:
+                    dump = checkUploadSize(dump,size)
+        return dump
+
+    #Dumps a specified area of memory using ReadMemoryByAddress
+    async def dumpArea(self,start,end,blockSize=0xFF0):
+        dump = []
+        for address, size in memoryBlocks(start,end,blockSize):
+            r = await self.readMemoryByAddress(address,size)
+            if not checkMemoryBlock(r,size):
+                break
+            dump += r
+        checkDumpSize(dump,end-start)
+        return dump
+
+#Class that handles KWP communication for one ECU from asyncio. Methods are coroutines mirroring RAMN_KWP_Handler.
+class RAMN_Async_KWP_Handler:
+    def __init__(self,transport,txid,rxid,name="Unknown"):
+        self.transport = transport
+        self.txid = txid
+        self.rxid = rxid
+        self.name = name
+
+    #Send a Raw payload over KWP
+    async def sendRawData(self,toSend,timeout=RAMN_Utils.DEFAULT_TIMEOUT,recvAnswer=True):
+        toSend = checkRawPayload(toSend,0xFFF)
+        if toSend == None:
+            return None
+
+        if isLogEnabled(LOG_DEBUG):
+            log("SEND:" + bytes(toSend).hex(),LOG_DEBUG)
+        async with self.transport.lock(self.txid):
+            payload = await self.transport.requestISOTP(toSend,self.txid,self.rxid,timeout,recvAnswer)
+        if recvAnswer and payload != None:
+            if isLogEnabled(LOG_DEBUG):
+                log("RECV:" + bytes(payload).hex(),LOG_DEBUG)
+        return payload
+
+    #Send a KWP command with specified parameters
+    async def sendCommand(self, commandID, params=[],timeout=RAMN_Utils.DEFAULT_TIMEOUT, recvAnswer=True):
+        r = await self.sendRawData([commandID] + params,timeout, recvAnswer)
+        return parseKWPAnswer(commandID,r,recvAnswer)
+
+    #Sends a tester present command and wait for answer
+    async def testerPresent(self):
+        return checkTesterPresent(await self.sendCommand(0x3E,[0x01]),self.txid,self.rxid)
+
+    #Goes to specified diagnostic session
+    async def diagnosticSessionControl(self, session):
+        return await self.sendCommand(0x10,[session])
+
+    #Request that ECU stops sending periodic messages
+    async def disablePeriodicSending(self):
+        return await self.sendCommand(0x28,[0x01])
+
+    #Request that ECU resumes sending periodic messages
+    async def enablePeriodicSending(self):
+        return await self.sendCommand(0x29,[0x01])
+
+#Class that handles XCP communication for one ECU from asyncio. Methods are coroutines mirroring RAMN_XCP_Handler.
+class RAMN_Async_XCP_Handler:
+    def __init__(self,transport,txid,rxid,name="Unknown"):
+        self.transport = transport
+        self.txid = txid
+        self.rxid = rxid
+        self.name = name
+        self.sub = transport.ramn.subscribe(ids=[rxid])
+
+    #Send a Raw payload over XCP
+    async def sendRawData(self,toSend,timeout=RAMN_Utils.DEFAULT_TIMEOUT,recvAnswer=True):
+        toSend = checkRawPayload(toSend,0x8)
+        if toSend == None:
+            return None
+
+        if isLogEnabled(LOG_DEBUG):
+            log("SEND: " + bytes(toSend).hex(),LOG_DEBUG)
+        async with self.transport.lock(self.txid):
+            frame = await self.transport.requestFrame(formatXCPFrame(self.txid,toSend),self.sub,timeout)
+        return parseXCPAnswer(frame)
+
+    async def connect(self):
+        return await self.sendRawData([0xFF,0x00])
+
+    async def setMTA(self,addr):
+        return await self.sendRawData([0xF6,0x00,0x00,0x00] + int32ToList(addr))
+
+    async def upload(self,size):
+        res = await self.sendRawData([0xF5,size&0xFF])
+        if res != None:
+            return res[1:]
+        return None
+
+    async def getID(self):
+        res = await self.sendRawData([0xFA,0x00])
+        if res != None:
+            payloadSize = res[4]
+            log("ECU ID Name is {} bytes, requesting upload".format(payloadSize),LOG_DEBUG)
+            res = await self.upload(payloadSize)
+            if res != None:
+                log("ECU ID is reported as: " + res.decode())
+                return res
+        return None
+
+    async def dumpArea(self,start,end,blockSize=7):
+        size = end - start
+        if size > 0:
+            res = await self.setMTA(start)
+            if res == None:
+                log("Could not set MTA", LOG_ERROR)
+                return None
+            dump = b''
+            if len(res) == 1 and res[0] == 0xFF: #Positive Answer
+                while size > 0:
+                    chunkSize = min(size,blockSize)
+                    chunk = await self.upload(chunkSize)
+                    if chunk == None:
+                        return None
+                    dump += chunk
+                    size -= chunkSize
+            return dump
+        return None
+
+#returns asyncio handlers to access UDS diagnostics for all ECUs of RAMN
+def getAsyncECUHandlersUDS(transport):
+    ECUA = RAMN_Async_UDS_Handler(transport,txid=UDS_ECUA_RX,rxid=UDS_ECUA_TX,name="A",isUSB=True)
+    ECUB = RAMN_Async_UDS_Handler(transport,txid=UDS_ECUB_RX,rxid=UDS_ECUB_TX,name="B")
+    ECUC = RAMN_Async_UDS_Handler(transport,txid=UDS_ECUC_RX,rxid=UDS_ECUC_TX,name="C")
+    ECUD = RAMN_Async_UDS_Handler(transport,txid=UDS_ECUD_RX,rxid=UDS_ECUD_TX,name="D")
+    return ECUA, ECUB, ECUC, ECUD
+
+#returns asyncio handlers to access KWP diagnostics for all ECUs of RAMN
+def getAsyncECUHandlersKWP(transport):
+    ECUB = RAMN_Async_KWP_Handler(transport,txid=KWP_ECUB_RX,rxid=KWP_ECUB_TX,name="B")
+    ECUC = RAMN_Async_KWP_Handler(transport,txid=KWP_ECUC_RX,rxid=KWP_ECUC_TX,name="C")
+    ECUD = RAMN_Async_KWP_Handler(transport,txid=KWP_ECUD_RX,rxid=KWP_ECUD_TX,name="D")
+    return None, ECUB, ECUC, ECUD
+
+#returns asyncio handlers to access XCP diagnostics for all ECUs of RAMN
+def getAsyncECUHandlersXCP(transport):
+    ECUB = RAMN_Async_XCP_Handler(transport,txid=XCP_ECUB_RX,rxid=XCP_ECUB_TX,name="B")
+    ECUC = RAMN_Async_XCP_Handler(transport,txid=XCP_ECUC_RX,rxid=XCP_ECUC_TX,name="C")
+    ECUD = RAMN_Async_XCP_Handler(transport,txid=XCP_ECUD_RX,rxid=XCP_ECUD_TX,name="D")
+    return None, ECUB, ECUC, ECUD
@@ -52,7 +52,8 @@ XCP_ECUD_RX = 0x556
 XCP_ECUD_TX = 0x557 
 
 #returns handlers to interact with ECUs over ISO-TP
-def getRAMNHandlers(port,filterID=b'M7e0', filterMask=b'm7F0',filterIDExtended=b'M00000000', filterMaskExtended=b'm7FFFFFFF'):
+#Set backgroundReader to continuously drain the serial port in a separate thread (recommended for long transfers)
+def getRAMNHandlers(port,filterID=b'M7e0', filterMask=b'm7F0',filterIDExtended=b'M00000000', filterMaskExtended=b'm7FFFFFFF',backgroundReader=False):
     ramn = RAMN_USB_Handler(port)    
     ramn.open(autoOpen=False)
     
@@ -68,6 +69,8 @@ def getRAMNHandlers(port,filterID=b'M7e0', filterMask=b'm7F0',filterIDExtended=b
     ramn.sendCommand(b'O') 
     time.sleep(0.1)
     ramn.flush()
+    if backgroundReader:
+        ramn.startReader()
     
     #Create ISO-TP communication handler
     tp = RAMN_ISOTP_Handler(ramn,{UDS_ECUB_TX:UDS_ECUB_RX, UDS_ECUC_TX:UDS_ECUC_RX, UDS_ECUD_TX:UDS_ECUD_RX,KWP_ECUB_TX:KWP_ECUB_RX, KWP_ECUC_TX:KWP_ECUC_RX, KWP_ECUD_TX:KWP_ECUD_RX})  
@@ -94,5 +97,26 @@ def getECUHandlersXCP(ramn):
     ECUB = RAMN_XCP_Handler(ramn,txid=XCP_ECUB_RX,rxid=XCP_ECUB_TX,name="B")
     ECUC = RAMN_XCP_Handler(ramn,txid=XCP_ECUC_RX,rxid=XCP_ECUC_TX,name="C")
     ECUD = RAMN_XCP_Handler(ramn,txid=XCP_ECUD_RX,rxid=XCP_ECUD_TX,name="D")
-    return None, ECUB, ECUC, ECUD    
+    return None, ECUB, ECUC, ECUD
     
+#Runs every task (a function without argument, e.g. a lambda dumping one ECU) in its own thread and returns their results in the same order.
+#The ISO-TP scheduler is started so that the transfers of all ECUs are interleaved on the CAN bus, and stopped afterwards if it was not running before.
+def runConcurrently(tp,tasks):
+    schedulerRunning = tp.schedulerThread != None
+    readerRunning = tp.ramn.readerThread != None
+    tp.startScheduler()
+    try:
+        results = [None]*len(tasks)
+        def run(index):
+            results[index] = tasks[index]()
+        threads = [threading.Thread(target=run,args=(i,)) for i in range(len(tasks))]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return results
+    finally:
+        if not schedulerRunning:
+            tp.stopScheduler()
+        if not readerRunning:
+            tp.ramn.stopReader()
@@ -9,6 +9,15 @@ from utils.RAMN_USB_Handler import *
 #This is a simple class to communicate over ISO-TP
 #It is a simplified, non-standard compliant implementation, meant for simple testing of RAMN ECUs features over ISO-TP
 
+#Converts a Flow Control STmin byte to seconds. 0x00-0x7F are milliseconds, 0xF1-0xF9 are 100-900 microseconds.
+#Reserved values must be interpreted as the longest separation time (127ms).
+def STminToSeconds(st):
+    if st <= 0x7F:
+        return st/1000
+    if (st >= 0xF1) and (st <= 0xF9):
+        return (st - 0xF0)/10000
+    return 0x7F/1000
+
 #Class that handles formatting of outgoing ISO-TP messages
 class ISOTPTXFormatter():
 
@@ -25,9 +34,16 @@ class ISOTPTXFormatter():
         self.targetST = 0
         self.receivedFC = False
         self.blockCounter = 0
+        self.nextTXTime = 0 #time.perf_counter() before which the next Consecutive Frame must not be sent
            
     def isFinished(self):
         return self.index >= len(self.data)
+    
+    #Returns the number of seconds before the next Consecutive Frame may be sent, or None if it is not waiting for the separation time
+    def getTXDelay(self,now):
+        if self.isFinished() or not self.receivedFC:
+            return None
+        return max(0,self.nextTXTime - now)
         
     def getNextTXMsg(self):
         result = None
@@ -50,17 +66,16 @@ class ISOTPTXFormatter():
                 self.receivedFC = False
                 self.blockCounter = 0
             else:
-                #Consecutive Frame, only send if Flow Control Frame was received
-                if self.receivedFC:
+                #Consecutive Frame, only send if Flow Control Frame was received and separation time has elapsed
+                now = time.perf_counter()
+                if self.receivedFC and now >= self.nextTXTime:
                     size = min(7,len(data)-self.index)
                     result = "t{:03x}{:1x}2{:1x}".format(self.txid,size+1,self.seq) + listToHex(data[self.index:self.index+size])
                     self.seq = (self.seq + 1)&0xF
                     self.index += size
                     self.blockCounter += 1
-                    
-        #Wait specified time     
-        if self.targetST != 0:
-            time.sleep(self.targetST/1000)
+                    if self.targetST != 0:
+                        self.nextTXTime = now + STminToSeconds(self.targetST)
             
         #If reached block size, wait for next Flow Control frame   
         if self.targetBS != 0:
@@ -134,81 +149,211 @@ class ISOTPRXFormatter():
                     self.targetBS = payload[1]
                 if len(payload) > 2:
                     self.targetST = payload[2]
-                    if (payload[2] >= 0xF1) and (payload[2] <0xF9):
-                        self.targetST = 1  #Consider microseconds delay as 1ms
             else:
                 log("Received invalid ISO-TP header", LOG_ERROR)
         
-#Class that handles sending and receiving of ISO-TP frames. The "update" function must be called periodically.
+#Seconds the scheduler thread waits for incoming frames before servicing transmissions again
+SCHEDULER_POLL_TIMEOUT = 0.005
+#Shortest time to wait for incoming frames while a session waits for its separation time (0 would mean "wait forever")
+MIN_POLL_TIMEOUT = 0.00005
+
+#Class that handles sending and receiving of ISO-TP frames. The "update" function must be called periodically, or startScheduler used.
+#Several sessions (one per TX ID) can be active at once: their frames are interleaved on the link, each following its own peer's flow control.
 class RAMN_ISOTP_Handler:
 
     def __init__(self,r,p,bs=0,st=0):
         self.pairs = p
         self.ramn = r
+        self.sub = r.subscribe(ids=p.keys()) #Only receive frames of the ISO-TP pairs, other consumers keep theirs
         self.rxList = {}
         self.txList = {}
+        self.completed = {}
+        self.chained = {}
         self.bs=bs
         self.st=st
+        self.lock = threading.Condition()
+        self.schedulerThread = None
+        self.schedulerRunning = False
 
     #Function to request the sending of a full ISO-TP payload
     def sendFrame(self,payload, tx,rx):
-        if tx in self.txList.keys():
-            log("Received ISO TP Request but current transmission not over", LOG_WARNING)
-            self.txList.pop(tx)
-        self.txList[tx] = ISOTPTXFormatter(payload, txid = tx, rxid = rx)      
+        with self.lock:
+            if tx in self.txList.keys():
+                log("Received ISO TP Request but current transmission not over", LOG_WARNING)
+                self.txList.pop(tx)
+            self.txList[tx] = ISOTPTXFormatter(payload, txid = tx, rxid = rx)
+            self.lock.notify_all()
 
-    def isTxOver(self):
-        return len(self.txList.keys()) == 0
+    #Requests the sending of a payload as soon as the response being received from specified RX ID is complete (immediately if it already is)
+    #Used to pipeline requests: the next request does not wait for the previous answer to be processed by the caller.
+    def sendFrameAfterResponse(self,payload,tx,rx):
+        with self.lock:
+            if len(self.completed.get(rx,())) > 0:
+                self.sendFrame(payload,tx,rx)
+            else:
+                self.chained.setdefault(rx,collections.deque()).append((payload,tx))
     
-    #Function to update the ISO-TP Engine
-    def update(self,recvAnswer=True,timeout=0):
-        result = None 
-        txOverList = []
-        expectingFC=False
-        
-        #Process Outgoing messages
-        for k in self.txList.keys():
-            while (True):
-                msg = self.txList[k].getNextTXMsg()
-                if not self.txList[k].receivedFC:
+    #Discards payloads waiting for a response from specified RX ID
+    def cancelChainedFrames(self,rx):
+        with self.lock:
+            self.chained.pop(rx,None)
+    
+    #Returns True if there is nothing left to send (for specified TX ID, or for all sessions)
+    def isTxOver(self,tx=None):
+        with self.lock:
+            if tx != None:
+                return tx not in self.txList.keys()
+            return len(self.txList.keys()) == 0
+    
+    #Returns a fully received payload (from specified RX ID, or from any ID), or None
+    def popResponse(self,rx=None):
+        with self.lock:
+            if rx == None:
+                for k in self.completed.keys():
+                    if len(self.completed[k]) > 0:
+                        return self.completed[k].popleft()
+            elif rx in self.completed.keys() and len(self.completed[rx]) > 0:
+                return self.completed[rx].popleft()
+        return None
+    
+    #Discards payloads received from specified RX ID that nobody waited for (e.g. answers to requests sent without recvAnswer)
+    def clearResponses(self,rx):
+        with self.lock:
+            if rx in self.completed.keys():
+                self.completed[rx].clear()
+    
+    #Waits for a fully received payload from specified RX ID (scheduler mode). Returns None after timeout seconds (0 to wait forever).
+    def waitResponse(self,rx,timeout=0):
+        with self.lock:
+            if self.lock.wait_for(lambda: len(self.completed.get(rx,())) > 0, timeout if timeout != 0 else None):
+                return self.completed[rx].popleft()
+        return None
+    
+    #Waits until specified TX session has sent everything (scheduler mode).
+    def waitTxOver(self,tx,timeout=0):
+        with self.lock:
+            return self.lock.wait_for(lambda: tx not in self.txList.keys(), timeout if timeout != 0 else None)
+    
+    #Returns the number of seconds before a session waiting for its separation time may send again, or None if no session is waiting
+    def getTXDelay(self):
+        with self.lock:
+            now = time.perf_counter()
+            delays = [d for d in (formatter.getTXDelay(now) for formatter in self.txList.values()) if d != None]
+            if len(delays) == 0:
+                return None
+            return min(delays)
+    
+    #Sends as many frames as allowed, one frame per session in turn, so that concurrent transfers share the link fairly.
+    #Sessions that must wait for their separation time are skipped, and are serviced by later calls.
+    #Returns True if a session is waiting for a Flow Control frame.
+    def processTX(self):
+        with self.lock:
+            expectingFC = False
+            active = list(self.txList.keys())
+            while len(active) > 0:
+                for k in list(active):
+                    formatter = self.txList[k]
+                    msg = formatter.getNextTXMsg()
+                    if msg == None:
+                        active.remove(k)
+                        continue
+                    #Consecutive frames are grouped into large USB writes (unless coalescing was disabled), or written one by one if the receiver requested a separation time
+                    if self.ramn.coalesceBursts:
+                        self.ramn.queueCommand(msg)
+                    else:
+                        self.ramn.sendCommand(msg)
+                    if formatter.targetST != 0:
+                        self.ramn.flushTX()
+                    if formatter.isFinished():
+                        self.txList.pop(k)
+                        active.remove(k)
+            self.ramn.flushTX()
+            for formatter in self.txList.values():
+                if not formatter.receivedFC:
                     expectingFC = True
-                if msg == None:
-                    break
-                self.ramn.sendCommand(msg)
-                if self.txList[k].isFinished():
-                    txOverList.append(k)
-                    break
-        for k in txOverList:
-            self.txList.pop(k)
+            if len(self.txList) == 0:
+                self.lock.notify_all()
+            return expectingFC
+    
+    #Processes one received frame (flow control, or part of a response)
+    def processRX(self,frame):
+        payload = frame.payload
+        canid = frame.canid
+        if canid not in self.pairs.keys():
+            return
+        with self.lock:
+            #Received Message with ID we must receive
+            if canid not in self.rxList:
+                #new Message
+                self.rxList[canid] = ISOTPRXFormatter(bs=self.bs,st=self.st)
+            self.rxList[canid].addMessage(payload) 
             
-        #Process incoming messages with expected (Response or Flow Control frames)
-        if recvAnswer or expectingFC:
-            payload, canid = self.ramn.getNextCANMessage(timeout=timeout)
+            #Send Flow Control Frames if required
+            if self.rxList[canid].mustSendFC():
+                self.ramn.sendCommand("t{:03x}330{:02x}{:02x}".format(self.pairs[canid],self.bs,self.st))
+                
+            #Process Incoming Flow Control frames    
+            if self.rxList[canid].isFC: 
+                if self.pairs[canid] in self.txList.keys():
+                    self.txList[self.pairs[canid]].receivedFC = True
+                    self.txList[self.pairs[canid]].targetBS = self.rxList[canid].targetBS
+                    self.txList[self.pairs[canid]].targetST = self.rxList[canid].targetST
             
+            #If a message was reconstructed, make it available
+            if self.rxList[canid].isFinished():
+                #end of transfer
+                self.completed.setdefault(canid,collections.deque()).append(self.rxList[canid].data)
+                self.rxList.pop(canid) #Remove message
+                if len(self.chained.get(canid,())) > 0:
+                    payload, tx = self.chained[canid].popleft()
+                    self.sendFrame(payload,tx,canid)
+                    self.processTX()
+                self.lock.notify_all()
+    
+    #Function to update the ISO-TP Engine. Returns a reconstructed payload (from specified RX ID, or from any ID) if available.
+    #Payloads reconstructed while recvAnswer is False are kept for a later call.
+    def update(self,recvAnswer=True,timeout=0,rx=None):
+        expectingFC = self.processTX()
+        if recvAnswer:
+            payload = self.popResponse(rx)
             if payload != None:
-                if canid in self.pairs.keys():
-                    #Received Message with ID we must receive
-                    if canid not in self.rxList:
-                        #new Message
-                        self.rxList[canid] = ISOTPRXFormatter(bs=self.bs,st=self.st)
-                    self.rxList[canid].addMessage(payload) 
-                    
-                    #Send Flow Control Frames if required
-                    if self.rxList[canid].mustSendFC():
-                        self.ramn.sendCommand("t{:03x}330{:02x}{:02x}".format(self.pairs[canid],self.bs,self.st))
-                        
-                    #Process Incoming Flow Control frames    
-                    if self.rxList[canid].isFC: 
-                        if self.pairs[canid] in self.txList.keys():
-                            self.txList[self.pairs[canid]].receivedFC = True
-                            self.txList[self.pairs[canid]].targetBS = self.rxList[canid].targetBS
-                            self.txList[self.pairs[canid]].targetST = self.rxList[canid].targetST
-                    
-                    #If a message was reconstructed, send it back
-                    if self.rxList[canid].isFinished():
-                        #end of transfer
-                        result = self.rxList[canid].data
-                        self.rxList.pop(canid) #Remove message
-                        
-            return result
-                
\ No newline at end of file
+                return payload
+            
+        #Process incoming messages with expected (Response or Flow Control frames)
+        if recvAnswer or expectingFC:
+            #Do not wait past the time at which the next paced Consecutive Frame must be sent
+            delay = self.getTXDelay()
+            if delay != None:
+                timeout = max(delay,MIN_POLL_TIMEOUT) if timeout == 0 else min(timeout,max(delay,MIN_POLL_TIMEOUT))
+            frame = self.sub.get(timeout=timeout)
+            if frame != None:
+                self.processRX(frame)
+        if recvAnswer:
+            return self.popResponse(rx)
+        return None
+    
+    #Starts a thread that runs the engine continuously, so that several UDS/KWP handlers can use it at once from their own threads.
+    def startScheduler(self):
+        if self.schedulerThread != None:
+            return
+        self.ramn.startReader() #Other consumers must not read the port concurrently
+        self.schedulerRunning = True
+        self.schedulerThread = threading.Thread(target=self.schedulerLoop,daemon=True)
+        self.schedulerThread.start()
+    
+    def stopScheduler(self):
+        if self.schedulerThread == None:
+            return
+        self.schedulerRunning = False
+        self.schedulerThread.join()
+        self.schedulerThread = None
+    
+    def schedulerLoop(self):
+        while self.schedulerRunning and self.ramn.readerThread != None:
+            self.processTX()
+            timeout = SCHEDULER_POLL_TIMEOUT
+            delay = self.getTXDelay()
+            if delay != None:
+                timeout = min(timeout,max(delay,MIN_POLL_TIMEOUT))
+            for frame in self.sub.getAll(timeout=timeout):
+                self.processRX(frame)
@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+# Copyright (c) 2026 TOYOTA MOTOR CORPORATION. ALL RIGHTS RESERVED.
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+"""
+Continuous J1939 topology monitor.
+
+Where ``j1939_scan()`` takes a one-shot snapshot of the bus, the monitor
+keeps a live table of the Controller Applications and reports changes as
+they happen.  It reuses the scanner techniques:
+
+- the broadcast Request for Address Claimed (addr_claim) and ECU
+  Identification (ecu_id) seed the table when the monitor starts;
+- every extended frame passively refreshes the entry of its SA;
+- entries that stayed silent for ``stale_after`` seconds are re-probed
+  with a unicast Request for Address Claimed (unicast), at most one probe
+  per bus-load budget (``_inter_probe_delay``).
+
+Events
+------
+``J1939Monitor.poll()`` and ``J1939Monitor.run()`` publish
+``J1939Event(kind, sa, timestamp, detail)`` tuples, where *kind* is one of
+
+appeared      first frame received from *sa*
+claimed       Address Claimed NAME learned (detail: NAME)
+conflict      *sa* claimed with a different NAME (detail: (old, new))
+cannot_claim  Cannot Claim Address from the null address (detail: NAME)
+ecu_id        ECU Identification received (detail: ECU-ID bytes)
+disappeared   *sa* did not answer its re-probe within ``lost_after``
+"""
+
+import collections
+import logging
+import time
+
+from utils.RAMN_J1939_Scanner import (
+    j1939_make_id,
+    j1939_get_pf,
+    j1939_get_sa,
+    _encode_pgn_le,
+    _is_extended,
+    _pkt_id,
+    _pkt_data,
+    _get_bitrate,
+    _inter_probe_delay,
+    _set_filters,
+    _get_filters,
+    _default_send,
+    _default_recv,
+    _default_set_filters,
+    EXTENDED_FILTER,
+    PF_REQUEST,
+    PF_TP_CM,
+    PF_TP_DT,
+    PF_ADDRESS_CLAIMED,
+    PGN_ADDRESS_CLAIMED,
+    PGN_ECU_ID,
+    TP_CM_BAM,
+    TP_CM_ABORT,
+    DA_BROADCAST,
+    SCANNER_SA,
+    DEFAULT_BITRATE,
+    DEFAULT_BUSLOAD,
+)
+
+log = logging.getLogger(__name__)
+
+NULL_SA = 0xFE  # source address of Cannot Claim Address
+
+DEFAULT_STALE_AFTER = 5.0  # seconds of silence before an entry is re-probed
+DEFAULT_LOST_AFTER = 1.0   # seconds to answer a re-probe
+
+J1939Event = collections.namedtuple("J1939Event",
+                                    ("kind", "sa", "timestamp", "detail"))
+
+
+class MonitorEntry:
+    """Live state of one SA in the topology table."""
+
+    __slots__ = ("sa", "name", "ecu_id", "first_seen", "last_seen",
+                 "probed_at")
+
+    def __init__(self, sa, now):
+        self.sa = sa
+        self.name = None  # 8-byte NAME from Address Claimed
+        self.ecu_id = None  # reassembled ECU Identification (PGN 64965)
+        self.first_seen = now
+        self.last_seen = now
+        self.probed_at = None  # time of the outstanding re-probe, if any
+
+    def __repr__(self):
+        return ("MonitorEntry(sa=0x%02X, name=%s, ecu_id=%r)"
+                % (self.sa, self.name.hex() if self.name else None,
+                   self.ecu_id))
+
+
+class J1939Monitor:
+    """Track J1939 Controller Applications on *sock* over time.
+
+    *send_fn*, *recv_fn*, *filter_fn*, *bitrate* and *busload* have the
+    same meaning as for ``j1939_scan()``.  *busload* bounds the re-probe
+    rate.  Times in the table are ``time.monotonic()`` values, event
+    timestamps are ``time.time()`` values.
+    """
+
+    def __init__(self, sock, *, send_fn=None, recv_fn=None, filter_fn=None,
+                 bitrate=None, busload=DEFAULT_BUSLOAD,
+                 stale_after=DEFAULT_STALE_AFTER,
+                 lost_after=DEFAULT_LOST_AFTER):
+        self.sock = sock
+        self.send_fn = send_fn or _default_send
+        self.recv_fn = recv_fn or _default_recv
+        self.filter_fn = filter_fn or _default_set_filters
+        if bitrate is None:
+            bitrate = _get_bitrate(sock) or DEFAULT_BITRATE
+        self.stale_after = stale_after
+        self.lost_after = lost_after
+        # One re-probe (request DLC 3, Address Claimed DLC 8) per budget
+        self.probe_interval = _inter_probe_delay(bitrate, busload, 3, 8, 0.0)
+        self.table = {}  # sa -> MonitorEntry
+        self._bam = {}  # sa -> (size, packets, bytearray) of an ECU-ID BAM
+        self._events = []
+        self._next_probe = 0.0
+        self._ecu_id_wanted = False
+        self._ecu_id_sent = None  # time of the last ECU-ID broadcast
+        self._previous_filters = None  # filters to restore on stop()
+        self.started = False
+
+    # -----------------------------------------------------------------
+    # Control
+    # -----------------------------------------------------------------
+
+    def start(self):
+        """Install the receive filters and seed the table with broadcasts."""
+        self._previous_filters = _get_filters(self.sock)
+        _set_filters(self.filter_fn, self.sock, [EXTENDED_FILTER])
+        self._request(DA_BROADCAST, PGN_ADDRESS_CLAIMED)
+        self._request(DA_BROADCAST, PGN_ECU_ID)
+        self._next_probe = time.monotonic() + self.probe_interval
+        self.started = True
+
+    def stop(self):
+        """Restore the receive filters installed before ``start()``."""
+        _set_filters(self.filter_fn, self.sock, self._previous_filters)
+        self.started = False
+
+    def poll(self, timeout):
+        """Process bus traffic for *timeout* seconds, return new events."""
+        if not self.started:
+            self.start()
+        deadline = time.monotonic() + timeout
+        while True:
+            now = time.monotonic()
+            self._maintain(now)
+            if now >= deadline:
+                break
+            wait = deadline - now
+            wake = self._next_wake(now)
+            if wake is not None:
+                wait = min(wait, max(0.0, wake - now))
+            pkt = self.recv_fn(self.sock, wait)
+            if pkt is not None:
+                self._handle(pkt, time.monotonic())
+        events, self._events = self._events, []
+        return events
+
+    def run(self, duration=None, poll_interval=0.1):
+        """Yield events as they happen, forever or for *duration* seconds."""
+        end = None if duration is None else time.monotonic() + duration
+        try:
+            while end is None or time.monotonic() < end:
+                interval = poll_interval
+                if end is not None:
+                    interval = max(0.0, min(interval, end - time.monotonic()))
+                for event in self.poll(interval):
+                    yield event
+        finally:
+            self.stop()
+
+    # -----------------------------------------------------------------
+    # Internals
+    # -----------------------------------------------------------------
+
+    def _emit(self, kind, sa, detail=None):
+        log.debug("monitor: %s SA=0x%02X %r", kind, sa, detail)
+        self._events.append(J1939Event(kind, sa, time.time(), detail))
+
+    def _request(self, da, pgn):
+        probe_id = j1939_make_id(6, PF_REQUEST, da, SCANNER_SA)
+        self.send_fn(self.sock, probe_id, _encode_pgn_le(pgn))
+        if pgn == PGN_ECU_ID:
+            self._ecu_id_sent = time.monotonic()
+
+    def _stale(self, now):
+        """Entries due for a re-probe, least recently seen first."""
+        stale = [e for e in self.table.values()
+                 if e.probed_at is None
+                 and now - e.last_seen >= self.stale_after]
+        return sorted(stale, key=lambda e: e.last_seen)
+
+    def _next_wake(self, now):
+        """Time at which ``_maintain()`` next has something to do."""
+        times = [e.probed_at + self.lost_after for e in self.table.values()
+                 if e.probed_at is not None]
+        due = [e.last_seen + self.stale_after for e in self.table.values()
+               if e.probed_at is None]
+        if self._ecu_id_wanted:
+            due.append(now)
+        if due:
+            times.append(max(self._next_probe, min(due)))
+        return min(times) if times else None
+
+    def _maintain(self, now):
+        """Expire unanswered re-probes and spend the probe budget."""
+        for entry in list(self.table.values()):
+            if (entry.probed_at is not None
+                    and now - entry.probed_at >= self.lost_after):
+                del self.table[entry.sa]
+                self._bam.pop(entry.sa, None)
+                self._emit("disappeared", entry.sa)
+
+        if now < self._next_probe:
+            return
+        if self._ecu_id_wanted:
+            # New SAs since start: ask everyone for their ECU-ID again
+            self._request(DA_BROADCAST, PGN_ECU_ID)
+            self._ecu_id_wanted = False
+        else:
+            stale = self._stale(now)
+            if not stale:
+                return
+            entry = stale[0]
+            log.debug("monitor: re-probing SA=0x%02X", entry.sa)
+            self._request(entry.sa, PGN_ADDRESS_CLAIMED)
+            entry.probed_at = now
+        self._next_probe = now + self.probe_interval
+
+    def _handle(self, pkt, now):
+        """Update the table from one received frame."""
+        if not _is_extended(pkt):
+            return
+        cid = _pkt_id(pkt)
+        pf = j1939_get_pf(cid)
+        sa = j1939_get_sa(cid)
+        data = _pkt_data(pkt)
+
+        if sa == NULL_SA:
+            if pf == PF_ADDRESS_CLAIMED:
+                self._emit("cannot_claim", sa, bytes(data[:8]))
+            return  # also our own frames (SCANNER_SA)
+
+        entry = self.table.get(sa)
+        if entry is None:
+            entry = self.table[sa] = MonitorEntry(sa, now)
+            self._emit("appeared", sa)
+            # SAs answering the last ECU-ID broadcast do not need another
+            if (self._ecu_id_sent is None
+                    or now - self._ecu_id_sent > self.lost_after):
+                self._ecu_id_wanted = True
+        entry.last_seen = now
+        entry.probed_at = None
+
+        if pf == PF_ADDRESS_CLAIMED and len(data) >= 8:
+            name = bytes(data[:8])
+            if entry.name is None:
+                entry.name = name
+                self._emit("claimed", sa, name)
+            elif entry.name != name:
+                self._emit("conflict", sa, (entry.name, name))
+                entry.name = name
+        elif (pf == PF_TP_CM and len(data) >= 8
+                and data[0] in (TP_CM_BAM, TP_CM_ABORT)):
+            pgn = data[5] | (data[6] << 8) | (data[7] << 16)
+            if data[0] == TP_CM_BAM and pgn == PGN_ECU_ID:
+                size = data[1] | (data[2] << 8)
+                self._bam[sa] = (size, data[3], bytearray(7 * data[3]))
+            else:
+                # The TP.DT that follow do not belong to an ECU-ID transfer
+                self._bam.pop(sa, None)
+        elif pf == PF_TP_DT and sa in self._bam and len(data) >= 1:
+            self._reassemble(entry, data)
+
+    def _reassemble(self, entry, data):
+        """Store one TP.DT packet of an ECU-ID BAM from *entry*."""
+        size, packets, buf = self._bam[entry.sa]
+        seq = data[0]
+        if not 1 <= seq <= packets:
+            return
+        buf[(seq - 1) * 7:seq * 7] = bytes(data[1:8]).ljust(7, b"\xff")
+        if seq < packets:
+            return
+        del self._bam[entry.sa]
+        ecu_id = bytes(buf[:size])
+        if ecu_id != entry.ecu_id:
+            entry.ecu_id = ecu_id
+            self._emit("ecu_id", entry.sa, ecu_id)
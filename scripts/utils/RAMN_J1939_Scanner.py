@@ -28,14 +28,37 @@ rts_probe    TP.CM_RTS (PF=0xEC, DA=ECU-SA)
 uds          UDS Tester Present (PF=0xDA, DA=ECU-SA)
              → Positive response 0x7E from ECU-SA
 
+passive      No probe: traffic already on the bus is sniffed for
+             ``sniff_time`` seconds before the active techniques
+             → Any extended CAN frame from ECU-SA
+
+The passive phase builds an index of observed SAs (see ``j1939_sniff``).
+Known SAs are then skipped by techniques 3-5, or probed last when
+``skip_known=False``.
+
+Techniques 3-5 probe every DA in turn.  With ``pipelined=True`` they
+share a window of outstanding probes, so a scan is paced by the bus-load
+budget instead of by waiting ``timeout_per_da`` after every probe.
+
+All five techniques but passive are ``ProbeTechnique`` objects of a
+registry; more can be added with ``register_technique()``.  The broadcast
+techniques (1-2) run first, then ``j1939_scan()`` can run the per-DA ones
+in any order, interleaved or cheapest first, and stop probing an SA once
+it has been confirmed by a given number of methods.
+
 Return value
 ------------
 ``j1939_scan()`` returns a **list** of ``(sa, detections)`` tuples,
 sorted by SA in ascending order.  Each *detections* entry is itself a
 list of dicts ``{'method': str, 'packet': packet}``, one per technique
 that detected the SA.
+
+With ``compact=True`` detections are stored as fixed-size ``Detection``
+records deduplicated per (SA, technique), and the same list-of-dicts
+format is materialized lazily when the result is accessed.
 """
 
+import collections.abc
 import logging
 import struct
 import time
@@ -104,6 +127,15 @@ def j1939_get_sa(can_id):
     return can_id & 0xFF
 
 
+def j1939_get_pgn(can_id):
+    """Return the PGN of a 29-bit J1939 CAN ID (PS is a DA below PF 240)."""
+    pf = j1939_get_pf(can_id)
+    dp = (can_id >> 24) & 0x3
+    if pf < 240:
+        return (dp << 16) | (pf << 8)
+    return (dp << 16) | (pf << 8) | j1939_get_ps(can_id)
+
+
 def _encode_pgn_le(pgn):
     """Encode a PGN as 3 little-endian bytes."""
     return bytes([pgn & 0xFF, (pgn >> 8) & 0xFF, (pgn >> 16) & 0xFF])
@@ -185,17 +217,375 @@ def _inter_probe_delay(bitrate, busload, tx_dlc, rx_dlc, sniff_time):
 # Per-technique probe / collect helpers
 # ---------------------------------------------------------------------------
 
+def _build_rts_payload():
+    """Build the minimal TP.CM_RTS payload used by the rts_probe technique."""
+    rts_payload = bytearray(8)
+    rts_payload[0] = TP_CM_RTS
+    rts_payload[1] = 0x09  # total message size low byte
+    rts_payload[2] = 0x00  # total message size high byte
+    rts_payload[3] = 0x02  # number of packets
+    rts_payload[4] = 0xFF  # max packets per CTS (0xFF = unlimited)
+    pgn_bytes = _encode_pgn_le(PGN_ECU_ID)
+    rts_payload[5] = pgn_bytes[0]
+    rts_payload[6] = pgn_bytes[1]
+    rts_payload[7] = pgn_bytes[2]
+    return bytes(rts_payload)
+
+
 def _record(found, sa, method, pkt):
     """Append a detection to the *found* accumulator (never overwrite)."""
+    if isinstance(found, DetectionTable):
+        found.add(sa, method, pkt)
+        return
     found.setdefault(sa, []).append({"method": method, "packet": pkt})
 
 
-def _scan_addr_claim(sock, found, timeout, send_fn, recv_fn):
-    """Technique 1 – broadcast Request for PGN 60928 (Address Claimed)."""
-    probe_id = j1939_make_id(6, PF_REQUEST, DA_BROADCAST, SCANNER_SA)
-    payload = _encode_pgn_le(PGN_ADDRESS_CLAIMED)
+# ---------------------------------------------------------------------------
+# Compact detection records
+# ---------------------------------------------------------------------------
+
+METHODS = ["addr_claim", "ecu_id", "passive"]  # extended by register_technique
+METHOD_IDS = {method: i for i, method in enumerate(METHODS)}
+
+
+class Detection:
+    """Fixed-size record of the first frame that detected an SA.
+
+    Exposes ``arbitration_id``, ``data`` and ``is_extended_id`` so that
+    it can stand in for the packet in the list-of-dicts view.  *hits*
+    counts the frames that detected the SA with the same technique, and
+    *last_seen* is the timestamp of the latest one.
+    """
+
+    __slots__ = ("sa", "method_id", "can_id", "data", "timestamp",
+                 "last_seen", "hits")
+
+    is_extended_id = True
+
+    def __init__(self, sa, method_id, can_id, data, timestamp):
+        self.sa = sa
+        self.method_id = method_id
+        self.can_id = can_id
+        self.data = data
+        self.timestamp = timestamp
+        self.last_seen = timestamp
+        self.hits = 1
+
+    @property
+    def method(self):
+        return METHODS[self.method_id]
+
+    @property
+    def arbitration_id(self):
+        return self.can_id
+
+    def __repr__(self):
+        return ("Detection(sa=0x%02X, method=%s, id=0x%08X, data=%s, hits=%d)"
+                % (self.sa, self.method, self.can_id, self.data.hex(),
+                   self.hits))
+
+
+def _pkt_timestamp(pkt):
+    """Return the reception time of *pkt* (python-can, scapy or now)."""
+    for attr in ("timestamp", "time"):
+        value = getattr(pkt, attr, None)
+        if isinstance(value, (int, float)):
+            return float(value)
+    return time.time()
+
+
+class DetectionTable(collections.abc.Mapping):
+    """Bounded detection accumulator: one ``Detection`` per (SA, method).
+
+    As a mapping, ``table[sa]`` is built on access in the list-of-dicts
+    format of ``j1939_scan``, with an extra ``hits`` key.  Packets are
+    not retained, so memory does not grow with the number of frames.
+    """
+
+    def __init__(self):
+        self._records = {}  # sa -> {method_id: Detection}
+
+    def add(self, sa, method, pkt):
+        method_id = METHOD_IDS[method]
+        timestamp = _pkt_timestamp(pkt)
+        records = self._records.setdefault(sa, {})
+        record = records.get(method_id)
+        if record is None:
+            records[method_id] = Detection(sa, method_id, _pkt_id(pkt),
+                                           bytes(_pkt_data(pkt)[:8]),
+                                           timestamp)
+        else:
+            record.hits += 1
+            record.last_seen = timestamp
+
+    def records(self):
+        """Iterate over all ``Detection`` records, by SA."""
+        for sa in sorted(self._records):
+            yield from self._records[sa].values()
+
+    def __getitem__(self, sa):
+        return [{"method": record.method, "packet": record,
+                 "hits": record.hits}
+                for record in self._records[sa].values()]
+
+    def __iter__(self):
+        return iter(self._records)
+
+    def __len__(self):
+        return len(self._records)
+
+
+class DetectionView(collections.abc.Sequence):
+    """Sorted ``(sa, detections)`` sequence over a ``DetectionTable``.
+
+    Behaves like the list returned by ``j1939_scan``, but each
+    *detections* list is only materialized when accessed.
+    """
+
+    def __init__(self, table):
+        self.table = table
+        self._sas = sorted(table)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [(sa, self.table[sa]) for sa in self._sas[i]]
+        sa = self._sas[i]
+        return sa, self.table[sa]
+
+    def __len__(self):
+        return len(self._sas)
+
+
+def _pf_filter(pf):
+    """Receive filter passing extended frames with the given PF."""
+    return {"can_id": (pf & 0xFF) << 16, "can_mask": 0xFF << 16,
+            "extended": True}
+
+
+def _sa_filter(sa):
+    """Receive filter passing extended frames sent by *sa*."""
+    return {"can_id": sa & 0xFF, "can_mask": 0xFF, "extended": True}
+
+
+def _pf_sa_filter(pf, sa):
+    """Receive filter passing extended frames with PF *pf* sent by *sa*."""
+    return {"can_id": ((pf & 0xFF) << 16) | (sa & 0xFF),
+            "can_mask": (0xFF << 16) | 0xFF, "extended": True}
+
+
+# Passes every extended frame (standard frames are dropped)
+EXTENDED_FILTER = {"can_id": 0, "can_mask": 0, "extended": True}
+
+
+def _set_filters(filter_fn, sock, filters):
+    """Install receive *filters* (None = receive everything), if supported."""
+    if filter_fn is not None:
+        filter_fn(sock, filters)
+
+
+def _get_filters(sock):
+    """Receive filters currently installed on *sock* (python-can Bus)."""
+    return getattr(sock, "filters", None)
+
+
+# ---------------------------------------------------------------------------
+# Probe techniques (1-5) and their registry
+# ---------------------------------------------------------------------------
+
+class ProbeTechnique:
+    """A technique probing one DA at a time, as used by techniques 3-5.
+
+    A *broadcast* technique (1-2) instead sends a single probe to
+    ``DA_BROADCAST`` and credits every matching answer to its sender.
+    *build(da)* returns the ``(can_id, payload)`` of the probe frame.
+    *match(pkt, da)* returns the SA that *pkt* (an extended frame)
+    detects when answering the probe to *da*, or *None*.
+    *filters(da)* returns the receive filters passing those answers.
+    *tx_dlc* and *rx_dlc* are the DLCs of the probe and of its expected
+    answer, for ``_inter_probe_delay``.  *cost* orders techniques when
+    cheapest first is requested, and defaults to the number of bits the
+    probe and its answer occupy on the wire.  A *catch_all* technique
+    matches any frame, so more specific techniques get precedence when
+    answers are matched in pipelined mode.
+    """
+
+    def __init__(self, method, build, match, filters, tx_dlc, rx_dlc,
+                 cost=None, catch_all=False, broadcast=False):
+        self.method = method
+        self.build = build
+        self.match = match
+        self.filters = filters
+        self.tx_dlc = tx_dlc
+        self.rx_dlc = rx_dlc
+        if cost is None:
+            cost = 2 * CAN_FRAME_OVERHEAD_BITS + 8 * (tx_dlc + rx_dlc)
+        self.cost = cost
+        self.catch_all = catch_all
+        self.broadcast = broadcast
+
+    def __repr__(self):
+        return "ProbeTechnique(%r, cost=%r)" % (self.method, self.cost)
+
+
+# Registered techniques, by method name
+TECHNIQUES = {}
+
+
+def register_technique(technique):
+    """Make *technique* available to ``j1939_scan(techniques=...)``."""
+    TECHNIQUES[technique.method] = technique
+    if technique.method not in METHOD_IDS:
+        METHOD_IDS[technique.method] = len(METHODS)
+        METHODS.append(technique.method)
+    return technique
+
+
+def _resolve_techniques(techniques, broadcast=False):
+    """Return the ``ProbeTechnique`` objects for names or objects.
+
+    Raises ``ValueError`` if one of them is not a *broadcast* technique,
+    or not a per-DA one when *broadcast* is false.
+    """
+    resolved = [TECHNIQUES[t] if isinstance(t, str) else t
+                for t in techniques]
+    for technique in resolved:
+        if technique.broadcast != broadcast:
+            raise ValueError("%r is not a %s technique" % (
+                technique.method, "broadcast" if broadcast else "per-DA"))
+    return resolved
+
+
+# Technique 1 – broadcast Request for PGN 60928 (Address Claimed).
+# Answered by an Address Claimed from every ECU.
+
+def _addr_claim_build(da):
+    return (j1939_make_id(6, PF_REQUEST, da, SCANNER_SA),
+            _encode_pgn_le(PGN_ADDRESS_CLAIMED))
+
+
+def _addr_claim_match(pkt, da):
+    cid = _pkt_id(pkt)
+    if j1939_get_pf(cid) == PF_ADDRESS_CLAIMED:
+        return j1939_get_sa(cid)
+    return None
+
+
+# Technique 2 – broadcast Request for PGN 64965 (ECU Identification).
+# Answered by the TP.CM BAM announcing the multi-packet ECU-ID.
+
+def _ecu_id_build(da):
+    return (j1939_make_id(6, PF_REQUEST, da, SCANNER_SA),
+            _encode_pgn_le(PGN_ECU_ID))
+
+
+def _ecu_id_match(pkt, da):
+    cid = _pkt_id(pkt)
+    data = _pkt_data(pkt)
+    if j1939_get_pf(cid) == PF_TP_CM and len(data) >= 8:
+        if data[0] == TP_CM_BAM:
+            return j1939_get_sa(cid)
+    return None
+
+
+# Technique 3 – unicast Request for PGN 60928 to each DA.
+# Any extended frame whose SA equals the probed DA counts as an answer.
+
+def _unicast_build(da):
+    return (j1939_make_id(6, PF_REQUEST, da, SCANNER_SA),
+            _encode_pgn_le(PGN_ADDRESS_CLAIMED))
+
+
+def _unicast_match(pkt, da):
+    sa = j1939_get_sa(_pkt_id(pkt))
+    return sa if sa == da else None
+
+
+# Technique 4 – TP.CM_RTS addressed to each DA.
+# Answered by TP.CM_CTS or TP_Conn_Abort, credited to the SA sending it.
+
+def _rts_build(da):
+    return j1939_make_id(7, PF_TP_CM, da, SCANNER_SA), _build_rts_payload()
+
+
+def _rts_match(pkt, da):
+    cid = _pkt_id(pkt)
+    data = _pkt_data(pkt)
+    if j1939_get_pf(cid) == PF_TP_CM and len(data) >= 1:
+        if data[0] in (TP_CM_CTS, TP_CM_ABORT):
+            return j1939_get_sa(cid)
+    return None
+
+
+# Technique 5 – UDS Tester Present (PF=0xDA) to each DA.
+# Answered by a (possibly padded) positive response from the DA.
+
+def _uds_build(da):
+    return (j1939_make_id(6, PF_DIAG, da, SCANNER_SA),
+            UDS_TESTER_PRESENT_REQUEST)
+
+
+def _uds_match(pkt, da):
+    sa = j1939_get_sa(_pkt_id(pkt))
+    data = _pkt_data(pkt)
+    if sa == da and data[:3] == UDS_TESTER_PRESENT_RESPONSE:
+        return sa
+    return None
+
+
+register_technique(ProbeTechnique(
+    "addr_claim", _addr_claim_build, _addr_claim_match,
+    lambda da: [_pf_filter(PF_ADDRESS_CLAIMED)], tx_dlc=3, rx_dlc=8,
+    broadcast=True))
+register_technique(ProbeTechnique(
+    "ecu_id", _ecu_id_build, _ecu_id_match,
+    lambda da: [_pf_filter(PF_TP_CM)], tx_dlc=3, rx_dlc=8,
+    broadcast=True))
+register_technique(ProbeTechnique(
+    "unicast", _unicast_build, _unicast_match,
+    lambda da: [_sa_filter(da)], tx_dlc=3, rx_dlc=8, catch_all=True))
+register_technique(ProbeTechnique(
+    "rts_probe", _rts_build, _rts_match,
+    lambda da: [_pf_filter(PF_TP_CM)], tx_dlc=8, rx_dlc=8))
+register_technique(ProbeTechnique(
+    "uds", _uds_build, _uds_match,
+    lambda da: [_pf_sa_filter(PF_DIAG, da)], tx_dlc=3, rx_dlc=3))
+
+DEFAULT_BROADCAST = ("addr_claim", "ecu_id")
+DEFAULT_TECHNIQUES = ("unicast", "rts_probe", "uds")
+
+SCHEDULE_SEQUENTIAL = "sequential"    # every DA for a technique, then the next
+SCHEDULE_INTERLEAVED = "interleaved"  # every technique for a DA, then the next
+
+
+def _probe_order(techniques, da_range, schedule, cheapest_first=False,
+                 skip=()):
+    """List the ``(technique, da)`` probes to send, in order."""
+    if cheapest_first:
+        techniques = sorted(techniques, key=lambda t: t.cost)
+    if schedule == SCHEDULE_INTERLEAVED:
+        probes = [(t, da) for da in da_range for t in techniques]
+    elif schedule == SCHEDULE_SEQUENTIAL:
+        probes = [(t, da) for t in techniques for da in da_range]
+    else:
+        raise ValueError("Unknown schedule: %r" % (schedule,))
+    return [(t, da) for t, da in probes if (t.method, da) not in skip]
+
+
+def _is_confirmed(found, sa, confirmations):
+    """True if *sa* was detected by at least *confirmations* methods."""
+    if not confirmations:
+        return False
+    return len({d["method"] for d in found.get(sa, ())}) >= confirmations
+
+
+def _scan_broadcast(sock, found, technique, timeout, send_fn, recv_fn,
+                    filter_fn=None):
+    """Send the probe of a *broadcast* technique and listen *timeout* s."""
+    _set_filters(filter_fn, sock, technique.filters(DA_BROADCAST))
+    probe_id, payload = technique.build(DA_BROADCAST)
     send_fn(sock, probe_id, payload)
-    log.debug("addr_claim: broadcast request sent (CAN-ID=0x%08X)", probe_id)
+    log.debug("%s: broadcast request sent (CAN-ID=0x%08X)",
+              technique.method, probe_id)
 
     deadline = time.monotonic() + timeout
     while time.monotonic() < deadline:
@@ -204,139 +594,316 @@ def _scan_addr_claim(sock, found, timeout, send_fn, recv_fn):
             continue
         if not _is_extended(pkt):
             continue
-        cid = _pkt_id(pkt)
-        if j1939_get_pf(cid) == PF_ADDRESS_CLAIMED:
-            sa = j1939_get_sa(cid)
-            log.debug("addr_claim: response from SA=0x%02X", sa)
-            _record(found, sa, "addr_claim", pkt)
+        sa = technique.match(pkt, DA_BROADCAST)
+        if sa is None:
+            continue
+        log.debug("%s: response from SA=0x%02X", technique.method, sa)
+        _record(found, sa, technique.method, pkt)
 
 
-def _scan_ecu_id(sock, found, timeout, send_fn, recv_fn):
-    """Technique 2 – broadcast Request for PGN 64965 (ECU Identification)."""
-    probe_id = j1939_make_id(6, PF_REQUEST, DA_BROADCAST, SCANNER_SA)
-    payload = _encode_pgn_le(PGN_ECU_ID)
-    send_fn(sock, probe_id, payload)
-    log.debug("ecu_id: broadcast request sent (CAN-ID=0x%08X)", probe_id)
+def _scan_sequential(sock, found, probes, timeout_per_da, send_fn, recv_fn,
+                     bitrate=DEFAULT_BITRATE, busload=DEFAULT_BUSLOAD,
+                     timing=None, filter_fn=None, confirmations=None):
+    """Send each ``(technique, da)`` probe and wait for its answers.
 
-    deadline = time.monotonic() + timeout
-    while time.monotonic() < deadline:
-        pkt = recv_fn(sock, max(0, deadline - time.monotonic()))
-        if pkt is None:
-            continue
-        if not _is_extended(pkt):
+    Every probe waits *timeout_per_da* (or ``timing.timeout``) and all
+    the answers received meanwhile are recorded.  Probes to SAs already
+    confirmed by *confirmations* methods are skipped.
+    """
+    filters = None  # receive filters currently installed
+    for technique, da in probes:
+        if _is_confirmed(found, da, confirmations):
             continue
-        cid = _pkt_id(pkt)
-        data = _pkt_data(pkt)
-        if j1939_get_pf(cid) == PF_TP_CM and len(data) >= 8:
-            if data[0] == TP_CM_BAM:
-                sa = j1939_get_sa(cid)
-                log.debug("ecu_id: BAM from SA=0x%02X", sa)
-                _record(found, sa, "ecu_id", pkt)
-
-
-def _scan_unicast(sock, found, timeout_per_da, send_fn, recv_fn,
-                  da_range=range(0x00, 0xFE), bitrate=DEFAULT_BITRATE,
-                  busload=DEFAULT_BUSLOAD):
-    """Technique 3 – unicast Request for PGN 60928 to each DA."""
-    for da in da_range:
-        probe_id = j1939_make_id(6, PF_REQUEST, da, SCANNER_SA)
-        payload = _encode_pgn_le(PGN_ADDRESS_CLAIMED)
+        wanted = technique.filters(da)
+        if wanted != filters:
+            _set_filters(filter_fn, sock, wanted)
+            filters = wanted
+        probe_id, payload = technique.build(da)
         send_fn(sock, probe_id, payload)
-        log.debug("unicast: probing DA=0x%02X", da)
+        log.debug("%s: probing DA=0x%02X", technique.method, da)
 
-        deadline = time.monotonic() + timeout_per_da
+        wait = timing.timeout if timing else timeout_per_da
+        sent = time.monotonic()
+        deadline = sent + wait
         while time.monotonic() < deadline:
             pkt = recv_fn(sock, max(0, deadline - time.monotonic()))
             if pkt is None:
                 continue
             if not _is_extended(pkt):
                 continue
-            cid = _pkt_id(pkt)
-            sa = j1939_get_sa(cid)
-            if sa == da:
-                log.debug("unicast: response from SA=0x%02X", sa)
-                _record(found, sa, "unicast", pkt)
-
-        # Pace the probe rate: request=3 bytes (DLC 3), response=8 bytes (DLC 8)
-        extra = _inter_probe_delay(bitrate, busload, 3, 8, timeout_per_da)
+            sa = technique.match(pkt, da)
+            if sa is None:
+                continue
+            log.debug("%s: response from SA=0x%02X", technique.method, sa)
+            _record(found, sa, technique.method, pkt)
+            if timing and sa == da:
+                timing.observe(time.monotonic() - sent)
+
+        # Pace the probe rate according to the probe and answer DLCs
+        extra = _inter_probe_delay(bitrate, busload, technique.tx_dlc,
+                                   technique.rx_dlc, wait)
         if extra > 0.0:
             time.sleep(extra)
 
 
-def _scan_rts_probe(sock, found, timeout_per_da, send_fn, recv_fn,
-                    da_range=range(0x00, 0xFE), bitrate=DEFAULT_BITRATE,
-                    busload=DEFAULT_BUSLOAD):
-    """Technique 4 – TP.CM_RTS addressed to each DA."""
-    for da in da_range:
-        probe_id = j1939_make_id(7, PF_TP_CM, da, SCANNER_SA)
-        # Build a minimal RTS payload
-        rts_payload = bytearray(8)
-        rts_payload[0] = TP_CM_RTS
-        rts_payload[1] = 0x09  # total message size low byte
-        rts_payload[2] = 0x00  # total message size high byte
-        rts_payload[3] = 0x02  # number of packets
-        rts_payload[4] = 0xFF  # max packets per CTS (0xFF = unlimited)
-        pgn_bytes = _encode_pgn_le(PGN_ECU_ID)
-        rts_payload[5] = pgn_bytes[0]
-        rts_payload[6] = pgn_bytes[1]
-        rts_payload[7] = pgn_bytes[2]
-
-        send_fn(sock, probe_id, bytes(rts_payload))
-        log.debug("rts_probe: probing DA=0x%02X", da)
-
-        deadline = time.monotonic() + timeout_per_da
-        while time.monotonic() < deadline:
-            pkt = recv_fn(sock, max(0, deadline - time.monotonic()))
-            if pkt is None:
-                continue
-            if not _is_extended(pkt):
-                continue
-            cid = _pkt_id(pkt)
-            data = _pkt_data(pkt)
-            if j1939_get_pf(cid) == PF_TP_CM and len(data) >= 1:
-                ctrl = data[0]
-                if ctrl in (TP_CM_CTS, TP_CM_ABORT):
-                    sa = j1939_get_sa(cid)
-                    log.debug(
-                        "rts_probe: response (ctrl=0x%02X) from SA=0x%02X",
-                        ctrl, sa,
-                    )
-                    _record(found, sa, "rts_probe", pkt)
-
-        # Pace the probe rate: request=8 bytes (DLC 8), response=8 bytes (DLC 8)
-        extra = _inter_probe_delay(bitrate, busload, 8, 8, timeout_per_da)
-        if extra > 0.0:
-            time.sleep(extra)
+# ---------------------------------------------------------------------------
+# Passive discovery
+# ---------------------------------------------------------------------------
 
+def j1939_sniff(sock, duration, recv_fn=None, index=None, filter_fn=None):
+    """Listen to the bus for *duration* seconds without sending anything.
 
-def _scan_uds(sock, found, timeout_per_da, send_fn, recv_fn,
-              da_range=range(0x00, 0xFE), bitrate=DEFAULT_BITRATE,
-              busload=DEFAULT_BUSLOAD):
-    """Technique 5 – UDS Tester Present (PF=0xDA) to each DA."""
-    for da in da_range:
-        probe_id = j1939_make_id(6, PF_DIAG, da, SCANNER_SA)
-        send_fn(sock, probe_id, UDS_TESTER_PRESENT_REQUEST)
-        log.debug("uds: probing DA=0x%02X", da)
+    Returns an index ``{sa: entry}`` of the SAs that transmitted extended
+    frames.  Each *entry* is a dict with:
 
-        deadline = time.monotonic() + timeout_per_da
-        while time.monotonic() < deadline:
-            pkt = recv_fn(sock, max(0, deadline - time.monotonic()))
-            if pkt is None:
-                continue
-            if not _is_extended(pkt):
+    ``pgns``        ``{pgn: frame count}``
+    ``frames``      total number of frames
+    ``first_seen``  / ``last_seen`` ``time.monotonic()`` timestamps
+    ``name``        8-byte NAME of the last Address Claimed, or *None*
+    ``packet``      first frame received from the SA
+
+    Pass an existing *index* to keep accumulating into it.  *filter_fn*
+    installs receive filters, see ``j1939_scan``.
+    """
+    if recv_fn is None:
+        recv_fn = _default_recv
+    if index is None:
+        index = {}
+    previous = _get_filters(sock)
+    _set_filters(filter_fn, sock, [EXTENDED_FILTER])
+    try:
+        _sniff(sock, duration, recv_fn, index)
+    finally:
+        _set_filters(filter_fn, sock, previous)
+    return index
+
+
+def _sniff(sock, duration, recv_fn, index):
+    """Fill *index* with the extended frames received for *duration* s."""
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        pkt = recv_fn(sock, max(0, deadline - time.monotonic()))
+        if pkt is None:
+            continue
+        if not _is_extended(pkt):
+            continue
+        now = time.monotonic()
+        cid = _pkt_id(pkt)
+        sa = j1939_get_sa(cid)
+        entry = index.get(sa)
+        if entry is None:
+            log.debug("passive: new SA=0x%02X", sa)
+            entry = index[sa] = {"pgns": {}, "frames": 0, "first_seen": now,
+                                 "last_seen": now, "name": None,
+                                 "packet": pkt}
+        pgn = j1939_get_pgn(cid)
+        entry["pgns"][pgn] = entry["pgns"].get(pgn, 0) + 1
+        entry["frames"] += 1
+        entry["last_seen"] = now
+        if j1939_get_pf(cid) == PF_ADDRESS_CLAIMED:
+            entry["name"] = _pkt_data(pkt)[:8]
+
+
+def j1939_pgn_rates(entry):
+    """Return ``{pgn: frames per second}`` for an index *entry*.
+
+    Rates are estimated over the interval between the first and last
+    frame of the SA, so they are 0.0 until two frames have been seen.
+    """
+    span = entry["last_seen"] - entry["first_seen"]
+    if span <= 0:
+        return {pgn: 0.0 for pgn in entry["pgns"]}
+    # n frames delimit n-1 periods
+    return {pgn: (count - 1) / span if count > 1 else 0.0
+            for pgn, count in entry["pgns"].items()}
+
+
+def _order_by_index(da_range, index, skip_known):
+    """Drop (or move to the end) the DAs already present in *index*."""
+    unknown = [da for da in da_range if da not in index]
+    if skip_known:
+        return unknown
+    return unknown + [da for da in da_range if da in index]
+
+
+# ---------------------------------------------------------------------------
+# Adaptive per-DA timeout
+# ---------------------------------------------------------------------------
+
+ADAPTIVE_PERCENTILE = 0.95  # fraction of observed latencies covered
+ADAPTIVE_FACTOR = 2.0       # multiplier applied to that percentile
+ADAPTIVE_MARGIN = 0.002     # seconds added on top
+ADAPTIVE_MIN_SAMPLES = 3    # latencies required before shrinking
+
+
+class AdaptiveTimeout:
+    """Per-DA timeout derived from the response latencies seen so far.
+
+    Until *min_samples* latencies have been observed, :attr:`timeout` is
+    *ceiling* (the configured ``timeout_per_da``).  Afterwards it is the
+    *percentile* of the observed latencies times *factor* plus *margin*,
+    never more than *ceiling*.
+    """
+
+    def __init__(self, ceiling, percentile=ADAPTIVE_PERCENTILE,
+                 factor=ADAPTIVE_FACTOR, margin=ADAPTIVE_MARGIN,
+                 min_samples=ADAPTIVE_MIN_SAMPLES):
+        self.ceiling = ceiling
+        self.percentile = percentile
+        self.factor = factor
+        self.margin = margin
+        self.min_samples = min_samples
+        self.latencies = []
+
+    def observe(self, latency):
+        """Record the latency (seconds) of a matched response."""
+        self.latencies.append(latency)
+
+    @property
+    def calibrated(self):
+        return len(self.latencies) >= self.min_samples
+
+    @property
+    def timeout(self):
+        if not self.calibrated:
+            return self.ceiling
+        ordered = sorted(self.latencies)
+        idx = min(len(ordered) - 1, int(self.percentile * len(ordered)))
+        return min(self.ceiling, ordered[idx] * self.factor + self.margin)
+
+    @property
+    def retry_timeout(self):
+        """Timeout of the retry pass: twice :attr:`timeout`, capped."""
+        return min(self.ceiling, 2 * self.timeout)
+
+
+# ---------------------------------------------------------------------------
+# Pipelined engine for the per-DA techniques
+# ---------------------------------------------------------------------------
+
+DEFAULT_WINDOW = 16  # max number of outstanding per-DA probes
+
+
+def _by_specificity(techniques):
+    """Techniques with specific matchers first, catch-all ones last."""
+    return sorted(techniques, key=lambda t: t.catch_all)
+
+
+def _classify_response(pkt, techniques=None, outstanding=None):
+    """Return ``(sa, method)`` for the per-DA technique *pkt* answers.
+
+    With the default techniques, TP.CM CTS/Abort frames answer rts_probe
+    and Tester Present positive responses answer uds.  Any other
+    extended frame answers unicast.  When *outstanding* is given, only
+    the ``(method, sa)`` keys it contains are considered.  Returns *None*
+    for standard (11-bit) frames and unmatched responses.
+    """
+    if pkt is None or not _is_extended(pkt):
+        return None
+    if techniques is None:
+        techniques = _resolve_techniques(DEFAULT_TECHNIQUES)
+    sa = j1939_get_sa(_pkt_id(pkt))
+    for technique in _by_specificity(techniques):
+        if (outstanding is not None
+                and (technique.method, sa) not in outstanding):
+            continue
+        if technique.match(pkt, sa) == sa:
+            return sa, technique.method
+    return None
+
+
+def _scan_pipelined(sock, found, probes, timeout_per_da, send_fn, recv_fn,
+                    bitrate=DEFAULT_BITRATE, busload=DEFAULT_BUSLOAD,
+                    window=DEFAULT_WINDOW, timing=None, filter_fn=None,
+                    confirmations=None):
+    """Send the ``(technique, da)`` probes with up to *window* outstanding.
+
+    Each probe waits *timeout_per_da* for its response, but the next probe
+    is sent as soon as the bus-load budget of the previous one
+    (``_inter_probe_delay``) has elapsed, so the scan is paced by *busload*
+    rather than by the per-probe timeout.  Responses are matched back to
+    the outstanding probe whose DA equals their SA, specific techniques
+    before catch-all ones; a probe is retired on its first response.
+
+    When *timing* is given, each probe waits ``timing.timeout`` instead
+    and matched latencies are fed back to it.  Probes to SAs confirmed by
+    *confirmations* methods are dropped when their turn comes.  The
+    receive filters only pass the SAs of the outstanding probes.
+    """
+    probes = list(reversed(probes))  # pop() from the end
+    techniques = _by_specificity({t for t, _ in probes})
+    outstanding = {}  # (method, da) -> deadline
+    sent = {}  # (method, da) -> send time
+    next_send = time.monotonic()
+    filtered = None  # SAs passed by the installed receive filters
+
+    while probes or outstanding:
+        now = time.monotonic()
+        for key in [k for k, d in outstanding.items() if d <= now]:
+            log.debug("%s: no response from DA=0x%02X", key[0], key[1])
+            del outstanding[key]
+
+        if probes and len(outstanding) < window and now >= next_send:
+            technique, da = probes.pop()
+            if _is_confirmed(found, da, confirmations):
                 continue
-            cid = _pkt_id(pkt)
-            sa = j1939_get_sa(cid)
-            if sa == da:
-                data = _pkt_data(pkt)
-                if len(data) >= 3 and data[:3] == UDS_TESTER_PRESENT_RESPONSE:
-                    log.debug("uds: response from SA=0x%02X", sa)
-                    _record(found, sa, "uds", pkt)
-
-        # Pace the probe rate: request=3 bytes (DLC 3), response=3 bytes (DLC 3)
-        extra = _inter_probe_delay(bitrate, busload, 3, 3, timeout_per_da)
-        if extra > 0.0:
-            time.sleep(extra)
+            if filter_fn is not None:
+                sas = {d for _, d in outstanding} | {da}
+                if sas != filtered:
+                    _set_filters(filter_fn, sock,
+                                 [_sa_filter(sa) for sa in sorted(sas)])
+                    filtered = sas
+            probe_id, payload = technique.build(da)
+            send_fn(sock, probe_id, payload)
+            log.debug("%s: probing DA=0x%02X (%d outstanding)",
+                      technique.method, da, len(outstanding))
+            key = (technique.method, da)
+            sent[key] = now
+            outstanding[key] = now + (timing.timeout if timing
+                                      else timeout_per_da)
+            next_send = now + _inter_probe_delay(bitrate, busload,
+                                                 technique.tx_dlc,
+                                                 technique.rx_dlc, 0.0)
+
+        if not outstanding:
+            if probes:
+                time.sleep(max(0.0, next_send - time.monotonic()))
+            continue
+
+        wake = min(outstanding.values())
+        if probes and len(outstanding) < window:
+            wake = min(wake, next_send)
+        pkt = recv_fn(sock, max(0, wake - time.monotonic()))
+        response = _classify_response(pkt, techniques, outstanding)
+        if response is None:
+            continue
+        sa, method = response
+        del outstanding[(method, sa)]
+        if timing:
+            timing.observe(time.monotonic() - sent[(method, sa)])
+        log.debug("%s: response from SA=0x%02X", method, sa)
+        _record(found, sa, method, pkt)
+
+
+def _scan_per_da(sock, found, timeout_per_da, send_fn, recv_fn, da_range,
+                 bitrate, busload, pipelined, window, timing=None, skip=(),
+                 filter_fn=None, techniques=DEFAULT_TECHNIQUES, schedule=None,
+                 cheapest_first=False, confirmations=None):
+    """Run the per-DA techniques, skipping ``(method, da)`` in *skip*."""
+    if schedule is None:
+        schedule = SCHEDULE_INTERLEAVED if pipelined else SCHEDULE_SEQUENTIAL
+    probes = _probe_order(_resolve_techniques(techniques), da_range,
+                          schedule, cheapest_first, skip)
+    if pipelined:
+        _scan_pipelined(sock, found, probes, timeout_per_da, send_fn,
+                        recv_fn, bitrate=bitrate, busload=busload,
+                        window=window, timing=timing, filter_fn=filter_fn,
+                        confirmations=confirmations)
+    else:
+        _scan_sequential(sock, found, probes, timeout_per_da, send_fn,
+                         recv_fn, bitrate=bitrate, busload=busload,
+                         timing=timing, filter_fn=filter_fn,
+                         confirmations=confirmations)
 
 
 # ---------------------------------------------------------------------------
@@ -345,7 +912,12 @@ def _scan_uds(sock, found, timeout_per_da, send_fn, recv_fn,
 
 def j1939_scan(sock, *, force=False, timeout=0.5, timeout_per_da=0.05,
                send_fn=None, recv_fn=None, bitrate=None,
-               busload=DEFAULT_BUSLOAD, range_step=None):
+               busload=DEFAULT_BUSLOAD, range_step=None, pipelined=False,
+               window=DEFAULT_WINDOW, sniff_time=0.0, index=None,
+               skip_known=True, adaptive_timeout=False, retry=True,
+               filter_fn=None, compact=False, techniques=DEFAULT_TECHNIQUES,
+               schedule=None, cheapest_first=False, confirmations=None,
+               broadcast=DEFAULT_BROADCAST):
     """Scan the CAN bus for J1939 Controller Applications.
 
     Parameters
@@ -355,7 +927,7 @@ def j1939_scan(sock, *, force=False, timeout=0.5, timeout_per_da=0.05,
     force : bool
         Reserved for future use (e.g. skip confirmation prompt).
     timeout : float
-        Seconds to listen after broadcast probes (addr_claim, ecu_id).
+        Seconds to listen after each broadcast probe (addr_claim, ecu_id).
     timeout_per_da : float
         Seconds to listen after each unicast/RTS/UDS probe.
     send_fn : callable, optional
@@ -373,6 +945,63 @@ def j1939_scan(sock, *, force=False, timeout=0.5, timeout_per_da=0.05,
         (default 0.05 = 5 %).
     range_step : tuple of (int, int), optional
         Limit unicast/RTS/UDS probes to this (start, end) SA range.
+    pipelined : bool
+        Run the unicast/RTS/UDS probes through the pipelined engine,
+        which keeps up to *window* probes outstanding across DAs and
+        techniques.  The scan is then limited by *busload* instead of
+        *timeout_per_da*, and each technique records at most one
+        detection per SA.
+    window : int
+        Maximum number of outstanding probes in pipelined mode.
+    sniff_time : float
+        Seconds to passively listen before sending the first probe
+        (default 0.0 = no passive phase).
+    index : dict, optional
+        Passive index as returned by ``j1939_sniff``.  When given, it is
+        updated in place by the passive phase, so callers can read the
+        observed PGNs, rates and NAMEs after the scan.  Every SA in the
+        index is reported with a ``passive`` detection.
+    skip_known : bool
+        Skip unicast/RTS/UDS probes to SAs found in the index (default).
+        When *False*, they are probed after the unknown DAs.
+    adaptive_timeout : bool
+        Shrink the per-DA wait to a high percentile of the observed
+        response latencies (see ``AdaptiveTimeout``), *timeout_per_da*
+        becoming an upper bound.  SAs already found by the passive and
+        broadcast phases are probed first to calibrate the timeout.
+    retry : bool
+        With *adaptive_timeout*, probe again every (technique, DA) pair
+        that stayed silent, with twice the adaptive timeout.
+    filter_fn : callable, optional
+        ``filter_fn(sock, filters)`` – install receive filters, in the
+        python-can ``set_filters`` format, so that frames a technique
+        cannot use are dropped before reaching Python (in the kernel on
+        SocketCAN).  Defaults to ``sock.set_filters()`` when *sock* has
+        one.  The filters installed before the scan (``sock.filters``)
+        are restored afterwards.
+    compact : bool or DetectionTable
+        Store detections in a ``DetectionTable`` (one fixed-size record
+        per SA and technique, with a hit count) instead of keeping every
+        packet.  Pass an existing table to accumulate repeated scans.
+    techniques : iterable of str or ProbeTechnique
+        Per-DA techniques to run, in this order (default: unicast,
+        rts_probe, uds).  Names refer to ``register_technique()``.
+    schedule : str, optional
+        ``"sequential"`` probes every DA with a technique before the next
+        technique; ``"interleaved"`` probes a DA with every technique
+        before the next DA.  Defaults to interleaved when *pipelined*,
+        sequential otherwise.
+    cheapest_first : bool
+        Run the techniques by increasing ``cost`` instead of in the
+        given order.
+    confirmations : int, optional
+        Stop probing an SA once it has been detected by this many
+        methods (broadcast and passive detections included).  With 1,
+        each SA only costs the probes needed to find it once.
+    broadcast : iterable of str or ProbeTechnique
+        Broadcast techniques to run, in this order, before the per-DA
+        ones (default: addr_claim, ecu_id).  Names refer to
+        ``register_technique()``.
 
     Returns
     -------
@@ -380,39 +1009,94 @@ def j1939_scan(sock, *, force=False, timeout=0.5, timeout_per_da=0.05,
         A list of ``(sa, detections)`` tuples **sorted by SA** in
         ascending order.  Each *detections* entry is a list of dicts
         ``{'method': str, 'packet': pkt}``, one per technique that
-        detected the SA.
+        detected the SA.  With *compact*, a ``DetectionView`` with the
+        same layout is returned.
     """
     if send_fn is None:
         send_fn = _default_send
     if recv_fn is None:
         recv_fn = _default_recv
+    if filter_fn is None:
+        filter_fn = _default_set_filters
 
     # Resolve bitrate: explicit > socket attribute > default
     if bitrate is None:
         bitrate = _get_bitrate(sock) or DEFAULT_BITRATE
 
     # Accumulator: {sa: [{'method': ..., 'packet': ...}, ...]}
-    found = {}
+    if isinstance(compact, DetectionTable):
+        found = compact
+    elif compact:
+        found = DetectionTable()
+    else:
+        found = {}
 
     da_range = range(0x00, 0xFE)
     if range_step:
         da_range = range(range_step[0], range_step[1] + 1)
 
-    _scan_addr_claim(sock, found, timeout, send_fn, recv_fn)
-    _scan_ecu_id(sock, found, timeout, send_fn, recv_fn)
-    _scan_unicast(sock, found, timeout_per_da, send_fn, recv_fn,
-                  da_range=da_range, bitrate=bitrate, busload=busload)
-    _scan_rts_probe(sock, found, timeout_per_da, send_fn, recv_fn,
-                    da_range=da_range, bitrate=bitrate, busload=busload)
-    _scan_uds(sock, found, timeout_per_da, send_fn, recv_fn,
-              da_range=da_range, bitrate=bitrate, busload=busload)
-
+    previous_filters = _get_filters(sock)
+    try:
+        _scan_all(sock, found, timeout, timeout_per_da, send_fn, recv_fn,
+                  filter_fn, bitrate, busload, da_range, pipelined, window,
+                  sniff_time, index, skip_known, adaptive_timeout, retry,
+                  broadcast, dict(techniques=techniques, schedule=schedule,
+                       cheapest_first=cheapest_first,
+                       confirmations=confirmations))
+    finally:
+        _set_filters(filter_fn, sock, previous_filters)
+
+    if isinstance(found, DetectionTable):
+        return DetectionView(found)
     # Return as a sorted list of (sa, detections) tuples
     return sorted(found.items(), key=lambda item: item[0])
 
 
+def _scan_all(sock, found, timeout, timeout_per_da, send_fn, recv_fn,
+              filter_fn, bitrate, busload, da_range, pipelined, window,
+              sniff_time, index, skip_known, adaptive_timeout, retry,
+              broadcast, scheduling):
+    """Run the passive phase and all techniques (see ``j1939_scan``).
+
+    *broadcast* lists the broadcast techniques, run first.  *scheduling*
+    holds the keyword arguments selecting and ordering the
+    per-DA techniques, passed through to ``_scan_per_da``.
+    """
+    if sniff_time > 0:
+        index = j1939_sniff(sock, sniff_time, recv_fn, index, filter_fn)
+    if index:
+        for sa, entry in index.items():
+            _record(found, sa, "passive", entry["packet"])
+        da_range = _order_by_index(da_range, index, skip_known)
+
+    for technique in _resolve_techniques(broadcast, broadcast=True):
+        _scan_broadcast(sock, found, technique, timeout, send_fn, recv_fn,
+                        filter_fn)
+
+    timing = None
+    if adaptive_timeout:
+        timing = AdaptiveTimeout(timeout_per_da)
+        # Known SAs first: their responses calibrate the timeout
+        da_range = ([da for da in da_range if da in found]
+                    + [da for da in da_range if da not in found])
+
+    _scan_per_da(sock, found, timeout_per_da, send_fn, recv_fn, da_range,
+                 bitrate, busload, pipelined, window, timing,
+                 filter_fn=filter_fn, **scheduling)
+
+    if timing and retry and timing.calibrated:
+        log.debug("adaptive timeout %.4f s, retrying silent DAs with %.4f s",
+                  timing.timeout, timing.retry_timeout)
+        answered = {(d["method"], sa)
+                    for sa, detections in found.items()
+                    for d in detections}
+        _scan_per_da(sock, found, timing.retry_timeout, send_fn, recv_fn,
+                     da_range, bitrate, busload, pipelined, window,
+                     skip=answered, filter_fn=filter_fn, **scheduling)
+
+
 # ---------------------------------------------------------------------------
-# Default send/recv using python-can
+# Default send/recv/filters using python-can
 # ---------------------------------------------------------------------------
 
 def _default_send(sock, can_id, data):
@@ -432,3 +1116,9 @@ def _default_send(sock, can_id, data):
 def _default_recv(sock, timeout):
     """Receive a CAN frame via a python-can Bus, or None on timeout."""
     return sock.recv(timeout=timeout)
+
+
+def _default_set_filters(sock, filters):
+    """Install receive filters on a python-can Bus (no-op otherwise)."""
+    if hasattr(sock, "set_filters"):
+        sock.set_filters(filters)
@@ -9,6 +9,23 @@
 
 from utils.RAMN_ISOTP_Handler   import *
 
+#Checks the answer r to a KWP command. Returns the parameters of a positive answer (as a list), None otherwise.
+def parseKWPAnswer(commandID,r,recvAnswer=True):
+    if recvAnswer:
+        if r == None:
+            log("Timeout",LOG_ERROR)
+            return 'b'
+        elif len(r) == 0:
+            log("Received Empty Data",LOG_ERROR)
+            return b''
+        elif r[0] == commandID + 0x40:
+            return list(r[1:])
+        elif r[0] == 0x7F: #negative command
+            log("Received Negative RESPONSE: " + hex(r[2]) + " for COMMAND " + hex(r[1]) + " ",LOG_ERROR)
+        else: log("Unexpected KWP RESPONSE: " + hex(r[0]),LOG_ERROR)
+        return None
+    return []
+
 #Class that handles KWP communication for one ECU
 class RAMN_KWP_Handler:
     def __init__(self,ramn,tp,txid,rxid,name="Unknown"):
@@ -21,54 +38,48 @@ class RAMN_KWP_Handler:
     
     #Send a Raw payload over KWP
     def sendRawData(self,toSend,timeout=RAMN_Utils.DEFAULT_TIMEOUT,recvAnswer=True):
-        if isinstance(toSend,list):
-            toSend = bytes(toSend)
-        if len(toSend) > 0xFFF:
-            log("Requested a payload which size is too big: {}".format(len(toSend)),LOG_ERROR)
+        toSend = checkRawPayload(toSend,0xFFF)
+        if toSend == None:
             return None
                 
-        log("SEND: " + ''.join("{:02x}".format(i) for i in toSend),LOG_DEBUG)
+        if isLogEnabled(LOG_DEBUG):
+            log("SEND: " + bytes(toSend).hex(),LOG_DEBUG)
 
+        self.tp.clearResponses(self.rxid) #Answers to previous requests are not for this one
         self.tp.sendFrame(toSend, self.txid, self.rxid)    
+        if self.tp.schedulerThread != None:
+            #Engine runs in its own thread, only wait for this ECU's answer
+            if recvAnswer:
+                payload = self.tp.waitResponse(self.rxid,timeout)
+                if payload != None:
+                    if isLogEnabled(LOG_DEBUG):
+                        log("RECV: " + bytes(payload).hex(),LOG_DEBUG)
+                return payload
+            if self.tp.waitTxOver(self.txid,timeout):
+                return []
+            return None
         tstart = time.time()
         while timeout == 0 or (time.time() - tstart < timeout):
 
-            payload = self.tp.update(recvAnswer,timeout)
+            payload = self.tp.update(recvAnswer,timeout,rx=self.rxid)
             if recvAnswer:
                 if payload != None:
-                    log("RECV: " + ''.join("{:02x}".format(i) for i in payload),LOG_DEBUG)
+                    if isLogEnabled(LOG_DEBUG):
+                        log("RECV: " + bytes(payload).hex(),LOG_DEBUG)
                     return payload
             else:
-                if self.tp.isTxOver():
+                if self.tp.isTxOver(self.txid):
                     return []
             return None
      
     #Send a KWP command with specified parameters
     def sendCommand(self, commandID, params=[],timeout=RAMN_Utils.DEFAULT_TIMEOUT, recvAnswer=True):
         r = self.sendRawData([commandID] + params,timeout, recvAnswer)
-        if recvAnswer:
-            if r == None:
-                log("Timeout",LOG_ERROR)
-                return 'b'
-            elif len(r) == 0:
-                log("Received Empty Data",LOG_ERROR)
-                return b''
-            elif r[0] == commandID + 0x40:
-                return list(r[1:])
-            elif r[0] == 0x7F: #negative command
-                log("Received Negative RESPONSE: " + hex(r[2]) + " for COMMAND " + hex(r[1]) + " ",LOG_ERROR)
-            else: log("Unexpected KWP RESPONSE: " + hex(r[0]),LOG_ERROR)
-            return None
-        return []
+        return parseKWPAnswer(commandID,r,recvAnswer)
         
     #Sends a tester present command and wait for answer
     def testerPresent(self):
-        if self.sendCommand(0x3E,[0x01]) != None : 
-            log("ECU responsed to Tester Present (TX:0x{:03x} RX:0x{:03x})".format(self.txid,self.rxid),LOG_DATA)
-            return True
-        else: 
-            log("ECU did not respond to Tester Present",LOG_ERROR)
-            return False
+        return checkTesterPresent(self.sendCommand(0x3E,[0x01]),self.txid,self.rxid)
     
     #Goes to specified diagnostic session
     def diagnosticSessionControl(self, session):
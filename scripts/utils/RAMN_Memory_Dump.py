@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+# Copyright (c) 2026 TOYOTA MOTOR CORPORATION. ALL RIGHTS RESERVED.
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+#This module dumps memory areas of an ECU to binary files in a way that survives communication failures.
+#Blocks are written to a memory-mapped output file as soon as they are received, and recorded with their CRC32 in a journal file.
+#Running the same dump again only requests the blocks that are missing (or which content no longer matches its CRC).
+
+from utils.RAMN_Utils import *
+import mmap
+import zlib
+
+#Extension of the journal file, stored next to the binary file. It is removed once the dump is complete.
+JOURNAL_EXTENSION = ".journal"
+
+#Class that dumps one memory area [start,end) of an ECU to filename, block by block
+class RAMN_Memory_Dump:
+    def __init__(self,filename,start,end,blockSize=0xFF0):
+        self.filename = filename
+        self.journalFilename = filename + JOURNAL_EXTENSION
+        self.start = start
+        self.end = end
+        self.blockSize = blockSize
+        self.done = set() #Offsets of the blocks already received
+        self.header = "RAMN_DUMP {:08x} {:08x} {:x}".format(start,end,blockSize)
+        self.open()
+
+    #Opens the output file, and reloads the journal of a previous run of the same dump (if any)
+    def open(self):
+        resume = os.path.exists(self.journalFilename) and os.path.exists(self.filename) and os.path.getsize(self.filename) == self.end - self.start
+        entries = []
+        if resume:
+            with open(self.journalFilename,"r") as f:
+                lines = f.read().splitlines()
+            if len(lines) > 0 and lines[0] == self.header:
+                entries = lines[1:]
+            else:
+                resume = False
+        self.file = open(self.filename,"r+b" if resume else "w+b")
+        if not resume:
+            self.file.truncate(self.end - self.start)
+        self.map = mmap.mmap(self.file.fileno(),self.end - self.start)
+
+        for entry in entries:
+            fields = entry.split()
+            if len(fields) != 3:
+                continue #Last line may have been interrupted
+            offset, size, crc = int(fields[0],16), int(fields[1],16), int(fields[2],16)
+            if offset % self.blockSize == 0 and size == self.getBlockSize(offset) and zlib.crc32(self.map[offset:offset+size]) == crc:
+                self.done.add(offset)
+        if resume:
+            log("Resuming dump of {}: {} of {} blocks already received".format(self.filename,len(self.done),self.getBlockCount()),LOG_DATA)
+
+        #Journal is rewritten with valid entries only
+        self.journal = open(self.journalFilename,"w")
+        self.journal.write(self.header + "\n")
+        for offset in sorted(self.done):
+            self.writeJournalEntry(offset)
+        self.journal.flush()
+
+    def getBlockCount(self):
+        return (self.end - self.start + self.blockSize - 1)//self.blockSize
+
+    def getBlockSize(self,offset):
+        return min(self.blockSize,self.end - self.start - offset)
+
+    def writeJournalEntry(self,offset):
+        size = self.getBlockSize(offset)
+        self.journal.write("{:x} {:x} {:08x}\n".format(offset,size,zlib.crc32(self.map[offset:offset+size])))
+
+    #Returns the list of areas (start, end) that still need to be read, as absolute addresses
+    def getMissingAreas(self):
+        areas = []
+        for offset in range(0,self.end - self.start,self.blockSize):
+            if offset in self.done:
+                continue
+            address = self.start + offset
+            if len(areas) > 0 and areas[-1][1] == address:
+                areas[-1][1] = address + self.getBlockSize(offset)
+            else:
+                areas.append([address,address + self.getBlockSize(offset)])
+        return [tuple(area) for area in areas]
+
+    #Stores a block received from the ECU
+    def writeBlock(self,address,data):
+        offset = address - self.start
+        if offset % self.blockSize != 0 or len(data) != self.getBlockSize(offset):
+            log("Unexpected block at address {:08x} (size {:x})".format(address,len(data)),LOG_ERROR)
+            return False
+        self.map[offset:offset+len(data)] = bytes(data)
+        self.writeJournalEntry(offset)
+        self.journal.flush()
+        self.done.add(offset)
+        return True
+
+    def isComplete(self):
+        return len(self.done) == self.getBlockCount()
+
+    #Reads missing blocks from the ECU (a RAMN_UDS_Handler). Missing areas are requested again up to "attempts" times.
+    #Returns True if the dump is complete.
+    def run(self,ecu,attempts=1,pipelined=False):
+        for attempt in range(attempts):
+            for start, end in self.getMissingAreas():
+                for address, data in ecu.readMemoryBlocks(start,end,self.blockSize,pipelined):
+                    if not self.writeBlock(address,data):
+                        break
+            if self.isComplete():
+                break
+            log("Dump of {} incomplete: {} of {} blocks received".format(self.filename,len(self.done),self.getBlockCount()),LOG_WARNING)
+        return self.isComplete()
+
+    #Closes the output file. The journal is removed if the dump is complete, so that the next dump starts from scratch.
+    def close(self):
+        self.map.flush()
+        self.map.close()
+        self.file.close()
+        self.journal.close()
+        if self.isComplete():
+            os.remove(self.journalFilename)
@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+# Copyright (c) 2026 TOYOTA MOTOR CORPORATION. ALL RIGHTS RESERVED.
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+#This module decodes the slcan stream sent by RAMN's ECU A into compact frame records.
+#Incoming bytes are accumulated in a single reusable bytearray, and frames are decoded in place (no per-line slicing or str conversion).
+
+import binascii
+from collections import namedtuple
+
+#Compact, immutable record describing one received CAN/CAN-FD frame.
+#timestamp is the ECU A timestamp (ms, modulo 60000) when slcan timestamps are enabled ('Z1'), None otherwise.
+#rxtime is the host time (time.perf_counter()) at which the frame was read from the serial port, if known.
+SLCANFrame = namedtuple("SLCANFrame", ["canid", "payload", "is_extended", "is_fd", "bitrate_switch", "is_remote", "error_state_indicator", "timestamp", "rxtime"], defaults=(None,))
+
+#Payload size of a CAN-FD frame for each DLC code
+CANFD_DLC_TO_SIZE = (0, 1, 2, 3, 4, 5, 6, 7, 8, 12, 16, 20, 24, 32, 48, 64)
+
+#Size above which the consumed part of the buffer is discarded even if a partial line is pending
+COMPACT_THRESHOLD = 0x10000
+
+_CHAR_0 = ord('0')
+_CHAR_1 = ord('1')
+_CHAR_t = ord('t')
+_CHAR_T = ord('T')
+_CHAR_r = ord('r')
+_CHAR_R = ord('R')
+_CHAR_i = ord('i')
+
+#Decodes the slcan frame located at buf[start:end] (end excludes the trailing \r). Returns None if the line is not a valid frame.
+def decodeFrame(buf,start,end,timestamps=False,rxtime=None):
+    is_fd = False
+    bitrate_switch = False
+    if end - start < 1:
+        return None
+    c = buf[start]
+    if c == _CHAR_0 or c == _CHAR_1:
+        #CAN-FD prefix
+        is_fd = True
+        bitrate_switch = (c == _CHAR_1)
+        start += 1
+        if start >= end:
+            return None
+        c = buf[start]
+
+    if c == _CHAR_t or c == _CHAR_r:
+        is_extended = False
+        idLength = 3
+    elif c == _CHAR_T or c == _CHAR_R:
+        is_extended = True
+        idLength = 8
+    else:
+        return None
+    is_remote = (c == _CHAR_r or c == _CHAR_R)
+
+    error_state_indicator = False
+    if buf[end-1] == _CHAR_i:
+        error_state_indicator = True
+        end -= 1
+
+    index = start + 1
+    if end - index < idLength + 1:
+        return None
+    try:
+        canid = int(buf[index:index+idLength],16)
+        dlc = int(buf[index+idLength:index+idLength+1],16)
+        index += idLength + 1
+        if is_fd:
+            size = CANFD_DLC_TO_SIZE[dlc]
+        else:
+            size = min(dlc,8)
+        if is_remote:
+            payload = b''
+        else:
+            if end - index < 2*size:
+                return None
+            with memoryview(buf) as mv:
+                payload = binascii.unhexlify(mv[index:index+2*size])
+            index += 2*size
+        timestamp = None
+        if timestamps and end - index >= 4:
+            timestamp = int(buf[index:index+4],16)
+    except ValueError:
+        return None
+    return SLCANFrame(canid, payload, is_extended, is_fd, bitrate_switch, is_remote, error_state_indicator, timestamp, rxtime)
+
+#Class that splits the raw serial stream into lines and frames.
+class SLCANParser():
+
+    def __init__(self,timestamps=False):
+        self.buffer = bytearray()
+        self.start = 0
+        self.timestamps = timestamps
+
+    #Add raw bytes received from the serial port
+    def feed(self,data):
+        self.buffer += data
+
+    #Discard everything that was received but not processed yet
+    def reset(self):
+        del self.buffer[:]
+        self.start = 0
+
+    #Number of bytes received but not processed yet
+    def pending(self):
+        return len(self.buffer) - self.start
+
+    #Returns (start,end) of the next complete line in the buffer, or None
+    def _nextLineBounds(self):
+        end = self.buffer.find(b'\r',self.start)
+        if end < 0:
+            #Drop already processed data so that the buffer does not grow forever
+            if self.start == len(self.buffer):
+                del self.buffer[:]
+                self.start = 0
+            elif self.start > COMPACT_THRESHOLD:
+                del self.buffer[:self.start]
+                self.start = 0
+            return None
+        start = self.start
+        self.start = end + 1
+        return start, end
+
+    #Returns the next complete line (without trailing \r) as bytes, or None if no complete line was received
+    def nextLine(self):
+        bounds = self._nextLineBounds()
+        if bounds is None:
+            return None
+        return bytes(self.buffer[bounds[0]:bounds[1]])
+
+    #Returns the next complete line as an SLCANFrame if it is a CAN frame, as bytes otherwise, or None if no complete line was received
+    def nextItem(self,rxtime=None):
+        bounds = self._nextLineBounds()
+        if bounds is None:
+            return None
+        start, end = bounds
+        frame = decodeFrame(self.buffer,start,end,self.timestamps,rxtime)
+        if frame is not None:
+            return frame
+        return bytes(self.buffer[start:end])
+
+    #Returns (line,frame) for the next complete line, or None if no complete line was received.
+    #line is the raw line including its trailing \r (so that it can be forwarded as is), frame is its SLCANFrame (None if the line is not a CAN frame).
+    def nextRawItem(self,rxtime=None):
+        bounds = self._nextLineBounds()
+        if bounds is None:
+            return None
+        start, end = bounds
+        return bytes(self.buffer[start:end+1]), decodeFrame(self.buffer,start,end,self.timestamps,rxtime)
+
+    #Returns all CAN frames currently available in the buffer (other lines are discarded)
+    def frames(self,rxtime=None):
+        result = []
+        while True:
+            bounds = self._nextLineBounds()
+            if bounds is None:
+                return result
+            frame = decodeFrame(self.buffer,bounds[0],bounds[1],self.timestamps,rxtime)
+            if frame is not None:
+                result.append(frame)
@@ -17,6 +17,13 @@ ECUreadableRange = {
     #"OPTION_BYTES":        (0x40022040,0x40022140),
 }
 
+#Flash layout used for reprogramming (dual bank mode). The alternative bank is readable at the address of the current bank + FLASH_BANK_OFFSET
+FLASH_START = 0x08000000
+FLASH_BANK_OFFSET = 0x40000
+FLASH_PAGE_SIZE = 0x800
+FLASH_EEPROM_START = 0x0803E000 #Last 4 pages of each bank are used for EEPROM emulation
+FLASH_BANK_END = 0x08040000
+
 #Simplified address change for memory areas
 def checkAddressValidity(start,end):
     startOK = False
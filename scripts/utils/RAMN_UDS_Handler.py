@@ -7,6 +7,148 @@
 #Collection of functions to make it more intuitive to access UDS features of RAMNs ECU over python.
 
 from utils.RAMN_ISOTP_Handler   import *
+import zlib
+
+#Checks the answer r to a UDS command. Returns the parameters of a positive answer (as a list), None otherwise.
+def parseUDSAnswer(commandID,r,recvAnswer=True):
+    if recvAnswer:
+        if r == None:
+            log("Timeout",LOG_ERROR)
+            return 'b'
+        elif len(r) == 0:
+            log("Received Empty Data",LOG_ERROR)
+            return b''
+        elif r[0] == commandID + 0x40:
+            return list(r[1:])
+        elif r[0] == 0x7F: #negative command
+            log("Received Negative RESPONSE: " + hex(r[2]) + " (" + UDSAnalyzer.ERROR_DESCRIPTIONS[r[2]] + ") for COMMAND " + hex(r[1]) + " (" + 
+UDSAnalyzer.SID_DESCRIPTIONS[r[1]] + ")",LOG_ERROR)
+        else: log("Unexpected UDS RESPONSE: " + hex(r[0]),LOG_ERROR)
+        return None
+    return []
+
+#Returns True if r, returned by parseUDSAnswer, is a positive answer (timeouts and empty answers are not None)
+def isPositiveAnswer(r):
+    return isinstance(r,list)
+
+#Helpers shared by RAMN_UDS_Handler and RAMN_Async_UDS_Handler (RAMN_Async_Diag.py)
+
+#Computes the key answering a Security Access seed (dummy, non-secure XOR with static "key"). seed is the answer to the seed request, modified in place.
+def computeSecurityKey(seed):
+    seed[0] += 1
+    seed[1] ^= 0x12
+    seed[2] ^= 0x34
+    seed[3] ^= 0x56
+    seed[4] ^= 0x78
+    return seed
+
+#Parameters of a ReadMemoryByAddress request
+def readMemoryParams(address,size):
+    return [0x24] + int32ToList(address) + int16ToList(size)
+
+#Parameters of a RequestDownload/RequestUpload request
+def transferRequestParams(address,size):
+    return [0x00, 0x44] + int32ToList(address) + int32ToList(size)
+
+#Checks the sequence counter of a Transfer Data answer (r is the parsed answer, not None)
+def checkTransferSequence(seq,r):
+    if seq != r[0]:
+        log("Transfer Data Sequence Error, expected {:02x}, got {:02x}".format(seq,r[0]),LOG_ERROR)
+        return False
+    return True
+
+#Returns the CRC32 from the answer to the CRC routine (0x0206), None if missing
+def parseCRC32(crc):
+    if crc != None:
+        if len(crc) >= 4:
+            return listToInt32(crc[:4])
+    return None
+
+def decodeVIN(v):
+    if v != None:
+        return (''.join(chr(i) for i in v)).strip('\x00')
+    return None
+
+#Returns the (address, size) of the ReadMemoryByAddress requests reading an area
+def memoryBlocks(start,end,blockSize):
+    return [(address,min(blockSize,end-address)) for address in range(start,end,blockSize)]
+
+#Checks the answer r to a ReadMemoryByAddress request of size bytes
+def checkMemoryBlock(r,size):
+    if r == None or len(r) != size:
+        log("Read Memory By Address Failed, Could not read Data", LOG_ERROR)
+        return False
+    return True
+
+def checkDumpSize(dump,size):
+    if len(dump) != size:
+        log("Read Memory By Address Failed, Did not receive enough bytes", LOG_ERROR)
+
+#Returns a firmware dump received with Request Upload, or None if its size is unexpected
+def checkUploadSize(dump,size):
+    if len(dump) != size:
+        log("Got Unexpected Size from dump. Expected {:x}, got {:x}".format(size,len(dump)),LOG_ERROR)
+        return None
+    return dump
+
+#Converts an RGB image to the pixel data expected by the screen of ECU A (RGB565, little endian), in one pass over the image.
+#Each byte of the output is computed per band with a lookup table, then both bytes are interleaved by Pillow's raw "LA" packer.
+def imageToRGB565(image):
+    from PIL import Image, ImageChops
+    r, g, b = image.convert("RGB").split()
+    low = ImageChops.add(g.point([(i << 3) & 0xE0 for i in range(256)]), b.point([i >> 3 for i in range(256)]))
+    high = ImageChops.add(r.point([i & 0xF8 for i in range(256)]), g.point([i >> 5 for i in range(256)]))
+    return Image.merge("LA", (low, high)).tobytes()
+
+#Drops the bits of an RGB image that are lost in RGB565, so that frames which look identical on screen compare equal
+def quantizeRGB565(image):
+    return image.convert("RGB").point([i & 0xF8 for i in range(256)] + [i & 0xFC for i in range(256)] + [i & 0xF8 for i in range(256)])
+
+#Screen coordinates of the top-left pixel of images drawn with service 0x41
+DISPLAY_STARTX = 2
+DISPLAY_STARTY = 2
+#Maximum number of rows drawn by one 0x41 request (keeps each request within one ISO-TP transfer)
+DISPLAY_MAX_ROWS = 8
+
+#Returns the 0x41 payloads drawing the rectangle (x, y, width, height) of an image, given the RGB565 pixel data of the whole image
+def displayStrips(pixels,imageWidth,x,y,width,height):
+    rowSize = imageWidth*2
+    for Y in range(y, y+height, DISPLAY_MAX_ROWS):
+        YLEN = min(y+height-Y, DISPLAY_MAX_ROWS)
+        if width == imageWidth:
+            data = pixels[Y*rowSize:(Y+YLEN)*rowSize]
+        else:
+            data = b''.join(pixels[row*rowSize+x*2:row*rowSize+(x+width)*2] for row in range(Y, Y+YLEN))
+        yield bytes([0x41, DISPLAY_STARTX+x, DISPLAY_STARTY+Y, width, YLEN]) + data
+
+#Returns the rectangles (x, y, width, height) of frame that differ from previous, at most one per band of DISPLAY_MAX_ROWS rows
+def dirtyRectangles(frame,previous):
+    from PIL import ImageChops
+    diff = ImageChops.difference(frame,previous)
+    bbox = diff.getbbox()
+    rects = []
+    if bbox == None:
+        return rects
+    for Y in range(bbox[1], bbox[3], DISPLAY_MAX_ROWS):
+        band = diff.crop((bbox[0], Y, bbox[2], min(Y+DISPLAY_MAX_ROWS, bbox[3]))).getbbox()
+        if band != None:
+            rects.append((bbox[0]+band[0], Y+band[1], band[2]-band[0], band[3]-band[1]))
+    return rects
+
+#Returns the frames of an animated image (e.g. GIF), or of all images of a directory (in name order), as RGB images
+def loadImageFrames(path):
+    from PIL import Image, ImageSequence
+    if os.path.isdir(path):
+        for name in sorted(os.listdir(path)):
+            try:
+                image = Image.open(os.path.join(path,name))
+            except OSError:
+                continue #Not an image
+            yield image.convert("RGB")
+    else:
+        with Image.open(path) as image:
+            for frame in ImageSequence.Iterator(image):
+                yield frame.convert("RGB")
 
 #Class that handles UDS communication for one ECU
 class RAMN_UDS_Handler:
@@ -19,59 +161,78 @@ class RAMN_UDS_Handler:
         self.ramn = ramn
         self.name = name
         self.isUSB = isUSB
+        self.swapRoutine = 0xFF01 #Routine used by swapBanks, 0x0211 if the last differential reprogram did not transfer anything
     
     #Send a Raw payload over UDS
     def sendRawData(self,toSend,timeout=RAMN_Utils.DEFAULT_TIMEOUT,recvAnswer=True):
-        if isinstance(toSend,list):
-            toSend = bytes(toSend)
-        if len(toSend) > 0xFFF:
-            log("Requested a payload which size is too big: {}".format(len(toSend)),LOG_ERROR)
+        toSend = checkRawPayload(toSend,0xFFF)
+        if toSend == None:
             return None
                 
-        log("SEND:" + self.uds.display(list(toSend)),LOG_DEBUG)
+        if isLogEnabled(LOG_DEBUG):
+            log("SEND:" + self.uds.display(toSend),LOG_DEBUG)
         if self.isUSB:
             payload = self.ramn.sendUDSCommandUSB(toSend,timeout=timeout,recvAnswer=recvAnswer)
             if recvAnswer:
                 if payload != None:
-                    log("RECV:" + self.uds.display(list(payload)),LOG_DEBUG)
+                    if isLogEnabled(LOG_DEBUG):
+                        log("RECV:" + self.uds.display(payload),LOG_DEBUG)
                     return payload
         else:
+            self.tp.clearResponses(self.rxid) #Answers to previous requests are not for this one
             self.tp.sendFrame(toSend, self.txid, self.rxid)    
+            if self.tp.schedulerThread != None:
+                #Engine runs in its own thread, only wait for this ECU's answer
+                if recvAnswer:
+                    payload = self.tp.waitResponse(self.rxid,timeout)
+                    if payload != None:
+                        if isLogEnabled(LOG_DEBUG):
+                            log("RECV:" + self.uds.display(payload),LOG_DEBUG)
+                    return payload
+                if self.tp.waitTxOver(self.txid,timeout):
+                    return []
+                return None
             tstart = time.time()
             while timeout == 0 or (time.time() - tstart < timeout):
-                payload = self.tp.update(recvAnswer,timeout)
+                payload = self.tp.update(recvAnswer,timeout,rx=self.rxid)
                 if recvAnswer:
                     if payload != None:
-                        log("RECV:" + self.uds.display(list(payload)),LOG_DEBUG)
+                        if isLogEnabled(LOG_DEBUG):
+                            log("RECV:" + self.uds.display(payload),LOG_DEBUG)
                         return payload
                 else:
-                    if self.tp.isTxOver():
+                    if self.tp.isTxOver(self.txid):
                         return []
             return None
      
-    #Send a UDS command with specified parameters
+    #Returns the next answer to a payload sent with recvAnswer=False (or None after timeout), so that the next request can be prepared meanwhile
+    def receiveRawData(self,timeout=RAMN_Utils.DEFAULT_TIMEOUT):
+        payload = None
+        if self.isUSB:
+            payload = parseUDSAnswerUSB(self.ramn.readline(timeout=timeout))
+        elif self.tp.schedulerThread != None:
+            payload = self.tp.waitResponse(self.rxid,timeout)
+        else:
+            tstart = time.time()
+            while timeout == 0 or (time.time() - tstart < timeout):
+                payload = self.tp.update(True,timeout,rx=self.rxid)
+                if payload != None:
+                    break
+        if payload != None:
+            if isLogEnabled(LOG_DEBUG):
+                log("RECV:" + self.uds.display(payload),LOG_DEBUG)
+        return payload
+     
+    #Send a UDS command with specified parameters (list, bytes or any buffer such as a memoryview)
     def sendCommand(self, commandID, params=[],timeout=RAMN_Utils.DEFAULT_TIMEOUT, recvAnswer=True):
-        r = self.sendRawData([commandID] + params,timeout, recvAnswer)
-        if recvAnswer:
-            if r == None:
-                log("Timeout",LOG_ERROR)
-                return 'b'
-            elif len(r) == 0:
-                log("Received Empty Data",LOG_ERROR)
-                return b''
-            elif r[0] == commandID + 0x40:
-                return list(r[1:])
-            elif r[0] == 0x7F: #negative command
-                log("Received Negative RESPONSE: " + hex(r[2]) + " (" + UDSAnalyzer.ERROR_STRINGS[r[2]] + ") for COMMAND " + hex(r[1]) + " (" + 
-UDSAnalyzer.UDS_SID_STRINGS[r[1]] + ")",LOG_ERROR)
-            else: log("Unexpected UDS RESPONSE: " + hex(r[0]),LOG_ERROR)
-            return None
-        return []
+        toSend = bytearray([commandID])
+        toSend.extend(params)
+        r = self.sendRawData(toSend,timeout, recvAnswer)
+        return parseUDSAnswer(commandID,r,recvAnswer)
         
     #Sends a tester present command and wait for answer
     def testerPresent(self):
-        if self.sendCommand(0x3E,[0x00]) != None : log("ECU responsed to Tester Present (TX:0x{:03x} RX:0x{:03x})".format(self.txid,self.rxid),LOG_DATA)
-        else: log("ECU did not respond to Tester Present",LOG_ERROR)
+        checkTesterPresent(self.sendCommand(0x3E,[0x00]),self.txid,self.rxid)
     
     #Goes to specified diagnostic session
     def diagnosticSessionControl(self, session):
@@ -82,21 +243,19 @@ UDSAnalyzer.UDS_SID_STRINGS[r[1]] + ")",LOG_ERROR)
         l = self.sendCommand(0x27,[level])
         if l == None:
             return None
-        l[0] += 1
-        l[1] ^= 0x12
-        l[2] ^= 0x34
-        l[3] ^= 0x56
-        l[4] ^= 0x78
-        return self.sendCommand(0x27,l)     
+        return self.sendCommand(0x27,computeSecurityKey(l))     
     
     def readMemoryByAddress(self,address,size):
         if checkAddressValidity(address,address+size):
-            return self.sendCommand(0x23, [0x24] + int32ToList(address) + int16ToList(size))
+            return self.sendCommand(0x23, readMemoryParams(address,size))
         else:
             log("Tried to read a memory outside of readable range", LOG_ERROR)
         
     def routineControl(self,action,subroutine, parameters=[], recvAnswer=True):
-        return self.sendCommand(0x31, [action] + int16ToList(subroutine) + parameters,recvAnswer=recvAnswer)[3:]
+        r = self.sendCommand(0x31, [action] + int16ToList(subroutine) + parameters,recvAnswer=recvAnswer)
+        if r == None:
+            return None
+        return r[3:]
     
     #Request that ECU stops sending periodic messages
     def disablePeriodicSending(self):
@@ -107,16 +266,18 @@ UDSAnalyzer.UDS_SID_STRINGS[r[1]] + ")",LOG_ERROR)
         return self.routineControl(0x02,0x0200) 
     
     def requestDownload(self,address,size):
-        return self.sendCommand(0x34, [0x00, 0x44] + int32ToList(address) + int32ToList(size))
+        return self.sendCommand(0x34, transferRequestParams(address,size))
         
     def requestUpload(self,address,size):
-        blockSize =  self.sendCommand(0x35, [0x00, 0x44] + int32ToList(address) + int32ToList(size))   
+        blockSize =  self.sendCommand(0x35, transferRequestParams(address,size))   
         if blockSize != None:
             return listToInt16(blockSize[1:])
         return None
     
-    def transferDataSingle(self, seq, data=[]):
-        return self.sendCommand(0x36, [seq] + data)
+    def transferDataSingle(self, seq, data=b''):
+        toSend = bytearray([0x36,seq])
+        toSend.extend(data)
+        return parseUDSAnswer(0x36,self.sendRawData(toSend))
         
     def requestTransferExit(self):
         return self.sendCommand(0x37)
@@ -125,28 +286,58 @@ UDSAnalyzer.UDS_SID_STRINGS[r[1]] + ")",LOG_ERROR)
         return self.sendCommand(0x11, [0x01],recvAnswer=False)
     
     #perform as many "Transfer Data" commands as necessary, for UPLOAD (ECU->Python Script)
-    def transferDataUpload(self,expectedSize):
+    #If the maximum block length returned by requestUpload is provided, requests are pipelined
+    def transferDataUpload(self,expectedSize,blockSize=None):
         seq = 1
         result = []
-        while len(result) != expectedSize:
-            r = self.transferDataSingle(seq)
-            if r == None:
+        answers = None
+        if blockSize != None and blockSize > 2 and not self.isUSB:
+            #Each answer holds the SID, the sequence counter, and up to blockSize-2 bytes of data
+            count = (expectedSize + blockSize - 3)//(blockSize - 2)
+            answers = self.pipelineCommands(0x36,([(i+1)&0xFF] for i in range(count)))
+        while len(result) < expectedSize:
+            r = self.transferDataSingle(seq) if answers == None else next(answers,None)
+            if r == None or not checkTransferSequence(seq,r):
                 return None
-            if seq != r[0]:
-                log("Transfer Data Sequence Error, expected {:02x}, got {:02x}".format(seq,r[0]),LOG_ERROR)
-                return None
-            else:
-                result += r[1:]
+            result += r[1:]
             seq =  (seq + 1)& 0xFF
         return result
     
+    #Sends a raw payload for each item of requests and yields their answers (None after a timeout).
+    #Each request is sent by the ISO-TP engine as soon as the answer to the previous one is received, so that the CAN link does not stay idle.
+    def pipelineRawData(self,requests,timeout=RAMN_Utils.DEFAULT_TIMEOUT):
+        requests = iter(requests)
+        current = next(requests,None)
+        if current == None or self.sendRawData(current,timeout,recvAnswer=False) == None:
+            return
+        try:
+            while current != None:
+                following = next(requests,None)
+                if following != None:
+                    if isLogEnabled(LOG_DEBUG):
+                        log("SEND:" + self.uds.display(following),LOG_DEBUG)
+                    self.tp.sendFrameAfterResponse(bytes(following),self.txid,self.rxid)
+                payload = self.receiveRawData(timeout)
+                if payload == None:
+                    yield None
+                    return
+                yield payload
+                current = following
+        finally:
+            self.tp.cancelChainedFrames(self.rxid)
+    
+    #Pipelined version of sendCommand: yields the parameters of each answer (None if negative or missing)
+    def pipelineCommands(self,commandID,paramsList,timeout=RAMN_Utils.DEFAULT_TIMEOUT):
+        for r in self.pipelineRawData(([commandID] + params for params in paramsList),timeout):
+            yield None if r == None else parseUDSAnswer(commandID,r)
+    
     #perform as many "Transfer Data" commands as necessary, for DOWNLOAD (Python Script->ECU)    
     def transferDataDownload(self,data,chunkSize):
         seq = 1
         for item in breakInUDSChunk(data,chunkSize):
             res = self.transferDataSingle(seq, item)
             seq =  (seq + 1)& 0xFF        
-            if res == None:
+            if not isPositiveAnswer(res):
                 return None
         return []
         
@@ -182,10 +373,7 @@ UDSAnalyzer.UDS_SID_STRINGS[r[1]] + ")",LOG_ERROR)
         return self.sendCommand(0x2E,int16ToList(identifier&0xFFFF) + int32ToList(val)) 
      
     def readVIN(self):
-        v =  self.readDataByIdentifier(0xF190)
-        if v != None:
-            return (''.join(chr(i) for i in v)).strip('\x00')
-        return None
+        return decodeVIN(self.readDataByIdentifier(0xF190))
         
     def writeVIN(self,vin):
         return self.writeDataByIdentifier(0xF190, [ord(i) for i in vin]) 
@@ -210,11 +398,7 @@ UDSAnalyzer.UDS_SID_STRINGS[r[1]] + ")",LOG_ERROR)
         self.disablePeriodicSending()       #Optional
         
     def getCRC32(self,address,size):
-        crc = self.routineControl(0x01,0x0206,parameters=int32ToList(address)+int32ToList(size))
-        if crc != None:
-            if len(crc) >= 4:
-                return listToInt32(crc[:4])
-        return None
+        return parseCRC32(self.routineControl(0x01,0x0206,parameters=int32ToList(address)+int32ToList(size)))
     
     #prints info that can be obtained over US in a human readable manner
     def printInfo(self):  
@@ -246,41 +430,119 @@ UDSAnalyzer.UDS_SID_STRINGS[r[1]] + ")",LOG_ERROR)
 
     
     #Reprograms ECU with specified firmware
-    def reprogram(self,filename, erase=True, copyEEPROM=True, swap=True):
-        # Routine Control, Erase Memory (FF00)
-        if erase:
-            log("Requesting Erase of alternative firmware...",LOG_DATA)
-            self.eraseAlternativeBank()
-       
+    def reprogram(self,filename, erase=True, copyEEPROM=True, swap=True, differential=False):
         addr, size, data = getDownloadData(filename)
         if (size > 0x3E000):
             log("Firmware too big to fit in a single bank - use hardware bootloader or programmer",LOG_ERROR)
             return None
-        
-        # Request Download
-        log("Requesting Download at address {:08x} with size {:08x} ({:d} bytes)".format(addr,size,size),LOG_DATA)
-        if self.requestDownload(addr,size) != None:
-        
-            # Transfer Data
-            log("Sending firmware...".format(addr,size,size),LOG_DATA)
-            self.transferDataDownload(data,chunkSize=0xFF8)
-        
-            # Request Transfer Exit
-            if self.requestTransferExit() != None:
             
-                if copyEEPROM:
-                    log("Requesting Copy of EEPROM", LOG_DATA)
-                    self.copyEEPROMtoAlternative() #request copy of EEPROM
-                    
-                #Routine Control, validate application (FF01)
-                if swap:
-                    log("Requesting Swap of Memory Banks", LOG_DATA)
-                    if self.routineControl(0x01,0xFF01, recvAnswer=False) != None: #Request SWAP of banks
-                        time.sleep(1)
-                        return True
-                else:
+        result = None
+        if differential:
+            result = self.downloadChangedPages(addr,data)
+            if result == None:
+                log("ECU {} does not support differential reprogramming, sending full firmware".format(self.name),LOG_WARNING)
+            
+        if result == None:
+            # Routine Control, Erase Memory (FF00)
+            if erase:
+                log("Requesting Erase of alternative firmware...",LOG_DATA)
+                self.eraseAlternativeBank()
+            
+            log("Requesting Download at address {:08x} with size {:08x} ({:d} bytes)".format(addr,size,size),LOG_DATA)
+            result = self.downloadArea(addr,data)
+            self.swapRoutine = 0xFF01
+            
+        if result:
+            if copyEEPROM:
+                log("Requesting Copy of EEPROM", LOG_DATA)
+                if not isPositiveAnswer(self.copyEEPROMtoAlternative()): #request copy of EEPROM
+                    log("ECU {} could not copy its EEPROM, not swapping memory banks".format(self.name),LOG_ERROR)
+                    return False
+                
+            #Routine Control, validate application (FF01)
+            if swap:
+                log("Requesting Swap of Memory Banks", LOG_DATA)
+                if self.swapBanks() != None:
+                    time.sleep(1)
                     return True
+            else:
+                return True
         return False
+        
+    #Sends data to the alternative firmware at specified address (Request Download, Transfer Data, Request Transfer Exit)
+    def downloadArea(self,address,data):
+        if isPositiveAnswer(self.requestDownload(address,len(data))):
+            log("Sending firmware...",LOG_DATA)
+            if isPositiveAnswer(self.transferDataDownload(data,chunkSize=0xFF8)):
+                return isPositiveAnswer(self.requestTransferExit())
+        return False
+        
+    #Returns the offsets of the pages of image (starting at address) which content differs in the alternative firmware, None if CRCs cannot be read
+    #A single CRC of the whole area is requested first, so that an unchanged firmware only costs one request.
+    def getChangedPages(self,address,image):
+        crc = self.getCRC32(FLASH_BANK_OFFSET + address,len(image))
+        if crc == None:
+            return None
+        if crc == zlib.crc32(image):
+            return []
+        changed = []
+        for offset in range(0,len(image),FLASH_PAGE_SIZE):
+            page = image[offset:offset+FLASH_PAGE_SIZE]
+            crc = self.getCRC32(FLASH_BANK_OFFSET + address + offset,len(page))
+            if crc == None:
+                return None
+            if crc != zlib.crc32(page):
+                changed.append(offset)
+        return changed
+        
+    #Differential reprogramming: only erases and sends the pages of the alternative firmware that differ from the new firmware.
+    #The content of the alternative firmware is learned with the existing CRC routine (0x0206). Erasing only the changed pages
+    #requires routine 0x0212: the only other erase routine (FF00) clears the whole bank, after which everything must be sent again.
+    #Returns None if the ECU does not support it (nothing was modified), True if successful, False otherwise.
+    def downloadChangedPages(self,addr,data):
+        start = addr - ((addr - FLASH_START) % FLASH_PAGE_SIZE)
+        #Expected content of the alternative firmware, as left by a full erase and download
+        image = b'\xff'*(addr-start) + bytes(data) + b'\xff'*(FLASH_EEPROM_START-addr-len(data))
+        changed = self.getChangedPages(start,image)
+        if changed == None:
+            return None
+        log("ECU {}: {} of {} pages changed".format(self.name,len(changed),len(image)//FLASH_PAGE_SIZE),LOG_DATA)
+        
+        #Group consecutive pages so that each area is erased and sent in one go
+        areas = []
+        for offset in changed:
+            if len(areas) > 0 and areas[-1][1] == offset:
+                areas[-1][1] = offset + FLASH_PAGE_SIZE
+            else:
+                areas.append([offset,offset + FLASH_PAGE_SIZE])
+        #EEPROM pages are erased as well, so that they can be copied
+        areas.append([FLASH_EEPROM_START-start,FLASH_BANK_END-start])
+        
+        transferred = False
+        for i in range(len(areas)):
+            areaStart, areaEnd = areas[i]
+            if not isPositiveAnswer(self.eraseAlternativePages(start+areaStart,areaEnd-areaStart)):
+                if i == 0:
+                    return None
+                return False
+            #Erased flash already reads FF, only send the content (in multiples of 8 bytes)
+            content = image[areaStart:min(areaEnd,len(image))]
+            skip = len(content) - len(content.lstrip(b'\xff'))
+            skip -= skip % 8
+            end = len(content.rstrip(b'\xff'))
+            end += (-end) % 8
+            if end > skip:
+                log("Requesting Download at address {:08x} with size {:08x} ({:d} bytes)".format(start+areaStart+skip,end-skip,end-skip),LOG_DATA)
+                if not self.downloadArea(start+areaStart+skip,content[skip:end]):
+                    return False
+                transferred = True
+        #Validation of application (FF01) requires a download, force the swap if the firmware did not change
+        self.swapRoutine = 0xFF01 if transferred else 0x0211
+        return True
+        
+    #Requests a swap of memory banks (will reset the ECU)
+    def swapBanks(self):
+        return self.routineControl(0x01,self.swapRoutine, recvAnswer=False)
    
     #function to test ISO-TP Link. Return True if data was successfully echoed        
     # Direction 0 for echo of provided data             (DOWNLINK-UPLINK test)
@@ -309,7 +571,7 @@ UDSAnalyzer.UDS_SID_STRINGS[r[1]] + ")",LOG_ERROR)
         return False
     
     #Dumps the firmware of ECU using requestDownload
-    def dumpFirmware(self,addr, size):
+    def dumpFirmware(self,addr, size, pipelined=False):
         dump = None
         # Request Download
         blocksize = self.requestUpload(addr,size)
@@ -318,34 +580,38 @@ UDSAnalyzer.UDS_SID_STRINGS[r[1]] + ")",LOG_ERROR)
 
             # Transfer Data
             log("Receiving firmware...".format(addr,size,size),LOG_DATA)
-            dump = self.transferDataUpload(size)
+            dump = self.transferDataUpload(size,blocksize if pipelined else None)
             
             if dump != None:
                 # Request Transfer Exit
                 if self.requestTransferExit() != None:
-                    if len(dump) != size:
-                        log("Got Unexpected Size from dump. Expected {:x}, got {:x}".format(size,len(data)),LOG_ERROR)
-                        dump = None
+                    dump = checkUploadSize(dump,size)
         return dump
     
     #Dumps a specified area of memory using ReadMemoryByAddress
-    def dumpArea(self,start,end,blockSize=0xFF0):
+    #Set pipelined to send each request as soon as the previous answer is received
+    def dumpArea(self,start,end,blockSize=0xFF0,pipelined=False):
         dump = []
-        addr = start 
-        size = end - start
-        index = 0
-        while (index < size):
-            reqSize = min(blockSize,(size-index))
-            r = self.readMemoryByAddress(addr+index,reqSize)
-            if r != None:
-                dump += r
-                index += reqSize
-            else:
-                log("Read Memory By Address Failed, Could not read Data", LOG_ERROR)
-                break
-        if len(dump) != size:
-            log("Read Memory By Address Failed, Did not receive enough bytes", LOG_ERROR)
+        for address, data in self.readMemoryBlocks(start,end,blockSize,pipelined):
+            dump += data
+        checkDumpSize(dump,end-start)
         return dump
+    
+    #Reads an area of memory using ReadMemoryByAddress, and yields (address, data) for each block as it arrives. Stops at the first failure.
+    def readMemoryBlocks(self,start,end,blockSize=0xFF0,pipelined=False):
+        blocks = memoryBlocks(start,end,blockSize)
+        answers = None
+        if pipelined and not self.isUSB and checkAddressValidity(start,end):
+            answers = self.pipelineCommands(0x23,(readMemoryParams(address,size) for address, size in blocks))
+        try:
+            for address, size in blocks:
+                r = self.readMemoryByAddress(address,size) if answers == None else next(answers,None)
+                if not checkMemoryBlock(r,size):
+                    return
+                yield address, r
+        finally:
+            if answers != None:
+                answers.close()
         
     #Dump the area of memory in charge of EEPROM emulation
     def dumpEEPROM(self,blockSize=0xFF0):
@@ -362,6 +628,10 @@ UDSAnalyzer.UDS_SID_STRINGS[r[1]] + ")",LOG_ERROR)
     #Erase the alternative firmware. Required before reprogramming.
     def eraseAlternativeBank(self):
         return self.routineControl(0x01,0xFF00)
+        
+    #Erase only the pages of the alternative firmware holding the specified area (used for differential reprogramming)
+    def eraseAlternativePages(self,address,size):
+        return self.routineControl(0x01,0x0212,parameters=int32ToList(address)+int32ToList(size))
        
     #Load a Chip8 game over UDS
     def loadChip8(self, game_path):
@@ -381,51 +651,121 @@ UDSAnalyzer.UDS_SID_STRINGS[r[1]] + ")",LOG_ERROR)
         from PIL import Image
         image = Image.open(image_path).convert("RGB")
         #size should be 236 195 to fit on RAMN canvas.
-        STARTX = 2
-        STARTY = 2
         WIDTH = image.size[0]
         HEIGHT = image.size[1]
-        STEP = 8 #8 max
         log("Sending image with size {} x {}".format(WIDTH, HEIGHT), LOG_DEBUG)
-
-        payloads = []
-        for i in range(0, HEIGHT + 1, STEP):
-            Y = i
-            YLEN = (min(HEIGHT-i,STEP))
-            payload = [STARTX, STARTY+Y, WIDTH, YLEN]
-
-            for y in range(YLEN):
-                for x in range(WIDTH):
-                    r,g,b = image.getpixel((x,Y+y))
-
-                    R = r >> 3
-                    G = g >> 2
-                    B = b >> 3
-
-                    rgb565 = (R << 11) | (G << 5) | B
-             
-                    payload += [(rgb565)&0xFF]
-                    payload += [(rgb565 >> 8)&0xFF]
-
-            payloads.append(payload)
+        self.sendDisplayStrips(displayStrips(imageToRGB565(image),WIDTH,0,0,WIDTH,HEIGHT))
+    
+    #Streams frames (PIL images, or numpy arrays of shape height x width x 3, e.g. from loadImageFrames) to the screen at up to fps frames per second.
+    #Only the parts of a frame that differ from the previous one are sent. Frames are dropped when the link falls behind.
+    #Returns the number of frames displayed and the number of frames dropped.
+    def displayFrames(self, frames, fps=10):
+        from PIL import Image
+        period = 1/fps
+        previous = None
+        shown = 0
+        dropped = 0
+        nextTime = time.perf_counter()
+        for frame in frames:
+            now = time.perf_counter()
+            if now - nextTime >= period:
+                #More than one frame late: skip this one (the screen keeps the previous frame, so the next diff is still correct)
+                dropped += 1
+                nextTime += period
+                continue
+            if now < nextTime:
+                time.sleep(nextTime - now)
+            nextTime += period
+            
+            if not isinstance(frame, Image.Image):
+                frame = Image.fromarray(frame)
+            frame = quantizeRGB565(frame)
+            if previous == None or previous.size != frame.size:
+                rects = [(0, 0, frame.size[0], frame.size[1])]
+            else:
+                rects = dirtyRectangles(frame,previous)
+            if len(rects) > 0:
+                pixels = imageToRGB565(frame)
+                self.sendDisplayStrips(strip for rect in rects for strip in displayStrips(pixels,frame.size[0],*rect))
+            previous = frame
+            shown += 1
+        log("Displayed {} frames, dropped {} frames".format(shown,dropped), LOG_DEBUG)
+        return shown, dropped
+    
+    #Sends 0x41 payloads, preparing each one while the previous one is being transferred
+    def sendDisplayStrips(self, payloads):
+        pending = False
         for payload in payloads:
-            self.sendCommand(0x41,payload)
+            if pending:
+                parseUDSAnswer(0x41,self.receiveRawData())
+            self.sendRawData(payload,recvAnswer=False)
+            pending = True
+        if pending:
+            parseUDSAnswer(0x41,self.receiveRawData())
     
     #Verify that firmware is correctly flashed
-    def verify(self,filename):
+    #Set useCRC to compare CRCs computed by the ECU instead of uploading the firmware (only the differing areas are then located)
+    def verify(self,filename,useCRC=False):
         addr, size, data = getDownloadData(filename)
         log("Verifying area at address {:08x} with size {:08x}".format(addr,size),LOG_DEBUG)
+        if useCRC:
+            areas = self.findMismatchedAreas(addr,data)
+            if areas == None:
+                log("Verify Failed: Could not get CRC", LOG_ERROR)
+                return False
+            for start, end in areas:
+                log("Firmware differs in area {:08x}-{:08x}".format(start,end), LOG_ERROR)
+            return len(areas) == 0
         dump = self.dumpFirmware(addr,size)
         if dump != None:
-            result = True
-            for i in range(len(data)):
-                if data[i] != dump[i]:
-                    result = False
-            if result:
+            if bytes(dump) == bytes(data):
                 return True
         else:
             log("Verify Failed: No Data", LOG_ERROR)
         return False
+        
+    #Returns the list of areas (start, end) where the memory of the ECU differs from data (expected at address), None if CRCs cannot be read
+    #Only a single CRC is requested if memory matches, otherwise differing areas are located by bisection down to minSize bytes
+    def findMismatchedAreas(self,address,data,minSize=0x100):
+        crc = self.getCRC32(address,len(data))
+        if crc == None:
+            return None
+        if crc == zlib.crc32(data):
+            return []
+        areas = self.bisectMismatch(address,memoryview(data),minSize)
+        if areas == None:
+            return None
+        merged = []
+        for start, end in areas:
+            if len(merged) > 0 and merged[-1][1] == start:
+                merged[-1] = (merged[-1][0],end)
+            else:
+                merged.append((start,end))
+        return merged
+    
+    #Locates the areas that differ in data, which CRC is already known to be different
+    def bisectMismatch(self,address,data,minSize):
+        if len(data) <= minSize:
+            return [(address,address+len(data))]
+        middle = len(data)//2
+        crc = self.getCRC32(address,middle)
+        if crc == None:
+            return None
+        if crc == zlib.crc32(data[:middle]):
+            #First half matches, so the difference is in the second half
+            return self.bisectMismatch(address+middle,data[middle:],minSize)
+        left = self.bisectMismatch(address,data[:middle],minSize)
+        if left == None:
+            return None
+        crc = self.getCRC32(address+middle,len(data)-middle)
+        if crc == None:
+            return None
+        if crc == zlib.crc32(data[middle:]):
+            return left
+        right = self.bisectMismatch(address+middle,data[middle:],minSize)
+        if right == None:
+            return None
+        return left + right
     
     #Puts the ECU back in operational mode
     def close(self,reset=False):
@@ -7,35 +7,202 @@
 #This module handles USB Communication with RAMN's ECU A.
 
 import serial
+import threading
+import collections
 from utils.RAMN_Utils import *
+from utils.RAMN_SLCAN import *
+
+#Maximum number of bytes written to the serial port at once when commands are coalesced
+TX_CHUNK_SIZE = 0x1000
+#Queued commands are only written when less than this many bytes are still waiting in the OS output buffer
+TX_MAX_OUT_WAITING = 0x4000
+#How long to sleep while waiting for the OS output buffer to drain
+TX_BACKPRESSURE_SLEEP = 0.001
+#Maximum number of frames kept per receive buffer. Oldest frames are dropped when consumers are too slow.
+RX_RING_SIZE = 0x4000
+#Serial read timeout of the background reader (bounds how long stopReader may take)
+READER_POLL_TIMEOUT = 0.05
+
+#Queue of received frames matching a set of CAN IDs (or an ID/mask pair). Created with RAMN_USB_Handler.subscribe.
+class RAMN_CAN_Subscription():
+    def __init__(self,ramn,ids=None,canid=0,mask=0,maxSize=RX_RING_SIZE):
+        self.ramn = ramn
+        self.ids = None if ids == None else frozenset(ids)
+        self.canid = canid & mask
+        self.mask = mask
+        self.frames = collections.deque(maxlen=maxSize)
+        self.dropped = 0
+    
+    def matches(self,frame):
+        if self.ids != None:
+            return frame.canid in self.ids
+        return (frame.canid & self.mask) == self.canid
+    
+    #Called by the handler with rxCondition held
+    def put(self,frame):
+        if len(self.frames) == self.frames.maxlen:
+            self.dropped += 1
+        self.frames.append(frame)
+    
+    #Returns the next frame of this subscription, or None after timeout seconds (0 to wait forever)
+    def get(self,timeout=0):
+        return self.ramn.popRX(self.frames,timeout)
+    
+    #Returns all frames currently queued for this subscription (waits up to timeout seconds for the first one)
+    def getAll(self,timeout=0):
+        return self.ramn.popAllRX(self.frames,timeout)
+    
+    #Returns the frames already queued for this subscription, without reading the port or waiting
+    def getAvailable(self):
+        with self.ramn.rxCondition:
+            items = list(self.frames)
+            self.frames.clear()
+            return items
+    
+    #Discard frames received so far (e.g. stale answers before sending a new request)
+    def clear(self):
+        with self.ramn.rxCondition:
+            self.frames.clear()
+    
+    def close(self):
+        self.ramn.unsubscribe(self)
+
+#Formats a UDS command for ECU A (UDS over USB)
+def formatUDSCommandUSB(command):
+    return '%' + "{:03x}".format(len(command)) + bytes(command).hex()
+
+#Returns the payload of a UDS over USB answer line, or None if the line is not a valid answer
+def parseUDSAnswerUSB(answer):
+    if answer != None and len(answer) >= 4 and answer[0] == ord('%'):
+        size = int(answer[1:4],16)
+        if size*2 == len(answer)-4: #Check correct payload size
+            return bytes.fromhex(answer[4:].decode())
+    return None
 
 class RAMN_USB_Handler():
     def __init__(self,port):
         self.port = port
         self.ser = None
-        
-    def readline(self,timeout=0):
+        self.parser = SLCANParser()
+        self.txBuffer = bytearray()
+        self.txLock = threading.RLock()
+        self.coalesceTX = False
+        self.coalesceBursts = True #Frames sent in bursts (ISO-TP consecutive frames) are queued and written together
+        self.deferredFlush = None #If set, commands are always queued, and flushTX calls it instead of writing (e.g. to write from an event loop without blocking)
+        self.readerThread = None
+        self.readerRunning = False
+        self.rxFrames = collections.deque(maxlen=RX_RING_SIZE)
+        self.rxLines = collections.deque(maxlen=RX_RING_SIZE)
+        self.rxCondition = threading.Condition()
+        self.rxDropped = 0
+        self.subscriptions = []
+
+    #Only reconfigure the port when the timeout actually changes (reconfiguration is slow)
+    def setTimeout(self,timeout):
+        if timeout != 0 and self.ser.timeout != timeout:
+            self.ser.timeout = timeout
+
+    #Reads all bytes currently available (or waits for at least one) into the slcan parser. Returns the reception time, or None on timeout.
+    def receive(self,timeout=0):
+        self.setTimeout(timeout)
+        data = self.ser.read(max(1,self.ser.in_waiting))
+        if len(data) == 0:
+            return None
+        rxtime = time.perf_counter()
+        waiting = self.ser.in_waiting
+        if waiting > 0:
+            data += self.ser.read(waiting)
+        self.parser.feed(data)
+        return rxtime
+    
+    #Sends every complete line in the parser to its destination: matching subscriptions for frames (rxFrames if none matches), rxLines for other lines.
+    #Must be called with rxCondition held.
+    def dispatch(self,rxtime=None):
         while True:
-            line = b''
-            #Slower when timeout is active
-            if timeout != 0:
-                self.ser.timeout = timeout
-            line = self.ser.read_until(b'\r')
-            if line == b'':
-                return
-            if len(line) <= 1 or line[-1] != ord('\r'):
-                pass
-            else:
-                if not line[0] == ord('d'):
-                    return line[:-1] # remove the trailing \r
+            item = self.parser.nextItem(rxtime)
+            if item == None:
+                break
+            if isinstance(item,SLCANFrame):
+                matched = False
+                for sub in self.subscriptions:
+                    if sub.matches(item):
+                        sub.put(item)
+                        matched = True
+                if not matched:
+                    if len(self.rxFrames) == self.rxFrames.maxlen:
+                        self.rxDropped += 1
+                    self.rxFrames.append(item)
+            elif len(item) > 0:
+                if not item[0] == ord('d'):
+                    self.rxLines.append(item)
                 else:
-                    log("Received debug message: " + str(line.decode()),LOG_ERROR)
+                    log("Received debug message: " + str(item.decode()),LOG_ERROR)
+        self.rxCondition.notify_all()
+    
+    #Waits until ready() returns True, or timeout seconds (0 to wait forever). Without background reader, the port is read by the caller.
+    def waitRX(self,ready,timeout=0):
+        self.flushTX() #Answers cannot arrive for commands that were not sent
+        with self.rxCondition:
+            if self.readerThread != None:
+                return self.rxCondition.wait_for(ready, timeout if timeout != 0 else None)
+            if ready():
+                return True
+        deadline = time.perf_counter() + timeout
+        while True:
+            remaining = timeout
+            if timeout != 0:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    return False
+            rxtime = self.receive(remaining)
+            with self.rxCondition:
+                if rxtime != None:
+                    self.dispatch(rxtime)
+                if ready():
+                    return True
+            if rxtime == None or (timeout != 0 and time.perf_counter() >= deadline):
+                return False
+    
+    #Pops the oldest item of a receive buffer, or returns None on timeout
+    def popRX(self,ring,timeout=0):
+        if self.waitRX(lambda: len(ring) > 0, timeout):
+            with self.rxCondition:
+                if len(ring) > 0:
+                    return ring.popleft()
+        return None
+    
+    #Pops all items of a receive buffer, waiting for at least one. Returns an empty list on timeout.
+    def popAllRX(self,ring,timeout=0):
+        if self.waitRX(lambda: len(ring) > 0, timeout):
+            with self.rxCondition:
+                items = list(ring)
+                ring.clear()
+                return items
+        return []
+    
+    #Returns a subscription that receives every frame with a CAN ID in ids, or such that (canid & mask) == (frame ID & mask).
+    #Frames matching a subscription are not returned by getNextCANFrame/getCANFrames anymore. Use mask=0 to receive everything (sniffer).
+    def subscribe(self,ids=None,canid=0,mask=0,maxSize=RX_RING_SIZE):
+        sub = RAMN_CAN_Subscription(self,ids=ids,canid=canid,mask=mask,maxSize=maxSize)
+        with self.rxCondition:
+            self.subscriptions.append(sub)
+        return sub
+    
+    def unsubscribe(self,sub):
+        with self.rxCondition:
+            if sub in self.subscriptions:
+                self.subscriptions.remove(sub)
+
+    #Returns the next line that is not a CAN frame (e.g. UDS over USB answers), or None on timeout
+    def readline(self,timeout=0):
+        return self.popRX(self.rxLines,timeout)
     
     def open(self,autoOpen=True,emptyBuffer=True):
         self.ser = serial.Serial(self.port)
         #Turn off simulator, if on
         self.sendCommand(b'c0') #make sure CARLA is off
         self.ser.reset_input_buffer()
+        self.parser.reset()
         if autoOpen:
             self.sendCommand(b'O')
    
@@ -44,41 +211,125 @@ class RAMN_USB_Handler():
             c = bytes(c)
         if isinstance(c,str):
             c = c.encode()
-        self.ser.write(c + end)
+        if self.coalesceTX or self.deferredFlush != None:
+            self.queueCommand(c,end)
+            return
+        with self.txLock:
+            if len(self.txBuffer) > 0:
+                self.flushTX() #Keep commands in order
+            self.ser.write(c + end)
+    
+    #Adds a command to the TX buffer. Commands are only written when the buffer is full, when flushTX is called, or before reading.
+    def queueCommand(self,c,end=b'\r'):
+        if isinstance(c,list):
+            c = bytes(c)
+        if isinstance(c,str):
+            c = c.encode()
+        with self.txLock:
+            self.txBuffer += c
+            self.txBuffer += end
+            if len(self.txBuffer) >= TX_CHUNK_SIZE:
+                self.flushTX()
+    
+    #Writes all queued commands in as few writes as possible, waiting for the OS output buffer to drain if it is too full
+    def flushTX(self):
+        with self.txLock:
+            if len(self.txBuffer) == 0:
+                return
+            if self.deferredFlush != None:
+                self.deferredFlush()
+                return
+            with memoryview(self.txBuffer) as mv:
+                for index in range(0,len(mv),TX_CHUNK_SIZE):
+                    while self.ser.out_waiting > TX_MAX_OUT_WAITING:
+                        time.sleep(TX_BACKPRESSURE_SLEEP)
+                    self.ser.write(mv[index:index+TX_CHUNK_SIZE])
+            del self.txBuffer[:]
+    
+    #When enabled, sendCommand queues commands instead of writing them immediately. Disable for latency-sensitive use.
+    #Bursts of frames (ISO-TP transfers) are coalesced by default, disabling also writes them one by one.
+    def setTXCoalescing(self,enabled):
+        self.coalesceTX = enabled
+        self.coalesceBursts = enabled
+        if not enabled:
+            self.flushTX()
+    
+    #Returns the next CAN frame (standard, extended, CAN-FD or remote) not claimed by a subscription, or None on timeout
+    def getNextCANFrame(self,timeout=0):
+        return self.popRX(self.rxFrames,timeout)
+    
+    #Returns all CAN frames received so far (waits for data if nothing is available yet). Useful for sniffing busy buses.
+    def getCANFrames(self,timeout=0):
+        return self.popAllRX(self.rxFrames,timeout)
          
     def getNextCANMessage(self,timeout=0):
-        c = self.readline(timeout=timeout)
-        canid = None
-        payload = None
-        if c != None:
-            if chr(c[0]) == 't':
-                if len(c) >= 5:
-                    canid = int(c[1:4],16)
-                    if chr(c[-1]) == 'i':
-                        c = c[:-1] #Remove trailing i if found
-                    payload = bytes.fromhex(c[5:].decode())
-              
-        return payload, canid
+        frame = self.getNextCANFrame(timeout=timeout)
+        if frame != None:
+            return frame.payload, frame.canid
+        return None, None
         
     def flush(self):
+        self.flushTX()
         self.ser.flush()                     #Flush serial 
         while (self.ser.out_waiting != 0):
             time.sleep(0.1)
-        while (self.ser.in_waiting != 0):
-            self.ser.read(self.ser.in_waiting)
+        if self.readerThread != None:
             time.sleep(0.01)
+        else:
+            while (self.ser.in_waiting != 0):
+                self.ser.read(self.ser.in_waiting)
+                time.sleep(0.01)
+            self.parser.reset()
+        with self.rxCondition:
+            self.rxFrames.clear()
+            self.rxLines.clear()
+            for sub in self.subscriptions:
+                sub.frames.clear()
+    
+    #Starts a thread that continuously drains the serial port into a bounded buffer of frames timestamped at reception.
+    #Once started, readline/getNextCANFrame/getCANFrames and subscriptions wait on their buffer with their own timeout instead of reading the port.
+    def startReader(self,ringSize=RX_RING_SIZE):
+        if self.readerThread != None:
+            return
+        self.flushTX()
+        with self.rxCondition:
+            self.dispatch()
+            self.rxFrames = collections.deque(self.rxFrames,maxlen=ringSize)
+            self.rxLines = collections.deque(self.rxLines,maxlen=ringSize)
+        self.ser.timeout = READER_POLL_TIMEOUT
+        self.readerRunning = True
+        self.readerThread = threading.Thread(target=self.readerLoop,daemon=True)
+        self.readerThread.start()
+    
+    #Stops the background reader. Received data stays available to the polling functions.
+    def stopReader(self):
+        if self.readerThread == None:
+            return
+        self.readerRunning = False
+        self.readerThread.join()
+        self.readerThread = None
+    
+    def readerLoop(self):
+        while self.readerRunning:
+            try:
+                rxtime = self.receive()
+            except serial.SerialException as e:
+                log("Serial reader stopped: " + str(e),LOG_ERROR)
+                break
+            if rxtime != None:
+                with self.rxCondition:
+                    self.dispatch(rxtime)
+        self.readerRunning = False
     
     def sendUDSCommandUSB(self,command,timeout=0,recvAnswer=True):
         if command != None:
             if len(command) > 0:
-                hexStr = ''.join("{:02x}".format(i) for i in command)
-                self.sendCommand('%' + "{:03x}".format(len(command)) + hexStr)
+                self.sendCommand(formatUDSCommandUSB(command))
                 if recvAnswer:
                     answer = self.readline(timeout=timeout)
-                    if answer[0] == ord('%'):
-                        size = int(answer[1:4],16)
-                        if size*2 == len(answer)-4: #Check correct payload size
-                            return bytes.fromhex(answer[4:].decode())
+                    payload = parseUDSAnswerUSB(answer)
+                    if payload != None:
+                        return payload
                     log("Got Unexpected Answer. CAN messages should be OFF during USB diagnostics ({})".format(answer),LOG_ERROR)
                         
                 else: return []    
@@ -103,5 +354,6 @@ class RAMN_USB_Handler():
         self.flush()  
         
         time.sleep(0.2)
+        self.stopReader()
         self.ser.close()
         log("Successfully terminated RAMN Connection", LOG_OUTPUT)
@@ -13,6 +13,12 @@ import time
 import os
 import serial.tools.list_ports
 import binascii
+import logging
+import logging.handlers
+import queue
+import json
+import struct
+import atexit
 from utils.RAMN_STM32L552_Utils import *  
 
 #Verbose levels
@@ -50,6 +56,10 @@ class RAMN_Utils:
     CAN_REFRESH_RATE = 200
     VCAND_HARDWARE_PORT = None
     SERIAL_FORWARD_TARGET = ''
+    LOG_FORMAT = None   #text, json or binary to use the logging backend at import
+    LOG_FILE = None
+    LOG_BACKEND = None  #logging.Logger used by log() (see enableLoggingBackend), None to print with click
+    LOG_LISTENER = None #Thread writing queued log records
 
 
     @staticmethod
@@ -114,6 +124,10 @@ class RAMN_Utils:
                                         RAMN_Utils.VCAND_HARDWARE_PORT = v    
                                 elif p == "SERIAL_FORWARD_TARGET":
                                     RAMN_Utils.SERIAL_FORWARD_TARGET = v    
+                                elif p == "LOG_FORMAT":
+                                    RAMN_Utils.LOG_FORMAT = v
+                                elif p == "LOG_FILE":
+                                    RAMN_Utils.LOG_FILE = v
                                      
                             else:
                                 print("Invalid Settings File")
@@ -124,9 +138,15 @@ class RAMN_Utils:
         return cls
 
 #Displays a log message if verbose level matches conditions                            
+#txt may also be a function returning the message, so that it is only formatted if the message is displayed
 def log(txt, typ=LOG_OUTPUT,end=None):
     if typ > RAMN_Utils.VERBOSE_LEVEL:
         return
+    if callable(txt):
+        txt = txt()
+    if RAMN_Utils.LOG_BACKEND != None:
+        RAMN_Utils.LOG_BACKEND.log(LOGGING_LEVELS[typ], txt, extra={"monotonic": time.monotonic(), "ramnLevel": typ})
+        return
     if(typ == LOG_DEBUG):
         txt = click.style(txt, fg='blue')
     if(typ == LOG_WARNING):
@@ -140,6 +160,93 @@ def log(txt, typ=LOG_OUTPUT,end=None):
     else:
         click.echo(txt,nl=False)
 
+#Returns True if messages of specified type are displayed. Use to avoid formatting debug messages that would not be displayed.
+def isLogEnabled(typ):
+    return typ <= RAMN_Utils.VERBOSE_LEVEL
+
+#Levels of the standard logging module used for each verbose level (same order: a lower verbose level is more important)
+LOGGING_LEVELS = {LOG_ERROR: logging.ERROR, LOG_OUTPUT: 35, LOG_WARNING: logging.WARNING, LOG_DATA: 15, LOG_DEBUG: logging.DEBUG}
+logging.addLevelName(35, "OUTPUT")
+logging.addLevelName(15, "DATA")
+
+#Binary log records: monotonic timestamp (double), verbose level (byte), message size (uint32), then the UTF-8 message
+BINARY_LOG_HEADER = struct.Struct("<dBI")
+
+#Formats log records as JSON objects (one per line), with the monotonic timestamp of the call to log()
+class JSONLinesFormatter(logging.Formatter):
+    def format(self, record):
+        return json.dumps({"time": getattr(record,"monotonic",record.created), "level": record.levelname, "message": record.getMessage()})
+
+#Writes log records to a binary file (see BINARY_LOG_HEADER and readBinaryLog)
+class BinaryLogHandler(logging.Handler):
+    def __init__(self, filename):
+        logging.Handler.__init__(self)
+        self.file = open(filename, "ab")
+
+    def emit(self, record):
+        message = record.getMessage().encode("utf-8", "replace")
+        level = getattr(record, "ramnLevel", LOG_OUTPUT)
+        self.file.write(BINARY_LOG_HEADER.pack(getattr(record,"monotonic",record.created), level, len(message)) + message)
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+        logging.Handler.close(self)
+
+#Yields (timestamp, verbose level, message) for each record of a binary log file
+def readBinaryLog(filename):
+    with open(filename, "rb") as f:
+        while True:
+            header = f.read(BINARY_LOG_HEADER.size)
+            if len(header) < BINARY_LOG_HEADER.size:
+                return
+            timestamp, level, size = BINARY_LOG_HEADER.unpack(header)
+            yield timestamp, level, f.read(size).decode("utf-8", "replace")
+
+#Sends messages of log() to the standard logging module (logger "RAMN") instead of printing them with click.
+#output is a file name (None for the console), and fmt is "text", "json" (one JSON object per line) or "binary".
+#If queued, records are written by a background thread so that slow consoles or disks do not slow down communications.
+def enableLoggingBackend(output=None, fmt="text", queued=True):
+    disableLoggingBackend()
+    if fmt == "binary":
+        if output == None:
+            log("Binary logs must be written to a file",LOG_ERROR)
+            return None
+        handler = BinaryLogHandler(output)
+    else:
+        handler = logging.StreamHandler() if output == None else logging.FileHandler(output)
+        handler.setFormatter(JSONLinesFormatter() if fmt == "json" else logging.Formatter("%(message)s"))
+    logger = logging.getLogger("RAMN")
+    logger.setLevel(logging.DEBUG) #Filtering is done by log() with the verbose level
+    logger.propagate = False
+    if queued:
+        RAMN_Utils.LOG_LISTENER = logging.handlers.QueueListener(queue.SimpleQueue(), handler)
+        logger.addHandler(logging.handlers.QueueHandler(RAMN_Utils.LOG_LISTENER.queue))
+        RAMN_Utils.LOG_LISTENER.start()
+    else:
+        logger.addHandler(handler)
+    RAMN_Utils.LOG_BACKEND = logger
+    return logger
+
+#Goes back to printing messages with click. Queued messages are written before returning.
+def disableLoggingBackend():
+    logger = RAMN_Utils.LOG_BACKEND
+    if logger == None:
+        return
+    RAMN_Utils.LOG_BACKEND = None
+    if RAMN_Utils.LOG_LISTENER != None:
+        RAMN_Utils.LOG_LISTENER.stop()
+        for handler in RAMN_Utils.LOG_LISTENER.handlers:
+            handler.close()
+        RAMN_Utils.LOG_LISTENER = None
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+        handler.close()
+
+atexit.register(disableLoggingBackend)
+
 def listToInt32(l):
     return (l[0] << 24) + (l[1] << 16) + (l[2] << 8) + l[3]
     
@@ -153,47 +260,63 @@ def int16ToList(val):
     return [(val >> 8)&0xFF, (val&0xFF)]
     
 def listToHex(l):
-    result = ""
-    for item in l:
-        result += "{:02x}".format(item)
-    return result
+    return bytes(l).hex()
+
+#Checks the size of a raw diagnostic payload (list or bytes). Returns it as bytes, or None if it is bigger than maxSize.
+def checkRawPayload(toSend,maxSize):
+    if isinstance(toSend,list):
+        toSend = bytes(toSend)
+    if len(toSend) > maxSize:
+        log("Requested a payload which size is too big: {}".format(len(toSend)),LOG_ERROR)
+        return None
+    return toSend
+
+#Logs the outcome of a Tester Present command (answer is None if the ECU did not respond). Returns True if the ECU responded.
+def checkTesterPresent(answer,txid,rxid):
+    if answer != None:
+        log("ECU responsed to Tester Present (TX:0x{:03x} RX:0x{:03x})".format(txid,rxid),LOG_DATA)
+        return True
+    log("ECU did not respond to Tester Present",LOG_ERROR)
+    return False
     
 #Breaks a bytes area in chunks of the size requested by the target over UDS
+#Chunks are memoryview slices of data (no copy), the last one may be smaller than chunkSize
 def breakInUDSChunk(data,chunkSize):
-    index = 0
-    chunk = []
-    result = []
-    while True:
-        chunk += [data[index]]
-        index += 1
-        if (index % chunkSize) == 0:
-            yield chunk
-            chunk = []
-        if index >= len(data):
-            yield chunk
-            break
+    if isinstance(data,list):
+        data = bytes(data)
+    view = memoryview(data)
+    for index in range(0,len(view),chunkSize):
+        yield view[index:index+chunkSize]
  
+#Hex files already loaded by getDownloadData: absolute path -> (mtime, size, result)
+downloadDataCache = {}
+
 #Reads a hex file and returns bytes array to be written to the specified address with specified size
+#The data is a read-only memoryview. Files are only parsed again if their modification time or size changed.
 def getDownloadData(filename):
-    ih = intelhex.IntelHex(filename)
-    start = ih.segments()[0][0]
-    end = ih.segments()[1][1]
-
-    #Pad empty data inside hex file with FF
-    for addr in range(ih.segments()[0][1],ih.segments()[1][0]):
-        ih[addr] = 0xFF
+    path = os.path.abspath(filename)
+    stat = os.stat(path)
+    cached = downloadDataCache.get(path)
+    if cached != None and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+        return cached[2]
+    
+    ih = intelhex.IntelHex(path)
+    segments = ih.segments()
+    start = segments[0][0]
+    end = segments[min(1,len(segments)-1)][1]
     
     #make sure data is #8 bytes aligned    
-    while ( (end)%8 != 0): 
-        ih[end] = 0xFF
-        end += 1
+    if (end%8) != 0:
+        end += 8 - (end%8)
     
     #Check that address range is valid
-    data = [ih[addr] for addr in range(start,end)]   
+    result = None, None, None
     if checkAddressValidity(start,end):
-        return start, (end - start), data
-    else:
-        return None, None, None
+        #Empty data inside hex file (and alignment) is padded with FF
+        ih.padding = 0xFF
+        result = start, (end - start), memoryview(ih.tobinstr(start=start,end=end-1))
+    downloadDataCache[path] = (stat.st_mtime_ns, stat.st_size, result)
+    return result
 
 #Class to make OBD-II commands human-readable. Mostly based on Wikipedia page: https://en.wikipedia.org/wiki/OBD-II_PIDs
 class OBDIIAnalyzer(object):
@@ -572,7 +695,7 @@ class UDSAnalyzer(object):
         return (SID in self.UDS_SID_STRINGS.keys()) or (SID-0x40 in self.UDS_SID_STRINGS.keys())
 
     def hasSubFunctionBytes(self, SID):
-        return not (SID in self.Request_FunctionsWithoutSubBytes or SID in self.Response_FunctionsWithoutSubBytes)
+        return self.HAS_SUB_FUNCTION[SID]
 
     DTC_DOMAIN_CODE = {
     0x00:"P",
@@ -596,30 +719,37 @@ class UDSAnalyzer(object):
 
     def getSubByteDisplayString(self, payload):
         SID = payload[0]
-        if SID in self.Request_FunctionsWithoutSubBytes or SID in self.Response_FunctionsWithoutSubBytes:
+        if not self.HAS_SUB_FUNCTION[SID] or len(payload) < 2:
             return ""
-        if len(payload) > 1:
-            data = payload[1]
-        else:
-            data = []
         if SID == 0x7f and len(payload) > 2:
-            if payload[2] in self.ERROR_STRINGS.keys(): return "Negative Response: " + self.ERROR_STRINGS[payload[2]]
-            else: return "Negative Response: Invalid code"
+            return self.NEGATIVE_RESPONSE_STRINGS[payload[2]]
+        SID = self.REQUEST_SID[SID]
 
-        elif SID >= 0x40 and SID < 0x80 or SID >= 0xC3:
-            SID -= 0x40        
+        if SID == 0x05:
+            if len(payload) < 3:
+                return "Invalid"
+            data = (payload[1]<<8) + payload[2]
+            if data in OBDIIAnalyzer.SAE_STANDARD_SERVICE_05.keys():
+                return OBDIIAnalyzer.SAE_STANDARD_SERVICE_05[data]
+            else: return "Invalid"
+        elif SID  == 0x22 or SID == 0x2E:
+            if len(payload) < 3:
+                return "Invalid"
+            return "address: " + hex(((payload[1])<<8) + payload[2])
+        elif SID == 0x27:
+            data = payload[1]
+            if data & 0x1 == 0x01: return "Seed Request level " + hex(data) + " : " + str(list(payload[2:]))
+            else: return "Key Send level " + hex(data-1) + " : " + str(list(payload[2:]))
+        return self.SUB_FUNCTION_STRINGS[SID][payload[1]]
 
+    #Describes the sub-function byte (data) of services which description only depends on that byte. Used to build SUB_FUNCTION_STRINGS.
+    @classmethod
+    def describeSubFunction(cls, SID, data):
         if SID == 0x01 or SID == 0x02:
             if data in OBDIIAnalyzer.SAE_STANDARD_SERVICE_01.keys():
                 return OBDIIAnalyzer.SAE_STANDARD_SERVICE_01[data]
             else: return "Invalid"
 
-        if SID == 0x05:
-            data = (payload[1]<<8 + payload[2])
-            if data in OBDIIAnalyzer.SAE_STANDARD_SERVICE_05.keys():
-                return OBDIIAnalyzer.SAE_STANDARD_SERVICE_05[data]
-            else: return "Invalid"
-
         if SID == 0x06:
             if data in OBDIIAnalyzer.SAE_STANDARD_SERVICE_06.keys():
                 return OBDIIAnalyzer.SAE_STANDARD_SERVICE_06[data]
@@ -643,13 +773,8 @@ class UDSAnalyzer(object):
             else: return "Invalid"
 
         elif SID == 0x19:
-            if data in self.DTC_SUB_FUNC.keys(): return "DTC Request: " + self.DTC_SUB_FUNC[data]
+            if data in cls.DTC_SUB_FUNC.keys(): return "DTC Request: " + cls.DTC_SUB_FUNC[data]
             else:  return "DTC Request: Invalid"
-        elif SID  == 0x22 or SID == 0x2E:  return "address: " + hex(((payload[1])<<8) + payload[2])
-
-        elif SID == 0x27:
-            if data & 0x1 == 0x01: return "Seed Request level " + hex(data) + " : " + str(payload[2:])
-            else: return "Key Send level " + hex(data-1) + " : " + str(payload[2:])
 
         elif SID == 0x28:
             if data == 0: return "EnableRxAndTx"
@@ -676,17 +801,25 @@ class UDSAnalyzer(object):
             return "Unknown or invalid Subbyte"
 
     def getErrorCodeDescription(self, code):
-        if code in self.ERROR_STRINGS.keys():
-            return self.ERROR_STRINGS[code]
+        return self.ERROR_DESCRIPTIONS[code]
+    
+    def getSIDDescription(self,SID):
+        return self.SID_DESCRIPTIONS[SID]
+
+    @classmethod
+    def describeErrorCode(cls, code):
+        if code in cls.ERROR_STRINGS.keys():
+            return cls.ERROR_STRINGS[code]
         else:
             return "Invalid Error Code"
     
-    def getSIDDescription(self,SID):
+    @classmethod
+    def describeSID(cls,SID):
         description = ""
-        if SID in self.UDS_SID_STRINGS.keys():
-            description =  self.UDS_SID_STRINGS[SID]
-        elif SID-0x40 in self.UDS_SID_STRINGS.keys():
-            description =  self.UDS_SID_STRINGS[SID-0x40] + " Response"
+        if SID in cls.UDS_SID_STRINGS.keys():
+            description =  cls.UDS_SID_STRINGS[SID]
+        elif SID-0x40 in cls.UDS_SID_STRINGS.keys():
+            description =  cls.UDS_SID_STRINGS[SID-0x40] + " Response"
         elif SID == 0x7F:
             description = "ERROR" 
         else: description =  "Unknown/Invalid SID"        
@@ -694,12 +827,23 @@ class UDSAnalyzer(object):
         return description
 
     def display(self, data):
-        description = self.getSIDDescription(data[0])    
-        result = "SID " + "${:02x}".format(data[0]) + " - "+ description
-        if len(data) > 1 and self.hasSubFunctionBytes(data[0]):
+        result = self.SID_DISPLAY_STRINGS[data[0]]
+        if len(data) > 1 and self.HAS_SUB_FUNCTION[data[0]]:
                 result += " - Subfunction " + "${:02x}".format(data[1]) + " - " + self.getSubByteDisplayString(data)
         return result
-        
+
+#Lookup tables with one entry per byte value, so that payloads are decoded without going through the dictionaries above
+UDSAnalyzer.SID_DESCRIPTIONS = [UDSAnalyzer.describeSID(SID) for SID in range(0x100)]
+UDSAnalyzer.SID_DISPLAY_STRINGS = ["SID " + "${:02x}".format(SID) + " - " + UDSAnalyzer.SID_DESCRIPTIONS[SID] for SID in range(0x100)]
+UDSAnalyzer.ERROR_DESCRIPTIONS = [UDSAnalyzer.describeErrorCode(code) for code in range(0x100)]
+UDSAnalyzer.NEGATIVE_RESPONSE_STRINGS = ["Negative Response: " + (UDSAnalyzer.ERROR_STRINGS[code] if code in UDSAnalyzer.ERROR_STRINGS.keys() else "Invalid code") for code in range(0x100)]
+UDSAnalyzer.HAS_SUB_FUNCTION = [not (SID in UDSAnalyzer.Request_FunctionsWithoutSubBytes or SID in UDSAnalyzer.Response_FunctionsWithoutSubBytes) for SID in range(0x100)]
+UDSAnalyzer.REQUEST_SID = [SID - 0x40 if (SID >= 0x40 and SID < 0x80) or SID >= 0xC3 else SID for SID in range(0x100)]
+UDSAnalyzer.SUB_FUNCTION_STRINGS = [["Unknown or invalid Subbyte"]*0x100]*0x100 #Shared row for services without described sub-functions
+for SID in (0x01,0x02,0x06,0x09,0x10,0x11,0x19,0x28,0x31,0x34,0x36,0x3E):
+    UDSAnalyzer.SUB_FUNCTION_STRINGS[SID] = [UDSAnalyzer.describeSubFunction(SID, data) for data in range(0x100)]
 
 #Read default settings at import
 RAMN_Utils.readDefaultSettings()
+if RAMN_Utils.LOG_FORMAT != None:
+    enableLoggingBackend(RAMN_Utils.LOG_FILE,RAMN_Utils.LOG_FORMAT)
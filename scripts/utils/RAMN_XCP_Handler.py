@@ -9,6 +9,21 @@
 
 from utils.RAMN_Utils   import *
 
+#Returns the slcan command sending the XCP payload toSend (bytes) on CAN ID txid
+def formatXCPFrame(txid,toSend):
+    return "t{:03x}{:01x}".format(txid,len(toSend)) + ''.join("{:02x}".format(i) for i in toSend)
+
+#Checks the CAN frame answering an XCP command. Returns its payload, None if no frame was received.
+def parseXCPAnswer(frame):
+    if frame == None:
+        return None
+    res = frame.payload
+    if isLogEnabled(LOG_DEBUG):
+        log("RECV: " + bytes(res).hex(),LOG_DEBUG)
+    if res[0] != 0xFF:
+        log("XCP ERROR CODE " + hex(res[1]),LOG_ERROR)
+    return res
+
 #Class that handles XCP communication for one ECU
 class RAMN_XCP_Handler:
     def __init__(self,ramn,txid,rxid,name="Unknown"):
@@ -17,28 +32,20 @@ class RAMN_XCP_Handler:
         self.rxid=rxid
         self.ramn = ramn
         self.name = name
+        self.sub = ramn.subscribe(ids=[rxid])
     
     #Send a Raw payload over XCP
     def sendRawData(self,toSend,timeout=RAMN_Utils.DEFAULT_TIMEOUT,recvAnswer=True):
-        if isinstance(toSend,list):
-            toSend = bytes(toSend)
-        if len(toSend) > 0x8:
-            log("Requested a payload which size is too big: {}".format(len(toSend)),LOG_ERROR)
+        toSend = checkRawPayload(toSend,0x8)
+        if toSend == None:
             return None
                 
-        log("SEND: " + ''.join("{:02x}".format(i) for i in toSend),LOG_DEBUG)
+        if isLogEnabled(LOG_DEBUG):
+            log("SEND: " + bytes(toSend).hex(),LOG_DEBUG)
 
-        dlc = len(toSend)
-        
-        hexstr = "t{:03x}{:01x}".format(self.txid,dlc)  + ''.join("{:02x}".format(i) for i in toSend)
-        self.ramn.sendCommand(hexstr)
-        res, canid =  self.ramn.getNextCANMessage()
-        if res != None:
-            if canid == self.rxid:
-                log("RECV: " + ''.join("{:02x}".format(i) for i in res),LOG_DEBUG)
-                if res[0] != 0xFF:
-                    log("XCP ERROR CODE " + hex(res[1]),LOG_ERROR)
-        return res
+        self.sub.clear() #Discard answers to previous requests
+        self.ramn.sendCommand(formatXCPFrame(self.txid,toSend))
+        return parseXCPAnswer(self.sub.get(timeout=timeout))
             
     def connect(self):
         return self.sendRawData([0xFF,0x00])
@@ -6,187 +6,285 @@
 # For a copy, see <https://opensource.org/licenses/MIT>.
 
 #Script to emulate a virtual can-fd bus with socketCAN and RAMN. Can forward serial commands between other serial ports.
+#All channels are served by a single selector-based event loop: each received line is parsed once into an immutable record,
+#which is then dispatched to the destination channels listed in the routing table.
 
+import os
 import serial
-import threading
-import queue
+import selectors
+import time
 import can
 import click
+from collections import deque, namedtuple
 
 import sys
 sys.path.append("..")
 from utils.RAMN_Utils import *
+from utils.RAMN_SLCAN import SLCANParser, SLCANFrame, CANFD_DLC_TO_SIZE
 
 
 # -------- CODE --------------------------------------------------
 
 CHANNEL_HARDWARE_RAMN       = 0
-CHANNEL_VIRTUAL_SERIAL_CH1  = 1 
-CHANNEL_VIRTUAL_SERIAL_CH2  = 2 
+CHANNEL_VIRTUAL_SERIAL_CH1  = 1
+CHANNEL_VIRTUAL_SERIAL_CH2  = 2
 CHANNEL_VIRTUAL_CAN         = 3
 
-SLEEP_BETWEEN_READS = 0.01 #How long to sleep if there is no serial data to read
+READ_SIZE                   = 0x10000   #Maximum number of bytes read from a serial port at once
+WRITE_SIZE                  = 0x4000    #Maximum number of bytes written to a serial port at once
+TX_BUFFER_MAX               = 0x100000  #Maximum number of bytes waiting to be written to a serial port (lines are dropped above, to avoid getting stuck because counterpart is not reading)
+TXQ_MAX_ITEM                = 10000     #Maximum number of frames waiting to be sent on the virtual CAN interface
+CAN_RETRY_INTERVAL          = 0.001     #How long to wait before retrying to send a frame the CAN interface refused
+CAN_MAX_RETRIES             = 100       #Number of refused attempts after which a frame is dropped
 
-TXQ_MAX_ITEM                = 1000
+#Routing table: channels to which the traffic received on each channel is forwarded
+ROUTES = {
+    CHANNEL_HARDWARE_RAMN      : (CHANNEL_VIRTUAL_SERIAL_CH1, CHANNEL_VIRTUAL_SERIAL_CH2, CHANNEL_VIRTUAL_CAN),
+    CHANNEL_VIRTUAL_CAN        : (CHANNEL_HARDWARE_RAMN, CHANNEL_VIRTUAL_SERIAL_CH1, CHANNEL_VIRTUAL_SERIAL_CH2),
+    CHANNEL_VIRTUAL_SERIAL_CH1 : (CHANNEL_HARDWARE_RAMN, CHANNEL_VIRTUAL_SERIAL_CH2, CHANNEL_VIRTUAL_CAN),
+    CHANNEL_VIRTUAL_SERIAL_CH2 : (CHANNEL_HARDWARE_RAMN, CHANNEL_VIRTUAL_SERIAL_CH1, CHANNEL_VIRTUAL_CAN),
+}
 
-rxq                    = queue.Queue()
-txq_hardware_ramn      = queue.Queue()
-txq_virtual_serial_ch1 = queue.Queue()
-txq_virtual_serial_ch2 = queue.Queue()
-txq_virtual_CAN        = queue.Queue()
+#Immutable record shared by all destinations of a received line.
+#frame is the decoded SLCANFrame (None if the line is not a CAN frame, e.g. a command or its answer).
+#line is the raw slcan line including its trailing \r, or None if the line did not come from a serial port (it is then encoded on demand).
+RoutedLine = namedtuple("RoutedLine", ["source", "frame", "line"])
 
+#DLC code of a CAN-FD frame for each payload size
+CANFD_SIZE_TO_DLC = {size: dlc for dlc, size in enumerate(CANFD_DLC_TO_SIZE)}
 
-#Returns the size of a payload depending on the DLC field of a CAN message
+#Returns the DLC code of a CAN message depending on the size of its payload
 def getCANFDPayload(size):
-    if size <= 8:
-        return size
-    if size == 12:
-        return 9
-    elif size == 16:
-        return 0xA
-    elif size == 20:
-        return 0xB
-    elif size == 24:
-        return 0xC
-    elif size == 32:
-        return 0xD
-    elif size == 48:
-        return 0xE
-    elif size == 0x64:
-        return 0xF
-    else:
+    dlc = CANFD_SIZE_TO_DLC.get(size)
+    if dlc is None:
         print("Got Invalid CAN-FD Payload Size")
-        
-#Convert a CAN Message to a serial message        
-def getSerialFromMsg(msg):
+    return dlc
+
+#Convert a frame record to a serial message. Returns None if the frame cannot be encoded.
+def getSerialFromFrame(frame):
+    dlc = getCANFDPayload(len(frame.payload))
+    if dlc is None:
+        return None
     cmd = ''
-    if msg.is_fd:
-        if msg.bitrate_switch:
-            cmd += '1'
-        else:
-            cmd += '0'
-    if msg.is_extended_id:
-        if msg.is_remote_frame:
-            cmd += 'R'
-        else:
-            cmd += 'T'
-        cmd += "{:08x}".format(msg.arbitration_id)
+    if frame.is_fd:
+        cmd += '1' if frame.bitrate_switch else '0'
+    if frame.is_extended:
+        cmd += "{}{:08x}{:1x}".format('R' if frame.is_remote else 'T', frame.canid, dlc)
     else:
-        if msg.is_remote_frame:
-            cmd += 'r'
-        else:
-            cmd += 't'
-        cmd += "{:03x}".format(msg.arbitration_id)
-     
-    cmd += "{:1x}".format(getCANFDPayload(len(msg.data)))
-    if not msg.is_remote_frame:
-        for d in msg.data:
-            cmd += "{:02x}".format(d)
-    if msg.error_state_indicator:
+        cmd += "{}{:03x}{:1x}".format('r' if frame.is_remote else 't', frame.canid, dlc)
+    if not frame.is_remote:
+        cmd += frame.payload.hex()
+    if frame.error_state_indicator:
         cmd += "i"
     return cmd.encode() + b'\r'
-    
-#Convert a serial message to a CAN message
-def getMessageFromSerial(line):
-    rmsg = None
-    bitrate_switch=False
-    is_extended_id = False
-    error_state_indicator=False
-    is_fd = False
-    data=b''
-    if len(line) > 0:
-        if line[0] == '0':
-            is_fd = True
-            bitrate_switch = False
-            line = line[1:]
-        elif line[0] == '1':
-            is_fd = True
-            bitrate_switch = True
-            line = line[1:]
-            
-    if len(line) > 0:    
-        if line[0] == 't':
-            if len(line) >= 5:
-                canid = int(line[1:4],16)
-                if len(line) >= 7:
-                    if line[-1] == 'i':
-                        error_state_indicator=True
-                        line = line[:-1]
-                    data = bytes.fromhex(line[5:])
-                rmsg = can.Message(arbitration_id=canid,data=data,is_extended_id=is_extended_id, is_fd=is_fd, bitrate_switch=bitrate_switch, is_remote_frame=False, error_state_indicator=error_state_indicator)
-        elif  line[0] == 'T':
-            if len(line) >= 10:
-                canid = int(line[1:9],16)
-                if len(line) >= 12:
-                    if line[-1] == 'i':
-                        error_state_indicator=True
-                        line = line[:-1]
-                    data = bytes.fromhex(line[10:])
-                is_extended_id = True
-                rmsg = can.Message(arbitration_id=canid,data=data,is_extended_id=is_extended_id, is_fd=is_fd, bitrate_switch=bitrate_switch, is_remote_frame=False, error_state_indicator=error_state_indicator)
-        if line[0] == 'r':
-            if len(line) >= 4:
-                canid = int(line[1:4],16)
-                is_remote_frame=True
-                if line[-1] == 'i':
-                    error_state_indicator=True
-                rmsg = can.Message(arbitration_id=canid,data=data,is_extended_id=is_extended_id, is_fd=is_fd, bitrate_switch=bitrate_switch, is_remote_frame=True, error_state_indicator=error_state_indicator)
-        elif  line[0] == 'R':
-            if len(line) >= 9:
-                canid = int(line[1:9],16)
-                is_remote_frame=True
-                is_extended_id = True
-                if line[-1] == 'i':
-                        error_state_indicator=True
-                rmsg = can.Message(arbitration_id=canid,data=data,is_extended_id=is_extended_id, is_fd=is_fd, bitrate_switch=bitrate_switch, is_remote_frame=True, error_state_indicator=error_state_indicator)  
-    return rmsg
-
-#Call back for CAN message received
-CHANNEL_VIRTUAL_CAN_BYTES = bytes([CHANNEL_VIRTUAL_CAN])
-def onNewCANMessage(msg):
-    cmd = getSerialFromMsg(msg)
-    rxq.put(CHANNEL_VIRTUAL_CAN_BYTES + cmd)
-    
-#Thread that reads for a serial port, and queue full commands.
-def receiveSerialThread(ser,r,channel):  
-    data = b''
-    while True:
-        if ser.in_waiting > 0:
-            c = ser.read(1) 
-            data += c
-            if c == b'\r':
-                r.put(channel + data)
-                data = b''
-        else:
-            time.sleep(SLEEP_BETWEEN_READS)
 
-            
+#Convert a CAN message to a frame record
+def getFrameFromMsg(msg):
+    return SLCANFrame(msg.arbitration_id, bytes(msg.data), msg.is_extended_id, msg.is_fd, msg.bitrate_switch, msg.is_remote_frame, msg.error_state_indicator, None)
 
-#Thread that empty queues to write their content to a specified serial port   
-def sendSerialThread(ser,t):
-    while True:
-        item = t.get()
-        ser.write(item)
-        t.task_done()
+#Convert a frame record to a CAN message
+def getMessageFromFrame(frame):
+    return can.Message(arbitration_id=frame.canid, data=frame.payload, is_extended_id=frame.is_extended, is_fd=frame.is_fd, bitrate_switch=frame.bitrate_switch, is_remote_frame=frame.is_remote, error_state_indicator=frame.error_state_indicator)
 
-#Thread that empty queues to write their content to a specified can bus  
-def sendCANThread(bus,t):
-    while True:
+#Channel connected to a serial port (RAMN or a virtual serial port).
+#The file descriptor of the port is used directly in non-blocking mode: pyserial's write() retries EAGAIN in a busy loop, which would hang the event loop when the counterpart stops reading.
+class SerialEndpoint():
+    encoding = "slcan"
+
+    def __init__(self,channel,port,maxBuffer=TX_BUFFER_MAX):
+        self.channel = channel
+        self.port = port
+        self.parser = SLCANParser()
+        self.txBuffer = bytearray()
+        self.maxBuffer = maxBuffer
+        self.retryAt = None
+        self.dropped = 0
+        os.set_blocking(self.fileno(),False)
+
+    def fileno(self):
+        return self.port.fileno()
+
+    #Read the available bytes, and returns the records of the complete lines
+    def receive(self):
         try:
-            item = t.get()
-            bus.send(item)
-            t.task_done()
-        except can.CanError:
-            print("Failed to forward RAMN CAN Message to virtual CAN: " + str(line))
-  
-#Write to queue, with size check to avoid queues getting stuck because counterpart is not reading.
-def addItemToQueue(item,t):
-    if t.qsize() <= TXQ_MAX_ITEM:
-        t.put(item)
-    else:
-        #print("queue full (size:{}): {} ".format(t.qsize(),str(t)))
-        pass
-  
+            data = os.read(self.fileno(),READ_SIZE)
+        except BlockingIOError:
+            return []
+        if not data:
+            raise ConnectionError("Port closed")
+        self.parser.feed(data)
+        records = []
+        while True:
+            item = self.parser.nextRawItem()
+            if item is None:
+                return records
+            records.append(RoutedLine(self.channel, item[1], item[0]))
+
+    #Returns the bytes to write for a record
+    def encode(self,record):
+        if record.line is not None:
+            return record.line
+        return getSerialFromFrame(record.frame)
+
+    def send(self,item):
+        if len(self.txBuffer) + len(item) > self.maxBuffer:
+            self.dropped += 1
+        else:
+            self.txBuffer += item
+
+    def pending(self):
+        return len(self.txBuffer) > 0
+
+    #Write as much as the port accepts without blocking
+    def flush(self):
+        while self.txBuffer:
+            try:
+                n = os.write(self.fileno(),self.txBuffer[:WRITE_SIZE])
+            except BlockingIOError:
+                return
+            del self.txBuffer[:n]
+
+#Channel connected to the virtual CAN interface
+class CANEndpoint():
+    encoding = "can"
+
+    def __init__(self,channel,bus,maxItems=TXQ_MAX_ITEM):
+        self.channel = channel
+        self.bus = bus
+        self.txq = deque()
+        self.maxItems = maxItems
+        self.retryAt = None
+        self.retries = 0
+        self.dropped = 0
+
+    def fileno(self):
+        return self.bus.fileno()
+
+    #Read the available messages, and returns their records
+    def receive(self):
+        records = []
+        while True:
+            msg = self.bus.recv(0)
+            if msg is None:
+                return records
+            records.append(RoutedLine(self.channel, getFrameFromMsg(msg), None))
+
+    #Returns the message to send for a record, or None if the record is not a CAN frame
+    def encode(self,record):
+        if record.frame is None:
+            return None
+        return getMessageFromFrame(record.frame)
+
+    def send(self,item):
+        if len(self.txq) >= self.maxItems:
+            self.dropped += 1
+        else:
+            self.txq.append(item)
+
+    def pending(self):
+        return len(self.txq) > 0
+
+    #Send frames until the interface refuses one, which is then retried after CAN_RETRY_INTERVAL
+    def flush(self):
+        while self.txq:
+            try:
+                self.bus.send(self.txq[0])
+            except can.CanError as e:
+                self.retries += 1
+                if self.retries < CAN_MAX_RETRIES:
+                    self.retryAt = time.monotonic() + CAN_RETRY_INTERVAL
+                    return
+                print("Failed to forward RAMN CAN Message to virtual CAN: " + str(e))
+                self.dropped += 1
+            self.txq.popleft()
+            self.retries = 0
+
+#Event loop forwarding the traffic of all channels according to the routing table
+class Router():
+
+    def __init__(self,routes=ROUTES):
+        self.routes = routes
+        self.endpoints = {}
+        self.events = {}
+        self.selector = selectors.DefaultSelector()
+
+    def add(self,endpoint):
+        self.endpoints[endpoint.channel] = endpoint
+        self.events[endpoint.channel] = selectors.EVENT_READ
+        self.selector.register(endpoint, selectors.EVENT_READ)
+
+    def remove(self,endpoint):
+        self.selector.unregister(endpoint)
+        del self.endpoints[endpoint.channel]
+        del self.events[endpoint.channel]
+
+    #Dispatch a record to its destinations. Each encoding is computed at most once per record, and shared by the destinations using it.
+    def route(self,record):
+        encoded = {}
+        for channel in self.routes.get(record.source,()):
+            endpoint = self.endpoints.get(channel)
+            if endpoint is None:
+                continue
+            kind = endpoint.encoding
+            if kind not in encoded:
+                encoded[kind] = endpoint.encode(record)
+            item = encoded[kind]
+            if item is not None:
+                endpoint.send(item)
+
+    #Process events for at most timeout seconds (forever if None)
+    def poll(self,timeout=None):
+        now = time.monotonic()
+        for endpoint in self.endpoints.values():
+            if endpoint.retryAt is not None and endpoint.retryAt <= now:
+                endpoint.retryAt = None
+        wait = self._updateEvents(now)
+        if wait is not None and (timeout is None or wait < timeout):
+            timeout = wait
+        for key, events in self.selector.select(timeout):
+            endpoint = key.fileobj
+            if self.endpoints.get(endpoint.channel) is not endpoint:
+                continue #Closed while processing a previous event
+            try:
+                if events & selectors.EVENT_READ:
+                    for record in endpoint.receive():
+                        self.route(record)
+                #Only write to destinations that reported they can accept data, so that a counterpart that does not read cannot block the loop
+                if events & selectors.EVENT_WRITE:
+                    endpoint.flush()
+            except (OSError, can.CanError) as e:
+                self._fail(endpoint,e)
+
+    #Close a channel that failed. Nothing can be forwarded without RAMN, so its failure stops the router.
+    def _fail(self,endpoint,e):
+        print("Channel {} failed, closing it: {}".format(endpoint.channel, e))
+        self.remove(endpoint)
+        if endpoint.channel == CHANNEL_HARDWARE_RAMN:
+            raise e
+
+    #Register write interest for destinations with pending data, and returns how long to wait for the next retry (None if no retry is pending)
+    def _updateEvents(self,now):
+        wait = None
+        for channel, endpoint in self.endpoints.items():
+            events = selectors.EVENT_READ
+            if endpoint.pending():
+                if endpoint.retryAt is None:
+                    events |= selectors.EVENT_WRITE
+                elif wait is None or endpoint.retryAt - now < wait:
+                    wait = max(0.0, endpoint.retryAt - now)
+            if events != self.events[channel]:
+                self.selector.modify(endpoint, events)
+                self.events[channel] = events
+        return wait
+
+    def run(self):
+        while True:
+            self.poll()
+
+    #Returns the number of dropped items per channel
+    def dropped(self):
+        return {channel: endpoint.dropped for channel, endpoint in self.endpoints.items()}
+
 
 
 @click.command()
@@ -196,115 +294,56 @@ def addItemToQueue(item,t):
 @click.option('--vcan', '-v', help='Name of the virtual CAN interface to use')
 
 def vcand(ramn_port, pts1, pts2, vcan):
-    
+
     if ramn_port is None:
         ramn_port = RAMN_Utils.VCAND_HARDWARE_PORT
 
     if vcan is None:
         vcan       = RAMN_Utils.CAN_NAME                #Name of virtual CAN Interface on which to forward CAN messages.
-    
+
+    router = Router()
 
     try:
         can_bus = can.interface.Bus(interface='socketcan', channel=vcan, fd=True)
-        notifier = can.Notifier(can_bus,[onNewCANMessage])
+        router.add(CANEndpoint(CHANNEL_VIRTUAL_CAN,can_bus))
     except Exception as e:
         print("Could Not open CAN bus :" + str(e))
         can_bus = None
-         
+
     try:
         if pts1 is not None:
             virt_ch1_ser = serial.Serial(pts1, rtscts=True,dsrdtr=True)
-        else:
-            virt_ch1_ser = None
+            router.add(SerialEndpoint(CHANNEL_VIRTUAL_SERIAL_CH1,virt_ch1_ser))
     except Exception as e:
         print("Could Not open Serial port :" + str(e))
-        virt_ch1_ser = None
-        
+
     try:
         if pts2 is not None:
             virt_ch2_ser = serial.Serial(pts2, rtscts=True,dsrdtr=True)
-        else:
-            virt_ch2_ser = None
+            router.add(SerialEndpoint(CHANNEL_VIRTUAL_SERIAL_CH2,virt_ch2_ser))
     except Exception as e:
         print("Could Not open Serial port :" + str(e))
-        virt_ch2_ser = None
-        
+
     try:
         #open serial port
         ramn_ser = serial.Serial(ramn_port)
+        ramn = SerialEndpoint(CHANNEL_HARDWARE_RAMN,ramn_ser)
+        router.add(ramn)
         #Open slcan
-        ramn_ser.write(b'O\r')
-        #Start sending/receing threads
-        p_hardware_rx = threading.Thread(target=receiveSerialThread,      args=(ramn_ser,rxq,bytes([CHANNEL_HARDWARE_RAMN])))
-        p_hardware_rx.start()
-        p_hardware_tx = threading.Thread(target=sendSerialThread,         args=(ramn_ser,txq_hardware_ramn))
-        p_hardware_tx.start()
+        ramn.send(b'O\r')
     except:
         print("Could not open RAMN serial port at {}. Permission Issue ?".format(ramn_port))
         sys.exit(1)
 
-    if virt_ch1_ser != None:
-        #Start sending/receing threads
-        p_virtual_ch1_rx  = threading.Thread(target=receiveSerialThread,  args=(virt_ch1_ser,rxq,bytes([CHANNEL_VIRTUAL_SERIAL_CH1])))
-        p_virtual_ch1_rx.start()
-        p_virtual_ch1_tx  = threading.Thread(target=sendSerialThread,     args=(virt_ch1_ser,txq_virtual_serial_ch1))
-        p_virtual_ch1_tx.start()
-        
-    if virt_ch2_ser != None:
-        #Start sending/receing threads
-        p_virtual_ch2_rx  = threading.Thread(target=receiveSerialThread,  args=(virt_ch2_ser,rxq,bytes([CHANNEL_VIRTUAL_SERIAL_CH2])))
-        p_virtual_ch2_rx.start()
-        p_virtual_ch2_tx  = threading.Thread(target=sendSerialThread,     args=(virt_ch2_ser,txq_virtual_serial_ch2))
-        p_virtual_ch2_tx.start()
-        
-    if can_bus != None:
-        #Only TX, RX already handled by notifier
-        p_virtual_can_tx  = threading.Thread(target=sendCANThread,        args=(can_bus,txq_virtual_CAN))
-        p_virtual_can_tx.start()
-        
-        
-    
-        
-    print("All Threads started")
-
-    while True:
-        item = rxq.get()
-        if len(item) > 0:
-            if (item[0] == CHANNEL_HARDWARE_RAMN):
-                #print("RAMN:" + item[1:].decode())
-                if virt_ch1_ser != None: addItemToQueue(item[1:],txq_virtual_serial_ch1)
-                if virt_ch2_ser != None: addItemToQueue(item[1:],txq_virtual_serial_ch2)
-                if can_bus      != None: 
-                    msg = getMessageFromSerial(item[1:-1].decode())
-                    if msg != None:
-                        addItemToQueue(msg,txq_virtual_CAN)
-            elif (item[0] == CHANNEL_VIRTUAL_CAN):
-                #print("CAN :" + item[1:].decode())
-                if ramn_ser     != None: addItemToQueue(item[1:],txq_hardware_ramn)
-                if virt_ch1_ser != None: addItemToQueue(item[1:],txq_virtual_serial_ch1)
-                if virt_ch2_ser != None: addItemToQueue(item[1:],txq_virtual_serial_ch2)
-            elif (item[0] == CHANNEL_VIRTUAL_SERIAL_CH1):
-                #print("PTS1:" + item[1:].decode())
-                if ramn_ser     != None: addItemToQueue(item[1:],txq_hardware_ramn)
-                if virt_ch2_ser != None: addItemToQueue(item[1:],txq_virtual_serial_ch2)
-                if can_bus      != None: 
-                    msg = getMessageFromSerial(item[1:-1].decode())
-                    if msg != None:
-                        addItemToQueue(msg,txq_virtual_CAN)
-            elif (item[0] == CHANNEL_VIRTUAL_SERIAL_CH2):
-                #print("PTS2:" + item[1:].decode())
-                if ramn_ser     != None: addItemToQueue(item[1:],txq_hardware_ramn)
-                if virt_ch1_ser != None: addItemToQueue(item[1:],txq_virtual_serial_ch1)
-                if can_bus      != None: 
-                    msg = getMessageFromSerial(item[1:-1].decode())
-                    if msg != None:
-                        addItemToQueue(msg,txq_virtual_CAN)
-            else: 
-                print("ERROR: Received Command from unknown Channel")
-        else:
-            print("ERROR: Received Empty data")
-        rxq.task_done()
-        
-        
+    print("All channels opened")
+
+    try:
+        router.run()
+    except KeyboardInterrupt:
+        for channel, dropped in router.dropped().items():
+            if dropped > 0:
+                print("Channel {}: {} dropped item(s)".format(channel, dropped))
+
+
 if __name__ == '__main__':
     vcand()